@@ -1,15 +1,19 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
+from app.core.http_cache import aplicar_cache_http
 from app.core.security import settings
 from app.repositories.docente_repository import docente_repository
 from app.models.docente import Docente
 from app.schemas.token import TokenPayload
+from app.services.curriculum_service import curriculum_service, CurriculumSnapshot
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"/api/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl=f"/api/auth/login", auto_error=False)
 
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
@@ -37,6 +41,28 @@ async def get_current_user(
 
     return user
 
+async def get_current_user_optional(
+    db: AsyncSession = Depends(get_db),
+    token: Optional[str] = Depends(oauth2_scheme_optional)
+) -> Optional[Docente]:
+    """Get current user if a valid token was sent, otherwise None."""
+    if not token:
+        return None
+
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError:
+        return None
+
+    dni = payload.get("sub")
+    if dni is None:
+        return None
+
+    user = await docente_repository.get_by_dni(db, dni=dni)
+    if user is None or not user.is_active:
+        return None
+    return user
+
 async def get_current_active_user(
     current_user: Docente = Depends(get_current_user),
 ) -> Docente:
@@ -51,3 +77,17 @@ async def get_current_superuser(
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Permisos insuficientes")
     return current_user
+
+
+async def get_curriculo(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+) -> CurriculumSnapshot:
+    """
+    Instantánea del currículo con caché HTTP: agrega ETag/Cache-Control y
+    responde 304 si el cliente ya tiene la versión vigente.
+    """
+    curriculo = await curriculum_service.obtener(db)
+    aplicar_cache_http(request, response, curriculo.etag, settings.curriculum_http_max_age)
+    return curriculo
@@ -39,6 +39,76 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24 * 7  # 7 days
 
+    # Caché de respuestas de IA
+    ai_cache_enabled: bool = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+    ai_cache_ttl_seconds: int = int(os.getenv("AI_CACHE_TTL_SECONDS", str(60 * 60 * 24)))  # 24 horas
+    ai_cache_memory_entries: int = int(os.getenv("AI_CACHE_MEMORY_ENTRIES", "256"))
+    ai_cache_persistent: bool = os.getenv("AI_CACHE_PERSISTENT", "true").lower() == "true"
+    ai_cache_persistent_entries: int = int(os.getenv("AI_CACHE_PERSISTENT_ENTRIES", "5000"))
+
+    # Cola de trabajos de generación
+    jobs_max_workers: int = int(os.getenv("JOBS_MAX_WORKERS", "4"))
+    jobs_poll_seconds: int = int(os.getenv("JOBS_POLL_SECONDS", "30"))
+    jobs_stale_seconds: int = int(os.getenv("JOBS_STALE_SECONDS", "900"))
+    jobs_max_attempts: int = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+
+    # Generación por lotes: llamadas simultáneas máximas por proveedor
+    batch_concurrency_gemini: int = int(os.getenv("BATCH_CONCURRENCY_GEMINI", "4"))
+    batch_concurrency_chatgpt: int = int(os.getenv("BATCH_CONCURRENCY_CHATGPT", "4"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+    # Límites de uso por proveedor de IA (cuotas de la API)
+    ai_limit_gemini_rpm: int = int(os.getenv("AI_LIMIT_GEMINI_RPM", "60"))
+    ai_limit_gemini_tpm: int = int(os.getenv("AI_LIMIT_GEMINI_TPM", "1000000"))
+    ai_limit_gemini_concurrency: int = int(os.getenv("AI_LIMIT_GEMINI_CONCURRENCY", "8"))
+    ai_limit_chatgpt_rpm: int = int(os.getenv("AI_LIMIT_CHATGPT_RPM", "500"))
+    ai_limit_chatgpt_tpm: int = int(os.getenv("AI_LIMIT_CHATGPT_TPM", "200000"))
+    ai_limit_chatgpt_concurrency: int = int(os.getenv("AI_LIMIT_CHATGPT_CONCURRENCY", "8"))
+    ai_limit_output_tokens: int = int(os.getenv("AI_LIMIT_OUTPUT_TOKENS", "3000"))  # estimado por llamada
+    ai_limit_max_retries: int = int(os.getenv("AI_LIMIT_MAX_RETRIES", "3"))
+    ai_limit_backoff_seconds: float = float(os.getenv("AI_LIMIT_BACKOFF_SECONDS", "2"))
+    ai_limit_queue_timeout_seconds: float = float(os.getenv("AI_LIMIT_QUEUE_TIMEOUT_SECONDS", "120"))
+
+    # Enrutamiento automático entre proveedores (modelo "auto")
+    # Lista separada por comas (AI_ROUTING_ORDER); como str, pydantic-settings no la decodifica como JSON
+    ai_routing_order: str = "gemini,chatgpt"
+    ai_hedge_enabled: bool = os.getenv("AI_HEDGE_ENABLED", "true").lower() == "true"
+    ai_hedge_percentile: float = float(os.getenv("AI_HEDGE_PERCENTILE", "0.95"))
+    ai_hedge_min_samples: int = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+    ai_hedge_default_delay_seconds: float = float(os.getenv("AI_HEDGE_DEFAULT_DELAY_SECONDS", "30"))
+    ai_hedge_min_delay_seconds: float = float(os.getenv("AI_HEDGE_MIN_DELAY_SECONDS", "5"))
+
+    # Currículo en memoria: cada cuántos segundos se verifica la versión en BD
+    curriculum_check_seconds: float = float(os.getenv("CURRICULUM_CHECK_SECONDS", "5"))
+    curriculum_http_max_age: int = int(os.getenv("CURRICULUM_HTTP_MAX_AGE", "60"))  # Cache-Control max-age
+
+    # Procesamiento de archivos subidos (escaneo y extracción de texto en procesos aparte)
+    file_pool_workers: int = int(os.getenv("FILE_POOL_WORKERS", "2"))
+    file_parse_timeout_seconds: float = float(os.getenv("FILE_PARSE_TIMEOUT_SECONDS", "30"))
+    file_cache_enabled: bool = os.getenv("FILE_CACHE_ENABLED", "true").lower() == "true"
+    file_cache_max_mb: int = int(os.getenv("FILE_CACHE_MAX_MB", "200"))  # texto almacenado en la caché
+
+    # Presupuesto de tokens del prompt: el texto base (subido o pegado) se recorta
+    # en límites de párrafo/oración para no superar estos máximos
+    prompt_max_tokens: int = int(os.getenv("PROMPT_MAX_TOKENS", "16000"))
+    prompt_texto_base_max_tokens: int = int(os.getenv("PROMPT_TEXTO_BASE_MAX_TOKENS", "6000"))
+
+    # Validación de exámenes generados: rondas para regenerar solo las preguntas inválidas
+    exam_repair_enabled: bool = os.getenv("EXAM_REPAIR_ENABLED", "true").lower() == "true"
+    exam_repair_max_rounds: int = int(os.getenv("EXAM_REPAIR_MAX_ROUNDS", "2"))
+
+    # Pool de exámenes generados por adelantado para las especificaciones más solicitadas
+    exam_pool_enabled: bool = os.getenv("EXAM_POOL_ENABLED", "false").lower() == "true"
+    exam_pool_size: int = int(os.getenv("EXAM_POOL_SIZE", "3"))  # exámenes listos por especificación
+    exam_pool_max_specs: int = int(os.getenv("EXAM_POOL_MAX_SPECS", "20"))
+    exam_pool_min_requests: int = int(os.getenv("EXAM_POOL_MIN_REQUESTS", "3"))
+    exam_pool_window_hours: int = int(os.getenv("EXAM_POOL_WINDOW_HOURS", "168"))  # uso reciente: 7 días
+    exam_pool_refill_seconds: int = int(os.getenv("EXAM_POOL_REFILL_SECONDS", "300"))
+    exam_pool_concurrency: int = int(os.getenv("EXAM_POOL_CONCURRENCY", "1"))
+
+    # Banco de preguntas: intervalo para incorporar al índice semántico las preguntas nuevas
+    question_bank_check_seconds: float = float(os.getenv("QUESTION_BANK_CHECK_SECONDS", "5"))
+
     class Config:
         env_file = ".env"
         extra = "ignore"  # Ignorar variables de entorno no declaradas
@@ -49,15 +49,17 @@ async def get_db():
 
 
 async def init_db():
-    """Initialize database tables asynchronously."""
+    """Inicializa la base de datos aplicando las migraciones de esquema pendientes."""
     # Importar modelos aquí para asegurar que se registren en Base.metadata
     from app.models.db_models import (
         Grado, Capacidad, Desempeno,
         CompetenciaMatematica, CapacidadMatematica,
         EstandarMatematica, DesempenoMatematica,
-        ExamenLectura, ExamenMatematica
+        ExamenLectura, ExamenMatematica,
+        RespuestaIACache, TrabajoGeneracion, VersionCatalogo
     )
     from app.models.docente import Docente
+    from app.core.migrations import aplicar_migraciones
 
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(aplicar_migraciones)
@@ -0,0 +1,33 @@
+"""
+Utilidades de caché HTTP (ETag, Cache-Control y GET condicional).
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match contra el ETag actual (RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    actual = etag.removeprefix("W/")
+    return any(
+        candidato.strip().removeprefix("W/") == actual
+        for candidato in if_none_match.split(",")
+    )
+
+
+def aplicar_cache_http(request: Request, response: Response, etag: str, max_age: int) -> None:
+    """
+    Agrega ETag y Cache-Control a la respuesta. Si el cliente ya tiene la
+    versión vigente, corta la petición con 304 Not Modified (sin cuerpo).
+    """
+    cabeceras = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age}",
+    }
+    if etag_coincide(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+    response.headers.update(cabeceras)
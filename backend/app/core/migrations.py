@@ -0,0 +1,184 @@
+"""
+Migraciones de esquema de la base de datos.
+
+Cada migración es una función síncrona que recibe la conexión y se registra
+con @migracion(version, nombre). init_db aplica las pendientes en orden,
+dentro de una sola transacción, y anota cada una en la tabla schema_migrations.
+
+Para cambiar el esquema:
+    1. Modificar el modelo en app/models/db_models.py.
+    2. Añadir aquí una migración con la siguiente versión (nunca editar una
+       migración ya publicada).
+
+Las migraciones deben ser idempotentes: en una base de datos nueva la
+migración inicial ya crea las tablas con la definición actual de los modelos,
+y las migraciones posteriores deben detectar que no hay nada que hacer.
+"""
+
+import logging
+from typing import Callable
+
+from sqlalchemy import inspect, insert, select, text
+from sqlalchemy.engine import Connection
+
+from app.core.database import Base
+from app.models.db_models import (
+    EspecificacionPool,
+    ExamenPool,
+    ExtraccionArchivoCache,
+    MigracionEsquema,
+    PreguntaBanco,
+    SolicitudDocente,
+    contar_preguntas,
+)
+from app.models.docente import Docente  # noqa: F401  (registra la tabla docentes)
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock de PostgreSQL: evita que varios workers migren a la vez
+LOCK_MIGRACIONES = 7_240_311
+
+MIGRACIONES: list[tuple[int, str, Callable[[Connection], None]]] = []
+
+
+def migracion(version: int, nombre: str):
+    """Registra una migración de esquema."""
+    def decorador(funcion: Callable[[Connection], None]):
+        if any(v == version for v, _, _ in MIGRACIONES):
+            raise ValueError(f"Versión de migración duplicada: {version}")
+        MIGRACIONES.append((version, nombre, funcion))
+        MIGRACIONES.sort(key=lambda m: m[0])
+        return funcion
+    return decorador
+
+
+# =============================================================================
+# MIGRACIONES
+# =============================================================================
+
+# Tablas existentes antes de introducir las migraciones
+TABLAS_INICIALES = [
+    "docentes",
+    "grados", "capacidades", "desempenos",
+    "competencias_matematica", "capacidades_matematica",
+    "estandares_matematica", "desempenos_matematica",
+    "examenes_lectura", "examenes_matematica",
+    "respuestas_ia_cache", "trabajos_generacion", "versiones_catalogo",
+]
+
+
+@migracion(1, "esquema_inicial")
+def _esquema_inicial(conn: Connection) -> None:
+    """Crea las tablas que falten (equivale al antiguo create_all)."""
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[t] for t in TABLAS_INICIALES])
+
+
+@migracion(2, "examenes_total_preguntas")
+def _examenes_total_preguntas(conn: Connection) -> None:
+    """Agrega y rellena total_preguntas en bases de datos anteriores a la columna."""
+    inspector = inspect(conn)
+    for nombre_tabla in ("examenes_lectura", "examenes_matematica"):
+        columnas = {c["name"] for c in inspector.get_columns(nombre_tabla)}
+        if "total_preguntas" in columnas:
+            continue
+        conn.execute(text(
+            f"ALTER TABLE {nombre_tabla} ADD COLUMN total_preguntas INTEGER NOT NULL DEFAULT 0"
+        ))
+        tabla = Base.metadata.tables[nombre_tabla]
+        filas = conn.execute(select(tabla.c.id, tabla.c.preguntas)).all()
+        for examen_id, preguntas in filas:
+            total = contar_preguntas(preguntas)
+            if total:
+                conn.execute(
+                    tabla.update().where(tabla.c.id == examen_id).values(total_preguntas=total)
+                )
+
+
+# (nombre, tabla, columnas) de los índices de la migración 3
+INDICES_FILTROS = [
+    ("ix_capacidades_tipo", "capacidades", "tipo"),
+    ("ix_desempenos_grado_capacidad", "desempenos", "grado_id, capacidad_id"),
+    ("ix_capacidades_matematica_competencia", "capacidades_matematica", "competencia_id"),
+    ("ix_estandares_matematica_grado_competencia", "estandares_matematica", "grado_id, competencia_id"),
+    ("ix_desempenos_matematica_grado_capacidad", "desempenos_matematica", "grado_id, capacidad_id"),
+    # Sirven al listado paginado por (fecha_creacion, id) de cada docente
+    ("ix_examenes_lectura_docente_fecha", "examenes_lectura", "docente_id, fecha_creacion, id"),
+    ("ix_examenes_matematica_docente_fecha", "examenes_matematica", "docente_id, fecha_creacion, id"),
+]
+
+
+@migracion(3, "indices_filtros_frecuentes")
+def _indices_filtros_frecuentes(conn: Connection) -> None:
+    """Índices compuestos para los filtros del currículo y el historial de exámenes."""
+    for nombre, tabla, columnas in INDICES_FILTROS:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"))
+
+
+@migracion(4, "cache_extracciones_archivo")
+def _cache_extracciones_archivo(conn: Connection) -> None:
+    """Tabla de caché de archivos subidos (texto extraído por hash de contenido)."""
+    ExtraccionArchivoCache.__table__.create(conn, checkfirst=True)
+
+
+@migracion(5, "pool_examenes")
+def _pool_examenes(conn: Connection) -> None:
+    """Tablas del pool de exámenes generados por adelantado."""
+    EspecificacionPool.__table__.create(conn, checkfirst=True)
+    ExamenPool.__table__.create(conn, checkfirst=True)
+
+
+@migracion(6, "banco_preguntas")
+def _banco_preguntas(conn: Connection) -> None:
+    """Banco de preguntas con índice full-text en español (solo PostgreSQL)."""
+    PreguntaBanco.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_banco_preguntas_fts ON banco_preguntas "
+            "USING GIN (to_tsvector('spanish', texto_busqueda))"
+        ))
+
+
+@migracion(7, "solicitudes_docente")
+def _solicitudes_docente(conn: Connection) -> None:
+    """Especificaciones pedidas por cada docente (modo de caché por defecto)."""
+    SolicitudDocente.__table__.create(conn, checkfirst=True)
+
+
+# =============================================================================
+# EJECUCIÓN
+# =============================================================================
+
+def _versiones_aplicadas(conn: Connection) -> set[int]:
+    MigracionEsquema.__table__.create(conn, checkfirst=True)
+    return set(conn.execute(select(MigracionEsquema.version)).scalars())
+
+
+def aplicar_migraciones(conn: Connection) -> list[int]:
+    """
+    Aplica las migraciones pendientes sobre la conexión (dentro de su transacción).
+
+    Returns:
+        Versiones aplicadas en esta ejecución.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:clave)"), {"clave": LOCK_MIGRACIONES})
+
+    aplicadas = _versiones_aplicadas(conn)
+    nuevas = []
+    for version, nombre, funcion in MIGRACIONES:
+        if version in aplicadas:
+            continue
+        logger.info("Aplicando migración %s (%s)", version, nombre)
+        funcion(conn)
+        conn.execute(insert(MigracionEsquema.__table__).values(version=version, nombre=nombre))
+        nuevas.append(version)
+    return nuevas
+
+
+def estado_migraciones(conn: Connection) -> list[dict]:
+    """Lista las migraciones conocidas indicando si ya están aplicadas."""
+    aplicadas = _versiones_aplicadas(conn)
+    return [
+        {"version": version, "nombre": nombre, "aplicada": version in aplicadas}
+        for version, nombre, _ in MIGRACIONES
+    ]
@@ -0,0 +1,38 @@
+"""
+Utilidades para respuestas Server-Sent Events (SSE).
+"""
+import json
+import logging
+from typing import Any, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+def formatear_evento(evento: str, datos: Any) -> str:
+    """Serializa un evento SSE con datos JSON."""
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _emitir(eventos: AsyncIterator[tuple[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for evento, datos in eventos:
+            yield formatear_evento(evento, datos)
+    except ValueError as e:
+        yield formatear_evento("error", {"detail": str(e)})
+    except Exception as e:
+        logger.exception("Error durante el streaming SSE: %s", e)
+        yield formatear_evento("error", {"detail": f"Error interno: {str(e)}"})
+
+
+def respuesta_sse(eventos: AsyncIterator[tuple[str, Any]]) -> StreamingResponse:
+    """Envuelve un generador de (evento, datos) en una respuesta text/event-stream."""
+    return StreamingResponse(
+        _emitir(eventos),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Desactivar buffering en proxies (nginx)
+        }
+    )
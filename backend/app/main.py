@@ -7,6 +7,10 @@ import os
 from app.core.config import get_settings
 from app.routes import api_router
 from app.core.database import init_db
+from app.services.exam_pool import exam_pool
+from app.services.job_service import job_service
+from app.services.process_pool import process_pool
+from app.services.curriculum_service import curriculum_service
 
 settings = get_settings()
 
@@ -27,12 +31,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    await curriculum_service.cargar()
+    await job_service.start()
+    await exam_pool.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await exam_pool.stop()
+    await job_service.stop()
+    process_pool.cerrar()
 
 # ==========================================
 # API ROUTES - Usando router central
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Enum, DateTime, JSON, Boolean, Index, UniqueConstraint, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -62,6 +62,7 @@ class Grado(Base):
 class Capacidad(Base):
     """Modelo para capacidades de comprensión lectora."""
     __tablename__ = "capacidades"
+    __table_args__ = (Index("ix_capacidades_tipo", "tipo"),)
     
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(200), nullable=False)
@@ -78,6 +79,7 @@ class Capacidad(Base):
 class Desempeno(Base):
     """Modelo para desempeños precisados de comprensión lectora."""
     __tablename__ = "desempenos"
+    __table_args__ = (Index("ix_desempenos_grado_capacidad", "grado_id", "capacidad_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(10), nullable=False)  # "01", "02", etc.
@@ -135,6 +137,7 @@ class CapacidadMatematica(Base):
     4. Argumenta afirmaciones sobre las relaciones numéricas y las operaciones
     """
     __tablename__ = "capacidades_matematica"
+    __table_args__ = (Index("ix_capacidades_matematica_competencia", "competencia_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     orden = Column(Integer, nullable=False)  # 1, 2, 3, 4 (orden dentro de la competencia)
@@ -158,6 +161,7 @@ class EstandarMatematica(Base):
     Define el nivel esperado al final de cada ciclo por competencia.
     """
     __tablename__ = "estandares_matematica"
+    __table_args__ = (Index("ix_estandares_matematica_grado_competencia", "grado_id", "competencia_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     descripcion = Column(Text, nullable=False)
@@ -181,6 +185,7 @@ class DesempenoMatematica(Base):
     Especifica lo que el estudiante debe lograr por grado y capacidad.
     """
     __tablename__ = "desempenos_matematica"
+    __table_args__ = (Index("ix_desempenos_matematica_grado_capacidad", "grado_id", "capacidad_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(10), nullable=False)  # Código secuencial por capacidad
@@ -208,6 +213,7 @@ class ExamenLectura(Base):
     Cada exámen queda vinculado al docente que lo generó.
     """
     __tablename__ = "examenes_lectura"
+    __table_args__ = (Index("ix_examenes_lectura_docente_fecha", "docente_id", "fecha_creacion", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     docente_id = Column(Integer, ForeignKey("docentes.id"), nullable=False)
@@ -227,6 +233,7 @@ class ExamenLectura(Base):
     preguntas = Column(JSON, nullable=True)          # lista de preguntas con opciones
     tabla_respuestas = Column(JSON, nullable=True)   # tabla de respuestas correctas
     desempenos_usados = Column(Text, nullable=True)  # texto descriptivo de desempeños
+    total_preguntas = Column(Integer, nullable=False, default=0, server_default="0")  # len(preguntas), para listados
 
     # Relationships
     docente = relationship("Docente", back_populates="examenes_lectura")
@@ -242,6 +249,7 @@ class ExamenMatematica(Base):
     Cada exámen queda vinculado al docente que lo generó.
     """
     __tablename__ = "examenes_matematica"
+    __table_args__ = (Index("ix_examenes_matematica_docente_fecha", "docente_id", "fecha_creacion", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     docente_id = Column(Integer, ForeignKey("docentes.id"), nullable=False)
@@ -261,6 +269,7 @@ class ExamenMatematica(Base):
     preguntas = Column(JSON, nullable=True)          # lista de preguntas con opciones
     tabla_respuestas = Column(JSON, nullable=True)   # tabla de respuestas correctas
     desempenos_usados = Column(Text, nullable=True)  # texto descriptivo de desempeños
+    total_preguntas = Column(Integer, nullable=False, default=0, server_default="0")  # len(preguntas), para listados
 
     # Relationships
     docente = relationship("Docente", back_populates="examenes_matematica")
@@ -269,3 +278,213 @@ class ExamenMatematica(Base):
 
     def __repr__(self):
         return f"<ExamenMatematica id={self.id} docente={self.docente_id} grado={self.grado_nombre}>"
+
+
+def contar_preguntas(preguntas) -> int:
+    """Cantidad de preguntas de un exámen (0 si el JSON no es una lista)."""
+    return len(preguntas) if isinstance(preguntas, list) else 0
+
+
+@event.listens_for(ExamenLectura, "before_insert")
+@event.listens_for(ExamenLectura, "before_update")
+@event.listens_for(ExamenMatematica, "before_insert")
+@event.listens_for(ExamenMatematica, "before_update")
+def _actualizar_total_preguntas(mapper, connection, target):
+    """Mantiene total_preguntas sincronizado con el JSON de preguntas."""
+    target.total_preguntas = contar_preguntas(target.preguntas)
+
+
+class PreguntaBanco(Base):
+    """
+    Pregunta del banco de preguntas: una fila por pregunta de cada examen
+    guardado, para buscarla y reutilizarla al armar exámenes nuevos.
+    """
+    __tablename__ = "banco_preguntas"
+    __table_args__ = (
+        UniqueConstraint("area", "examen_id", "numero", name="uq_banco_preguntas_origen"),
+        Index("ix_banco_preguntas_area_grado", "area", "grado_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    area = Column(String(20), nullable=False)  # lectosistem, matsistem
+    examen_id = Column(Integer, nullable=False)  # examen de origen (examenes_lectura o examenes_matematica)
+    numero = Column(Integer, nullable=False)     # número de la pregunta en el examen de origen
+    docente_id = Column(Integer, ForeignKey("docentes.id", ondelete="SET NULL"), nullable=True)
+    grado_id = Column(Integer, ForeignKey("grados.id"), nullable=True)
+    competencia_id = Column(Integer, nullable=True)  # solo matemática
+    desempeno_id = Column(Integer, nullable=True)    # desempenos o desempenos_matematica según el área
+    desempeno_codigo = Column(String(10), nullable=True)
+    nivel = Column(String(20), nullable=True)        # LITERAL, INFERENCIAL, CRITICO (lectura)
+    capacidad = Column(String(300), nullable=True)   # capacidad (matemática)
+    nivel_dificultad = Column(String(50), nullable=True)
+
+    # Contenido
+    enunciado = Column(Text, nullable=False)
+    opciones = Column(JSON, nullable=False)
+    respuesta_correcta = Column(String(1), nullable=True)
+    justificacion = Column(Text, nullable=True)
+
+    # Búsqueda: texto para full-text y embedding disperso [[índice, peso], ...]
+    texto_busqueda = Column(Text, nullable=False)
+    embedding = Column(JSON, nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<PreguntaBanco {self.id} {self.area} examen={self.examen_id}#{self.numero}>"
+
+
+# =============================================================================
+# MODELOS DE INFRAESTRUCTURA
+# =============================================================================
+
+class RespuestaIACache(Base):
+    """
+    Caché persistente de respuestas de los modelos de IA.
+    La clave es un hash SHA-256 de (proveedor, modelo, prompt, configuración).
+    """
+    __tablename__ = "respuestas_ia_cache"
+
+    clave = Column(String(64), primary_key=True)
+    proveedor = Column(String(50), nullable=False)
+    modelo = Column(String(100), nullable=False)
+    respuesta = Column(Text, nullable=False)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_expiracion = Column(DateTime(timezone=True), nullable=False, index=True)
+    ultimo_acceso = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    aciertos = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RespuestaIACache {self.proveedor}/{self.modelo} {self.clave[:12]}>"
+
+
+class TrabajoGeneracion(Base):
+    """
+    Trabajo asíncrono de generación de exámenes.
+    Se persiste para que un reinicio del worker no pierda los trabajos encolados.
+    """
+    __tablename__ = "trabajos_generacion"
+
+    id = Column(String(36), primary_key=True)  # UUID
+    tipo = Column(String(20), nullable=False)  # lectosistem, matsistem
+    estado = Column(String(20), nullable=False, default="pendiente", index=True)  # pendiente, en_proceso, completado, error
+    parametros = Column(JSON, nullable=False)
+    resultado = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    docente_id = Column(Integer, ForeignKey("docentes.id", ondelete="SET NULL"), nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_inicio = Column(DateTime(timezone=True), nullable=True)
+    fecha_fin = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<TrabajoGeneracion {self.id} {self.tipo} {self.estado}>"
+
+
+class VersionCatalogo(Base):
+    """
+    Contador de versión de datos de referencia (p. ej. el currículo).
+    Las escrituras lo incrementan; cada worker compara su versión en memoria
+    con esta fila para saber si debe recargar.
+    """
+    __tablename__ = "versiones_catalogo"
+
+    nombre = Column(String(50), primary_key=True)  # "curriculo"
+    version = Column(Integer, nullable=False, default=0)
+    fecha_actualizacion = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<VersionCatalogo {self.nombre} v{self.version}>"
+
+
+class ExtraccionArchivoCache(Base):
+    """
+    Caché persistente del resultado de procesar un archivo subido
+    (veredicto de seguridad + texto extraído), indexada por el SHA-256
+    del contenido. Un cambio en las reglas del escáner cambia version_escaner
+    y deja sin efecto los veredictos anteriores.
+    """
+    __tablename__ = "extracciones_archivo_cache"
+
+    hash_contenido = Column(String(64), primary_key=True)  # SHA-256 del archivo (y de las opciones de extracción)
+    extension = Column(String(10), nullable=False)
+    version_escaner = Column(String(40), nullable=False)
+    valido = Column(Boolean, nullable=False)
+    texto = Column(Text, nullable=True)
+    error_status = Column(Integer, nullable=True)
+    error_detalle = Column(Text, nullable=True)
+    size_bytes = Column(Integer, nullable=False)   # tamaño del archivo original
+    tamano_texto = Column(Integer, nullable=False, default=0)  # bytes ocupados por el texto (límite de la caché)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    ultimo_acceso = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    aciertos = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ExtraccionArchivoCache {self.hash_contenido[:12]} {self.extension} valido={self.valido}>"
+
+
+class EspecificacionPool(Base):
+    """
+    Especificación de examen solicitada (parámetros normalizados) y su uso.
+    Las más solicitadas se mantienen con exámenes listos en pool_examenes.
+    """
+    __tablename__ = "pool_especificaciones"
+
+    clave = Column(String(64), primary_key=True)  # SHA-256 de (tipo, parámetros normalizados)
+    tipo = Column(String(20), nullable=False)     # lectosistem, matsistem
+    parametros = Column(JSON, nullable=False)
+    solicitudes = Column(Integer, nullable=False, default=0)
+    ultima_solicitud = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<EspecificacionPool {self.tipo} {self.clave[:12]} solicitudes={self.solicitudes}>"
+
+
+class ExamenPool(Base):
+    """
+    Examen generado por adelantado para una especificación frecuente.
+    Es de un solo uso: al servirlo pasa a estado "usado" con el docente que lo recibió.
+    """
+    __tablename__ = "pool_examenes"
+    __table_args__ = (Index("ix_pool_examenes_clave_estado", "clave", "estado"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    clave = Column(String(64), ForeignKey("pool_especificaciones.clave", ondelete="CASCADE"), nullable=False)
+    estado = Column(String(20), nullable=False, default="disponible")  # disponible, usado
+    version_curriculo = Column(Integer, nullable=False)  # se descarta si cambia el currículo
+    resultado = Column(JSON, nullable=False)
+    docente_id = Column(Integer, ForeignKey("docentes.id", ondelete="SET NULL"), nullable=True)
+    fecha_creacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_uso = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<ExamenPool {self.id} {self.clave[:12]} {self.estado}>"
+
+
+class SolicitudDocente(Base):
+    """
+    Última vez que un docente pidió una especificación de examen.
+    Si la repite dentro del TTL de la caché de IA se genera un examen nuevo
+    en lugar de devolverle la respuesta cacheada de la vez anterior.
+    """
+    __tablename__ = "solicitudes_docente"
+
+    docente_id = Column(Integer, ForeignKey("docentes.id", ondelete="CASCADE"), primary_key=True)
+    clave = Column(String(64), primary_key=True)  # SHA-256 de (tipo, parámetros sin el modo de caché)
+    ultima_solicitud = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<SolicitudDocente docente={self.docente_id} {self.clave[:12]}>"
+
+
+class MigracionEsquema(Base):
+    """
+    Registro de migraciones de esquema aplicadas (ver app/core/migrations.py).
+    """
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    nombre = Column(String(100), nullable=False)
+    fecha_aplicacion = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<MigracionEsquema {self.version} {self.nombre}>"
@@ -0,0 +1,118 @@
+"""
+Estructura de los exámenes que devuelve la IA (LectoSistem y MatSistem).
+
+Estos modelos se usan para dos cosas:
+    - generar el esquema de salida estructurada que se envía al proveedor
+      (Gemini response_schema, OpenAI json_schema), y
+    - validar la respuesta al parsearla.
+
+Solo son obligatorios los campos sin los que el examen no sirve (preguntas,
+enunciados y alternativas); el resto tiene valor por defecto para aceptar
+respuestas en caché generadas antes de usar esquemas. Se conservan los
+campos adicionales que devuelva el modelo.
+
+La tabla de respuestas no se pide al modelo: se deriva en el servidor
+(ver app/services/answer_key.py) a partir de las preguntas, que traen
+su propia justificación.
+"""
+from pydantic import BaseModel, ConfigDict, Field
+
+LETRAS = ["A", "B", "C", "D"]
+
+
+class ModeloIA(BaseModel):
+    """Base: admite campos adicionales en la respuesta."""
+    model_config = ConfigDict(extra="allow")
+
+
+class OpcionExamen(ModeloIA):
+    """Alternativa de una pregunta de opción múltiple."""
+
+    letra: str = Field(..., description="Letra de la alternativa", json_schema_extra={"enum": LETRAS})
+    texto: str = Field(..., description="Texto de la alternativa")
+    es_correcta: bool = Field(default=False, description="Indica si es la alternativa correcta")
+
+
+class PreguntaLectura(ModeloIA):
+    """Pregunta de comprensión lectora."""
+
+    numero: int = Field(..., description="Número de la pregunta")
+    enunciado: str = Field(..., description="Texto de la pregunta")
+    opciones: list[OpcionExamen] = Field(..., description="Cuatro alternativas, una sola correcta")
+    desempeno_codigo: str = Field(default="", description="Código del desempeño evaluado")
+    nivel: str = Field(default="", description="LITERAL, INFERENCIAL o CRITICO")
+    justificacion: str = Field(default="", description="Por qué es la respuesta correcta")
+
+
+class ExamenLectura(ModeloIA):
+    """Examen de comprensión lectora."""
+
+    titulo: str = Field(default="", description="Título motivador del examen")
+    grado: str = Field(default="", description="Nombre del grado")
+    instrucciones: str = Field(default="", description="Instrucciones para responder el examen")
+    lectura: str = Field(default="", description="Texto de lectura completo o fragmento")
+    preguntas: list[PreguntaLectura] = Field(..., description="Preguntas del examen")
+
+
+class RespuestaExamenLectura(ModeloIA):
+    """Respuesta completa de la IA para LectoSistem."""
+
+    saludo: str = Field(default="", description="Saludo amable del experto")
+    examen: ExamenLectura
+
+
+class PreguntaMatematica(ModeloIA):
+    """Pregunta de matemática sobre la situación problemática."""
+
+    numero: int = Field(..., description="Número de la pregunta")
+    enunciado: str = Field(..., description="Enunciado del problema")
+    opciones: list[OpcionExamen] = Field(..., description="Cuatro alternativas, una sola correcta")
+    capacidad: str = Field(default="", description="Capacidad asociada")
+    desempeno_codigo: str = Field(default="", description="Código del desempeño evaluado")
+    criterio_evaluacion: str = Field(default="", description="[Habilidad] + [Contenido] + [Condición]")
+    justificacion: str = Field(default="", description="Resolución paso a paso")
+
+
+class ExamenMatematica(ModeloIA):
+    """Examen de matemática."""
+
+    titulo: str = Field(default="", description="Título motivador")
+    grado: str = Field(default="", description="Nombre del grado")
+    competencia: str = Field(default="", description="Nombre de la competencia")
+    instrucciones: str = Field(default="", description="Instrucciones para resolver")
+    situacion_problematica: str = Field(default="", description="Texto de la situación significativa")
+    preguntas: list[PreguntaMatematica] = Field(..., description="Preguntas del examen")
+
+
+class RespuestaExamenMatematica(ModeloIA):
+    """Respuesta completa de la IA para MatSistem."""
+
+    saludo: str = Field(default="", description="Saludo de MateJony")
+    examen: ExamenMatematica
+
+
+class RespuestaReparacionLectura(ModeloIA):
+    """Preguntas de reemplazo para un examen de LectoSistem."""
+
+    preguntas: list[PreguntaLectura] = Field(..., description="Preguntas de reemplazo")
+
+
+class EncabezadoLectura(ModeloIA):
+    """Primera etapa de la generación por secciones: saludo, título, instrucciones y lectura."""
+
+    saludo: str = Field(default="", description="Saludo amable del experto")
+    titulo: str = Field(default="", description="Título motivador del examen")
+    instrucciones: str = Field(default="", description="Instrucciones para responder el examen")
+    lectura: str = Field(default="", description="Texto de lectura (vacío si ya se proporcionó)")
+
+
+class RespuestaPreguntasNivel(ModeloIA):
+    """Preguntas de un solo nivel (LITERAL, INFERENCIAL o CRITICO) sobre una lectura."""
+
+    preguntas: list[PreguntaLectura] = Field(..., description="Preguntas del nivel solicitado")
+
+
+class RespuestaReparacionMatematica(ModeloIA):
+    """Preguntas de reemplazo para un examen de MatSistem."""
+
+    preguntas: list[PreguntaMatematica] = Field(..., description="Preguntas de reemplazo")
@@ -20,6 +20,9 @@ from app.routes.admin import router as admin_router
 from app.routes.matsistem import router as matsistem_router
 from app.routes.auth import router as auth_router
 from app.routes.examenes import router as examenes_router
+from app.routes.jobs import router as jobs_router
+from app.routes.lotes import router as lotes_router
+from app.routes.banco import router as banco_router
 
 
 def create_api_router() -> APIRouter:
@@ -81,6 +84,33 @@ def create_api_router() -> APIRouter:
         tags=["Exámenes Guardados"]
     )
 
+    # ==========================================================================
+    # MÓDULO: TRABAJOS DE GENERACIÓN (asíncronos)
+    # ==========================================================================
+    api_router.include_router(
+        jobs_router,
+        prefix="/jobs",
+        tags=["Trabajos de Generación"]
+    )
+
+    # ==========================================================================
+    # MÓDULO: GENERACIÓN POR LOTES
+    # ==========================================================================
+    api_router.include_router(
+        lotes_router,
+        prefix="/lotes",
+        tags=["Generación por Lotes"]
+    )
+
+    # ==========================================================================
+    # MÓDULO: BANCO DE PREGUNTAS
+    # ==========================================================================
+    api_router.include_router(
+        banco_router,
+        prefix="/banco",
+        tags=["Banco de Preguntas"]
+    )
+
     return api_router
 
 
@@ -9,6 +9,7 @@ from app.models.db_models import Grado, Capacidad, Desempeno
 from app.models.docente import Docente as DocenteModel
 from app.schemas.docente import Docente, DocenteAdminCreate, DocenteUpdate
 from app.services.docente_service import docente_service
+from app.services.curriculum_service import curriculum_service
 from app.api.dependencies import get_current_superuser
 
 router = APIRouter()
@@ -91,6 +92,7 @@ async def create_grado(
 ):
     db_grado = Grado(**grado.dict())
     db.add(db_grado)
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_grado)
     return db_grado
@@ -121,6 +123,7 @@ async def update_grado(
     for key, value in grado.dict().items():
         setattr(db_grado, key, value)
 
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_grado)
     return db_grado
@@ -139,6 +142,7 @@ async def delete_grado(
         raise HTTPException(status_code=404, detail="Grado not found")
 
     await db.delete(db_grado)
+    await curriculum_service.invalidar(db)
     await db.commit()
     return {"message": "Grado deleted successfully"}
 
@@ -153,6 +157,7 @@ async def create_capacidad(
 ):
     db_capacidad = Capacidad(**capacidad.dict())
     db.add(db_capacidad)
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_capacidad)
     return db_capacidad
@@ -183,6 +188,7 @@ async def update_capacidad(
     for key, value in capacidad.dict().items():
         setattr(db_capacidad, key, value)
 
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_capacidad)
     return db_capacidad
@@ -201,6 +207,7 @@ async def delete_capacidad(
         raise HTTPException(status_code=404, detail="Capacidad not found")
 
     await db.delete(db_capacidad)
+    await curriculum_service.invalidar(db)
     await db.commit()
     return {"message": "Capacidad deleted successfully"}
 
@@ -215,6 +222,7 @@ async def create_desempeno(
 ):
     db_desempeno = Desempeno(**desempeno.dict())
     db.add(db_desempeno)
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_desempeno)
     return db_desempeno
@@ -236,6 +244,7 @@ async def update_desempeno(
     for key, value in desempeno.dict().items():
         setattr(db_desempeno, key, value)
 
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_desempeno)
     return db_desempeno
@@ -254,6 +263,7 @@ async def delete_desempeno(
         raise HTTPException(status_code=404, detail="Desempeno not found")
 
     await db.delete(db_desempeno)
+    await curriculum_service.invalidar(db)
     await db.commit()
     return {"message": "Desempeno deleted successfully"}
 
@@ -354,3 +364,57 @@ async def toggle_active(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     update_data = {"is_active": not docente.is_active}
     return await docente_repository.update(db, docente, update_data)
+
+
+# --- Proveedores de IA ---
+
+@router.get("/ia/limites")
+async def get_limites_ia(
+    current_user: DocenteModel = Depends(get_current_superuser)
+):
+    """Cuotas, concurrencia adaptativa, cola, enrutamiento, tokens cacheados por el proveedor, pool de exámenes y banco de preguntas."""
+    from app.services.ai_rate_limiter import ai_rate_limiter
+    from app.services.ai_router import ai_router
+    from app.services.context_cache import context_cache
+    from app.services.exam_pool import exam_pool
+    from app.services.exam_repair import exam_repair
+    from app.services.job_service import job_service
+    from app.services.question_bank import question_bank
+    from app.services.structured_output import structured_output
+    return {
+        "proveedores": ai_rate_limiter.stats(["gemini", "chatgpt"]),
+        "enrutamiento": ai_router.stats(),
+        "trabajos": job_service.stats(),
+        "cache_contexto": context_cache.stats(),
+        "salida_estructurada": structured_output.stats(),
+        "reparacion_examenes": exam_repair.stats(),
+        "pool_examenes": exam_pool.stats(),
+        "banco_preguntas": question_bank.stats(),
+    }
+
+
+# --- Archivos subidos ---
+
+@router.get("/archivos/cache")
+async def get_cache_archivos(
+    current_user: DocenteModel = Depends(get_current_superuser)
+):
+    """Estado del pool de procesos y de la caché de extracciones de archivos subidos."""
+    from app.services.extraction_cache import extraction_cache
+    from app.services.file_service import SCANNER_VERSION
+    from app.services.process_pool import process_pool
+    return {
+        "version_escaner": SCANNER_VERSION,
+        "cache": extraction_cache.stats(),
+        "pool": process_pool.stats(),
+    }
+
+
+@router.delete("/archivos/cache")
+async def limpiar_cache_archivos(
+    current_user: DocenteModel = Depends(get_current_superuser)
+):
+    """Vacía la caché de extracciones (los archivos se volverán a procesar)."""
+    from app.services.extraction_cache import extraction_cache
+    await extraction_cache.clear()
+    return {"message": "Caché de archivos vaciada"}
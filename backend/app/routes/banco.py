@@ -0,0 +1,85 @@
+"""
+Router del banco de preguntas: búsqueda de preguntas ya generadas y armado
+de exámenes nuevos a partir de ellas (sin llamar al modelo de IA).
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+from app.core.database import get_db
+from app.models.docente import Docente as DocenteModel
+from app.api.dependencies import get_current_active_user
+from app.services.question_bank import question_bank
+
+router = APIRouter()
+
+
+# =============================================================================
+# SCHEMAS
+# =============================================================================
+
+class ArmarExamenRequest(BaseModel):
+    """Preguntas del banco con las que se arma el examen, en orden."""
+    area: Literal["lectosistem", "matsistem"] = Field(..., description="Módulo: lectosistem o matsistem")
+    pregunta_ids: List[int] = Field(..., min_length=1, max_length=50, description="IDs de preguntas del banco")
+    titulo: Optional[str] = Field(None, description="Título del examen")
+
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+@router.get("/preguntas")
+async def buscar_preguntas(
+    q: Optional[str] = Query(default=None, description="Texto a buscar en enunciados y alternativas"),
+    modo: Literal["texto", "semantico"] = Query(default="texto", description="texto (full-text) o semantico (preguntas parecidas)"),
+    area: Optional[Literal["lectosistem", "matsistem"]] = None,
+    grado_id: Optional[int] = None,
+    desempeno_id: Optional[int] = None,
+    nivel: Optional[str] = Query(default=None, description="LITERAL, INFERENCIAL o CRITICO (lectura)"),
+    nivel_dificultad: Optional[str] = None,
+    limite: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: DocenteModel = Depends(get_current_active_user),
+):
+    """
+    Busca preguntas en el banco, filtrando por área, grado, desempeño, nivel y dificultad.
+    Sin **q** devuelve las más recientes.
+    """
+    try:
+        return await question_bank.buscar(
+            db,
+            q=q,
+            modo=modo,
+            area=area,
+            grado_id=grado_id,
+            desempeno_id=desempeno_id,
+            nivel=nivel,
+            nivel_dificultad=nivel_dificultad,
+            limite=limite
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/examenes")
+async def armar_examen(
+    request: ArmarExamenRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: DocenteModel = Depends(get_current_active_user),
+):
+    """
+    Arma un examen con preguntas del banco, con las lecturas o situaciones de
+    origen y la tabla de respuestas. Se guarda con POST /examenes/lectura o
+    /examenes/matematica, igual que un examen generado.
+    """
+    try:
+        return await question_bank.armar_examen(
+            db,
+            area=request.area,
+            pregunta_ids=request.pregunta_ids,
+            titulo=request.titulo
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,18 @@
 """
 Router para gestionar exámenes generados (Lectura y Matemática).
 Los exámenes quedan vinculados al docente autenticado.
+
+Los listados se paginan por cursor (keyset) sobre (fecha_creacion, id)
+cuando se indica ?limite= o ?cursor=: el cursor de la siguiente página se
+devuelve en la cabecera X-Next-Cursor y se envía de vuelta en ?cursor=.
+Sin ninguno de los dos se devuelve el historial completo.
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import binascii
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, and_, or_
 from pydantic import BaseModel
 from typing import Optional, List, Any
 from datetime import datetime
@@ -13,6 +21,7 @@ from app.core.database import get_db
 from app.models.db_models import ExamenLectura, ExamenMatematica
 from app.models.docente import Docente as DocenteModel
 from app.api.dependencies import get_current_active_user
+from app.services.question_bank import question_bank
 
 router = APIRouter()
 
@@ -124,6 +133,73 @@ class ExamenMatematicaListResponse(BaseModel):
         from_attributes = True
 
 
+# =============================================================================
+# PAGINACIÓN POR CURSOR
+# =============================================================================
+
+LIMITE_LISTADO = 50
+LIMITE_LISTADO_MAX = 200
+
+
+def _codificar_cursor(examen_id: int) -> str:
+    """Cursor opaco con el id del último elemento de la página."""
+    return base64.urlsafe_b64encode(str(examen_id).encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> int:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(cursor + relleno).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+async def _listar_resumen(
+    db: AsyncSession,
+    modelo,
+    columnas: list,
+    docente_id: int,
+    limite: Optional[int],
+    cursor: Optional[str],
+    response: Response,
+) -> list:
+    """
+    Exámenes del docente, del más reciente al más antiguo.
+
+    Solo selecciona las columnas del resumen: lectura, situación, preguntas
+    y tabla de respuestas nunca se leen de la base de datos.
+
+    Sin limite ni cursor devuelve el historial completo (comportamiento
+    anterior, el que usa el frontend); con cualquiera de los dos pagina.
+    """
+    query = (
+        select(*columnas)
+        .where(modelo.docente_id == docente_id)
+        .order_by(modelo.fecha_creacion.desc(), modelo.id.desc())
+    )
+    if limite is None and cursor is None:
+        return (await db.execute(query)).all()
+
+    limite = limite or LIMITE_LISTADO
+    if cursor:
+        ultimo_id = _decodificar_cursor(cursor)
+        # La fecha del límite se lee de la propia fila: comparar contra un valor
+        # enviado por el cliente falla en SQLite (guarda la fecha como texto sin
+        # microsegundos). Si la fila ya se eliminó, se continúa por id.
+        fecha = select(modelo.fecha_creacion).where(modelo.id == ultimo_id).scalar_subquery()
+        query = query.where(or_(
+            modelo.fecha_creacion < fecha,
+            and_(modelo.fecha_creacion == fecha, modelo.id < ultimo_id),
+            and_(fecha.is_(None), modelo.id < ultimo_id),
+        ))
+
+    filas = (await db.execute(query.limit(limite + 1))).all()
+    if len(filas) > limite:
+        filas = filas[:limite]
+        response.headers["X-Next-Cursor"] = _codificar_cursor(filas[-1].id)
+    return filas
+
+
 # =============================================================================
 # ENDPOINTS - EXÁMENES DE LECTURA
 # =============================================================================
@@ -143,6 +219,8 @@ async def guardar_examen_lectura(
         **examen_in.model_dump(exclude_none=False)
     )
     db.add(db_examen)
+    await db.flush()
+    await question_bank.registrar(db, "lectosistem", [db_examen])
     await db.commit()
     await db.refresh(db_examen)
     return db_examen
@@ -150,36 +228,40 @@ async def guardar_examen_lectura(
 
 @router.get("/lectura", response_model=List[ExamenLecturaListResponse])
 async def listar_examenes_lectura(
+    response: Response,
+    limite: Optional[int] = Query(
+        default=None, ge=1, le=LIMITE_LISTADO_MAX,
+        description=f"Tamaño de página (sin limite ni cursor se devuelven todos; con cursor, {LIMITE_LISTADO} por defecto)"
+    ),
+    cursor: Optional[str] = Query(default=None, description="Valor de X-Next-Cursor de la página anterior"),
     db: AsyncSession = Depends(get_db),
     current_user: DocenteModel = Depends(get_current_active_user),
 ):
     """
-    Lista todos los exámenes de lectura del docente autenticado,
+    Lista los exámenes de lectura del docente autenticado,
     ordenados del más reciente al más antiguo.
+    Con ?limite= se pagina: si hay más resultados, la cabecera X-Next-Cursor
+    trae el cursor de la siguiente página.
     """
-    result = await db.execute(
-        select(ExamenLectura)
-        .where(ExamenLectura.docente_id == current_user.id)
-        .order_by(ExamenLectura.fecha_creacion.desc())
+    return await _listar_resumen(
+        db,
+        ExamenLectura,
+        [
+            ExamenLectura.id,
+            ExamenLectura.docente_id,
+            ExamenLectura.grado_id,
+            ExamenLectura.fecha_creacion,
+            ExamenLectura.titulo,
+            ExamenLectura.grado_nombre,
+            ExamenLectura.nivel_dificultad,
+            ExamenLectura.modelo_ia,
+            ExamenLectura.total_preguntas,
+        ],
+        current_user.id,
+        limite,
+        cursor,
+        response,
     )
-    examenes = result.scalars().all()
-
-    # Calcular total_preguntas para cada examen
-    response = []
-    for ex in examenes:
-        total = len(ex.preguntas) if isinstance(ex.preguntas, list) else 0
-        response.append(ExamenLecturaListResponse(
-            id=ex.id,
-            docente_id=ex.docente_id,
-            grado_id=ex.grado_id,
-            fecha_creacion=ex.fecha_creacion,
-            titulo=ex.titulo,
-            grado_nombre=ex.grado_nombre,
-            nivel_dificultad=ex.nivel_dificultad,
-            modelo_ia=ex.modelo_ia,
-            total_preguntas=total,
-        ))
-    return response
 
 
 @router.get("/lectura/{examen_id}", response_model=ExamenLecturaResponse)
@@ -221,6 +303,7 @@ async def eliminar_examen_lectura(
     examen = result.scalars().first()
     if not examen:
         raise HTTPException(status_code=404, detail="Examen no encontrado")
+    await question_bank.eliminar_examen(db, "lectosistem", examen.id)
     await db.delete(examen)
     await db.commit()
     return {"message": "Examen eliminado correctamente"}
@@ -245,6 +328,8 @@ async def guardar_examen_matematica(
         **examen_in.model_dump(exclude_none=False)
     )
     db.add(db_examen)
+    await db.flush()
+    await question_bank.registrar(db, "matsistem", [db_examen])
     await db.commit()
     await db.refresh(db_examen)
     return db_examen
@@ -252,36 +337,41 @@ async def guardar_examen_matematica(
 
 @router.get("/matematica", response_model=List[ExamenMatematicaListResponse])
 async def listar_examenes_matematica(
+    response: Response,
+    limite: Optional[int] = Query(
+        default=None, ge=1, le=LIMITE_LISTADO_MAX,
+        description=f"Tamaño de página (sin limite ni cursor se devuelven todos; con cursor, {LIMITE_LISTADO} por defecto)"
+    ),
+    cursor: Optional[str] = Query(default=None, description="Valor de X-Next-Cursor de la página anterior"),
     db: AsyncSession = Depends(get_db),
     current_user: DocenteModel = Depends(get_current_active_user),
 ):
     """
-    Lista todos los exámenes de matemática del docente autenticado,
+    Lista los exámenes de matemática del docente autenticado,
     ordenados del más reciente al más antiguo.
+    Con ?limite= se pagina: si hay más resultados, la cabecera X-Next-Cursor
+    trae el cursor de la siguiente página.
     """
-    result = await db.execute(
-        select(ExamenMatematica)
-        .where(ExamenMatematica.docente_id == current_user.id)
-        .order_by(ExamenMatematica.fecha_creacion.desc())
+    return await _listar_resumen(
+        db,
+        ExamenMatematica,
+        [
+            ExamenMatematica.id,
+            ExamenMatematica.docente_id,
+            ExamenMatematica.grado_id,
+            ExamenMatematica.competencia_id,
+            ExamenMatematica.fecha_creacion,
+            ExamenMatematica.titulo,
+            ExamenMatematica.grado_nombre,
+            ExamenMatematica.nivel_dificultad,
+            ExamenMatematica.modelo_ia,
+            ExamenMatematica.total_preguntas,
+        ],
+        current_user.id,
+        limite,
+        cursor,
+        response,
     )
-    examenes = result.scalars().all()
-
-    response = []
-    for ex in examenes:
-        total = len(ex.preguntas) if isinstance(ex.preguntas, list) else 0
-        response.append(ExamenMatematicaListResponse(
-            id=ex.id,
-            docente_id=ex.docente_id,
-            grado_id=ex.grado_id,
-            competencia_id=ex.competencia_id,
-            fecha_creacion=ex.fecha_creacion,
-            titulo=ex.titulo,
-            grado_nombre=ex.grado_nombre,
-            nivel_dificultad=ex.nivel_dificultad,
-            modelo_ia=ex.modelo_ia,
-            total_preguntas=total,
-        ))
-    return response
 
 
 @router.get("/matematica/{examen_id}", response_model=ExamenMatematicaResponse)
@@ -323,6 +413,7 @@ async def eliminar_examen_matematica(
     examen = result.scalars().first()
     if not examen:
         raise HTTPException(status_code=404, detail="Examen no encontrado")
+    await question_bank.eliminar_examen(db, "matsistem", examen.id)
     await db.delete(examen)
     await db.commit()
     return {"message": "Examen eliminado correctamente"}
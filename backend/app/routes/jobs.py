@@ -0,0 +1,145 @@
+"""
+Router para la generación asíncrona de exámenes mediante trabajos en cola.
+
+El envío devuelve el id del trabajo de inmediato (202) y el cliente consulta
+su estado con GET /jobs/{id} o espera a que termine con GET /jobs/{id}/esperar.
+Los trabajos enviados con sesión solo los puede consultar el mismo docente.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+from typing import Optional, Any
+from datetime import datetime
+
+from app.core.database import get_db
+from app.models.docente import Docente as DocenteModel
+from app.api.dependencies import get_current_user_optional
+from app.routes.lectosistem import GenerarPreguntasRequest
+from app.routes.matsistem import GenerarExamenMatRequest
+from app.services.ai_cache import solicitudes_docente
+from app.services.ai_factory import ai_factory
+from app.services.job_service import job_service, ESTADOS_FINALES
+
+router = APIRouter()
+
+
+# =============================================================================
+# SCHEMAS
+# =============================================================================
+
+class TrabajoResponse(BaseModel):
+    """Estado de un trabajo de generación."""
+    id: str
+    tipo: str
+    estado: str
+    resultado: Optional[Any] = None
+    error: Optional[str] = None
+    intentos: int
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+async def _enviar(
+    tipo: str,
+    parametros: dict,
+    db: AsyncSession,
+    current_user: Optional[DocenteModel]
+):
+    try:
+        # Validar el modelo antes de encolar para fallar rápido
+        ai_factory.get_service(parametros.get("modelo") or "gemini")
+        docente_id = current_user.id if current_user else None
+        parametros["cache"] = await solicitudes_docente.modo(tipo, parametros, docente_id)
+        return await job_service.enviar(
+            db,
+            tipo=tipo,
+            parametros=parametros,
+            docente_id=docente_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/lectosistem", response_model=TrabajoResponse, status_code=status.HTTP_202_ACCEPTED)
+async def enviar_trabajo_lectosistem(
+    request: GenerarPreguntasRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional),
+):
+    """
+    Encola la generación de un examen de comprensión lectora.
+    Devuelve el id del trabajo sin esperar a la IA.
+    """
+    return await _enviar("lectosistem", request.model_dump(), db, current_user)
+
+
+@router.post("/matsistem", response_model=TrabajoResponse, status_code=status.HTTP_202_ACCEPTED)
+async def enviar_trabajo_matsistem(
+    request: GenerarExamenMatRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional),
+):
+    """
+    Encola la generación de un examen de matemática.
+    Devuelve el id del trabajo sin esperar a la IA.
+    """
+    return await _enviar("matsistem", request.model_dump(), db, current_user)
+
+
+async def _obtener_propio(
+    db: AsyncSession,
+    trabajo_id: str,
+    current_user: Optional[DocenteModel]
+):
+    """
+    Trabajo solicitado, solo si lo envió el docente autenticado o se envió sin
+    sesión. Para cualquier otro docente se responde 404 (no se revela que existe).
+    """
+    trabajo = await job_service.obtener(db, trabajo_id)
+    if not trabajo or (
+        trabajo.docente_id is not None
+        and (current_user is None or current_user.id != trabajo.docente_id)
+    ):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@router.get("/{trabajo_id}", response_model=TrabajoResponse)
+async def obtener_trabajo(
+    trabajo_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional),
+):
+    """Consulta el estado (y el resultado, si terminó) de un trabajo."""
+    return await _obtener_propio(db, trabajo_id, current_user)
+
+
+@router.get("/{trabajo_id}/esperar", response_model=TrabajoResponse)
+async def esperar_trabajo(
+    trabajo_id: str,
+    timeout: float = Query(default=30, ge=1, le=60, description="Segundos máximos de espera"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional),
+):
+    """
+    Espera (long polling) hasta que el trabajo termine o se agote el tiempo,
+    y devuelve su estado actual.
+    """
+    trabajo = await _obtener_propio(db, trabajo_id, current_user)
+
+    if trabajo.estado not in ESTADOS_FINALES:
+        # No mantener la conexión ocupada durante la espera
+        await db.commit()
+        await job_service.esperar(trabajo_id, timeout)
+        db.expire_all()
+        trabajo = await job_service.obtener(db, trabajo_id)
+
+    return trabajo
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
+from typing import Optional, Literal
 from pydantic import BaseModel, Field
 
 from app.core.database import get_db
-from app.models.db_models import Grado, Capacidad, Desempeno, ExamenLectura
+from app.core.sse import respuesta_sse
+from app.models.docente import Docente as DocenteModel
 from app.services.lectosistem_service import lectosistem_service
+from app.services.curriculum_service import CurriculumSnapshot
+from app.api.dependencies import get_curriculo, get_current_user_optional
 from app.services import file_service
 from app.services.word_generator import generar_examen_word
+from app.services.ai_cache import solicitudes_docente
+from app.services.ai_rate_limiter import ProviderOverloadedError
+from app.services.exam_pool import exam_pool
 
 router = APIRouter()
 
@@ -56,28 +64,38 @@ class GenerarPreguntasRequest(BaseModel):
     cantidad: int = Field(default=3, ge=1, le=10, description="Cantidad de preguntas a generar")
     texto_base: Optional[str] = Field(None, description="Texto de lectura para basar las preguntas")
     desempeno_ids: Optional[list[int]] = Field(None, description="IDs de desempeños seleccionados")
-    modelo: Optional[str] = Field("gemini", description="Modelo de IA a usar: gemini o chatgpt")
+    modelo: Optional[str] = Field("gemini", description="Modelo de IA a usar: gemini, chatgpt o auto")
     tipo_textual: Optional[str] = Field(None, description="Tipo textual: narrativo, descriptivo, instructivo, argumentativo, expositivo")
     formato_textual: Optional[str] = Field(None, description="Formato textual: continuo, discontinuo, mixto, multiple")
     cantidad_literal: Optional[int] = Field(None, ge=0, description="Cantidad de preguntas literales")
     cantidad_inferencial: Optional[int] = Field(None, ge=0, description="Cantidad de preguntas inferenciales")
     cantidad_critico: Optional[int] = Field(None, ge=0, description="Cantidad de preguntas críticas")
+    cache: Optional[Literal["bypass", "prefer", "only"]] = Field(
+        default=None,
+        description=(
+            "Uso de la caché de respuestas: bypass (ignorar), prefer (usar si existe), only (solo caché). "
+            "Sin indicar: prefer, o bypass si el mismo docente repite la solicitud"
+        )
+    )
+    modo_generacion: Literal["completo", "paralelo"] = Field(
+        default="completo",
+        description="completo (una sola llamada) o paralelo (lectura primero y luego una llamada por nivel en paralelo)"
+    )
 
 
 
 # Endpoints
 @router.get("/grados", response_model=list[GradoResponse])
-async def listar_grados(db: AsyncSession = Depends(get_db)):
+async def listar_grados(curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """Lista todos los grados escolares disponibles."""
-    grados = await lectosistem_service.get_grados(db)
-    return grados
+    return curriculo.grados
 
 
 @router.get("/grados/{grado_id}/desempenos")
 async def listar_desempenos_por_grado(
     grado_id: int,
     tipo_capacidad: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Lista los desempeños de un grado específico.
@@ -85,18 +103,15 @@ async def listar_desempenos_por_grado(
     - **grado_id**: ID del grado
     - **tipo_capacidad**: Filtrar por tipo (literal, inferencial, critico)
     """
-    if tipo_capacidad:
-        desempenos = await lectosistem_service.get_desempenos_por_capacidad(db, grado_id, tipo_capacidad)
-    else:
-        desempenos = await lectosistem_service.get_desempenos_por_grado(db, grado_id)
+    desempenos = curriculo.get_desempenos_lectura(grado_id, tipo_capacidad)
     
     return [
         {
-            "id": d.id,
-            "codigo": d.codigo,
-            "descripcion": d.descripcion,
-            "capacidad_tipo": d.capacidad.tipo if d.capacidad else None,
-            "capacidad_nombre": d.capacidad.nombre if d.capacidad else None
+            "id": d["id"],
+            "codigo": d["codigo"],
+            "descripcion": d["descripcion"],
+            "capacidad_tipo": d["capacidad_tipo"],
+            "capacidad_nombre": d["capacidad_nombre"]
         }
         for d in desempenos
     ]
@@ -145,13 +160,24 @@ async def listar_niveles_logro():
 async def generar_preguntas_lectura(
     request: GenerarPreguntasRequest,
     req: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional)
 ):
     """
     Genera preguntas de comprensión lectora basadas en desempeños seleccionados.
     Si el request incluye un token JWT válido, el exámen se guarda automáticamente.
+    Las especificaciones frecuentes se sirven al instante desde el pool de exámenes.
     """
     try:
+        servido = await exam_pool.tomar(
+            db, "lectosistem", request.model_dump(), current_user.id if current_user else None
+        )
+        if servido is not None:
+            return servido
+
+        cache = await solicitudes_docente.modo(
+            "lectosistem", request.model_dump(), current_user.id if current_user else None
+        )
         result = await lectosistem_service.generar_preguntas_por_desempenos(
             db=db,
             grado_id=request.grado_id,
@@ -164,39 +190,85 @@ async def generar_preguntas_lectura(
             formato_textual=request.formato_textual,
             cantidad_literal=request.cantidad_literal,
             cantidad_inferencial=request.cantidad_inferencial,
-            cantidad_critico=request.cantidad_critico
+            cantidad_critico=request.cantidad_critico,
+            cache=cache,
+            modo_generacion=request.modo_generacion
         )
 
         return result
+    except ProviderOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 
+@router.post("/generar/stream")
+async def generar_preguntas_lectura_stream(
+    request: GenerarPreguntasRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional)
+):
+    """
+    Variante en streaming (Server-Sent Events) de /generar.
+
+    Eventos emitidos a medida que el modelo los completa:
+    saludo, titulo, instrucciones, lectura, pregunta (una por pregunta)
+    y, al final, completado (resultado completo) o error.
+    """
+    try:
+        lectosistem_service.get_ai_service(request.modelo)
+        preparacion = await lectosistem_service.preparar_examen_lectura(
+            db,
+            grado_id=request.grado_id,
+            desempeno_ids=request.desempeno_ids or [],
+            cantidad=request.cantidad,
+            texto_base=request.texto_base,
+            nivel_dificultad=request.nivel_dificultad,
+            tipo_textual=request.tipo_textual,
+            formato_textual=request.formato_textual,
+            cantidad_literal=request.cantidad_literal,
+            cantidad_inferencial=request.cantidad_inferencial,
+            cantidad_critico=request.cantidad_critico,
+            modelo=request.modelo,
+            modo_generacion=request.modo_generacion
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Liberar la conexión antes de iniciar el streaming
+    await db.commit()
+    cache = await solicitudes_docente.modo(
+        "lectosistem", request.model_dump(), current_user.id if current_user else None
+    )
+
+    return respuesta_sse(
+        lectosistem_service.generar_stream_desde_preparacion(
+            preparacion, modelo=request.modelo, cache=cache
+        )
+    )
+
+
 @router.get("/capacidades")
-async def listar_capacidades(db: AsyncSession = Depends(get_db)):
+async def listar_capacidades(curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """Lista todas las capacidades disponibles."""
-    from sqlalchemy import select
-    result = await db.execute(select(Capacidad))
-    capacidades = result.scalars().all()
-    
-    return [
-        {
-            "id": c.id,
-            "nombre": c.nombre,
-            "tipo": c.tipo,
-            "descripcion": c.descripcion
-        }
-        for c in capacidades
-    ]
+    return curriculo.capacidades
 
 
 @router.post("/upload-texto")
-async def upload_texto_base(files: list[UploadFile] = File(...)):
+async def upload_texto_base(
+    files: list[UploadFile] = File(...),
+    paginas: Optional[str] = Form(default=None, description="Páginas de los PDF a extraer, p. ej. '3-4,10'"),
+    seccion: Optional[str] = Form(default=None, description="Título o tema de la sección a conservar")
+):
     """
     Sube uno o más archivos PDF o Word y extrae el texto para usarlo como base de preguntas.
 
+    Para no enviar un libro entero al modelo se puede acotar la extracción:
+    - paginas: solo se leen esas páginas de cada PDF (se ignora en Word)
+    - seccion: se detectan los títulos y se conserva solo la sección más relevante
+
     Validaciones de seguridad aplicadas:
     - Máximo 5 archivos por petición
     - Extensiones permitidas: .pdf, .docx, .doc
@@ -219,24 +291,35 @@ async def upload_texto_base(files: list[UploadFile] = File(...)):
     if len(files) == 0:
         raise HTTPException(status_code=400, detail="Debe enviar al menos un archivo.")
 
+    rangos = file_service.parsear_rangos_paginas(paginas)
+    seccion = seccion.strip() if seccion else None
+
     textos = []
     archivos_metadata = []
     errores = []
     total_palabras = 0
     total_caracteres = 0
 
-    for file in files:
-        try:
-            text, metadata = await file_service.extract_text_from_file(file)
-            textos.append(f"=== {metadata['filename']} ===\n{text}")
-            archivos_metadata.append(metadata)
-            total_palabras += metadata["palabras"]
-            total_caracteres += metadata["caracteres"]
-        except HTTPException as e:
+    # Los archivos se procesan en paralelo; el orden del resultado respeta el de la petición
+    resultados = await asyncio.gather(
+        *(file_service.extract_text_from_file(file, rangos, seccion) for file in files),
+        return_exceptions=True
+    )
+
+    for file, resultado in zip(files, resultados):
+        if isinstance(resultado, HTTPException):
             errores.append({
                 "archivo": file.filename or "desconocido",
-                "error": e.detail
+                "error": resultado.detail
             })
+            continue
+        if isinstance(resultado, BaseException):
+            raise resultado
+        text, metadata = resultado
+        textos.append(f"=== {metadata['filename']} ===\n{text}")
+        archivos_metadata.append(metadata)
+        total_palabras += metadata["palabras"]
+        total_caracteres += metadata["caracteres"]
 
     # Si todos los archivos fallaron, retornar error
     if not textos and errores:
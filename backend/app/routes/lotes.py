@@ -0,0 +1,75 @@
+"""
+Router para la generación de exámenes por lotes (campañas de la DRE/UGEL).
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+
+from app.core.database import get_db
+from app.models.docente import Docente as DocenteModel
+from app.api.dependencies import get_current_active_user
+from app.services.batch_service import batch_service
+
+router = APIRouter()
+
+
+# =============================================================================
+# SCHEMAS
+# =============================================================================
+
+class ItemLoteRequest(BaseModel):
+    """Una especificación de examen dentro del lote."""
+    area: Literal["lectosistem", "matsistem"] = Field(..., description="Módulo: lectosistem o matsistem")
+    grado_id: int = Field(..., description="ID del grado escolar")
+    competencia_id: Optional[int] = Field(None, description="ID de la competencia (matemática)")
+    tipo_capacidad: Optional[str] = Field(None, description="Tipo de capacidad: literal, inferencial, critico (lectura)")
+    desempeno_ids: Optional[List[int]] = Field(
+        None, description="Desempeños a evaluar; si se omite se usan todos los del grado/competencia/tipo"
+    )
+    nivel_dificultad: str = Field(default="intermedio", description="basico, intermedio o avanzado")
+    cantidad: int = Field(default=3, ge=1, le=10, description="Cantidad de preguntas")
+    modelo: str = Field(default="gemini", description="Modelo de IA: gemini, chatgpt o auto")
+    texto_base: Optional[str] = Field(None, description="Texto de lectura (lectosistem)")
+    situacion_base: Optional[str] = Field(None, description="Situación problemática (matsistem)")
+
+
+class GenerarLoteRequest(BaseModel):
+    """Lote de especificaciones a generar."""
+    items: List[ItemLoteRequest] = Field(..., min_length=1)
+    guardar: bool = Field(default=False, description="Guardar los exámenes generados para el docente")
+    cache: Literal["bypass", "prefer", "only"] = Field(default="prefer", description="Uso de la caché de respuestas")
+    incluir_resultados: bool = Field(default=True, description="Incluir el contenido de cada examen en el manifiesto")
+
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+@router.post("/generar")
+async def generar_lote(
+    request: GenerarLoteRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: DocenteModel = Depends(get_current_active_user),
+):
+    """
+    Genera un lote de exámenes en paralelo.
+
+    - Las especificaciones idénticas se generan una sola vez.
+    - La concurrencia se limita por proveedor de IA.
+    - Con **guardar=true** todos los exámenes se insertan en una sola transacción.
+
+    Returns:
+        Manifiesto del lote con el estado de cada ítem.
+    """
+    try:
+        return await batch_service.generar_lote(
+            db,
+            items=[item.model_dump() for item in request.items],
+            guardar=request.guardar,
+            docente_id=current_user.id,
+            cache=request.cache,
+            incluir_resultados=request.incluir_resultados
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
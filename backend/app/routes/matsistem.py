@@ -6,19 +6,18 @@ Provee endpoints para consultar competencias, capacidades, estándares y desempe
 from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload, joinedload
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Literal
 
 from app.core.database import get_db
-from app.models.db_models import (
-    Grado,
-    CompetenciaMatematica,
-    CapacidadMatematica,
-    EstandarMatematica,
-    DesempenoMatematica,
-    ExamenMatematica
-)
+from app.core.sse import respuesta_sse
+from app.models.db_models import DesempenoMatematica
+from app.services.ai_cache import solicitudes_docente
+from app.services.ai_rate_limiter import ProviderOverloadedError
+from app.services.curriculum_service import curriculum_service, CurriculumSnapshot
+from app.api.dependencies import get_curriculo, get_current_user_optional
+from app.models.docente import Docente as DocenteModel
+from app.services.exam_pool import exam_pool
 
 
 router = APIRouter()
@@ -119,18 +118,30 @@ class CurriculoMatematica(BaseModel):
     desempenos: List[DesempenoMatCompleto]
 
 
+class CurriculoCompetenciaMat(BaseModel):
+    """Currículo de una competencia dentro de un grado."""
+    competencia: CompetenciaMatResponse
+    estandar: Optional[EstandarMatResponse] = None
+    capacidades: List[CapacidadMatResponse]
+    desempenos: List[DesempenoMatCompleto]
+
+
+class CurriculoGradoMat(GradoMatResponse):
+    """Grado con el currículo de sus 4 competencias."""
+    competencias: List[CurriculoCompetenciaMat]
+
+
 # =============================================================================
 # ENDPOINTS - GRADOS
 # =============================================================================
 
 @router.get("/grados", response_model=List[GradoMatResponse])
-async def get_grados_matematica(db: AsyncSession = Depends(get_db)):
+async def get_grados_matematica(curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """
     Obtiene todos los grados disponibles para Matemática.
     Incluye Inicial de 5 años, Primaria y Secundaria.
     """
-    result = await db.execute(select(Grado).order_by(Grado.orden))
-    return result.scalars().all()
+    return curriculo.grados
 
 
 # =============================================================================
@@ -138,23 +149,19 @@ async def get_grados_matematica(db: AsyncSession = Depends(get_db)):
 # =============================================================================
 
 @router.get("/competencias", response_model=List[CompetenciaMatResponse])
-async def get_competencias(db: AsyncSession = Depends(get_db)):
+async def get_competencias(curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """
     Obtiene las 4 competencias matemáticas.
     """
-    result = await db.execute(select(CompetenciaMatematica).order_by(CompetenciaMatematica.codigo))
-    return result.scalars().all()
+    return curriculo.competencias
 
 
 @router.get("/competencias/{competencia_id}", response_model=CompetenciaMatResponse)
-async def get_competencia(competencia_id: int, db: AsyncSession = Depends(get_db)):
+async def get_competencia(competencia_id: int, curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """
     Obtiene una competencia específica por ID.
     """
-    result = await db.execute(select(CompetenciaMatematica).where(
-        CompetenciaMatematica.id == competencia_id
-    ))
-    competencia = result.scalars().first()
+    competencia = curriculo.get_competencia(competencia_id)
     
     if not competencia:
         raise HTTPException(status_code=404, detail="Competencia no encontrada")
@@ -169,54 +176,21 @@ async def get_competencia(competencia_id: int, db: AsyncSession = Depends(get_db
 @router.get("/capacidades", response_model=List[CapacidadMatConCompetencia])
 async def get_capacidades(
     competencia_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Obtiene las capacidades matemáticas.
     Opcionalmente filtra por competencia.
     """
-    query = select(CapacidadMatematica).join(CompetenciaMatematica).options(
-        selectinload(CapacidadMatematica.competencia)
-    )
-    
-    if competencia_id:
-        query = query.where(CapacidadMatematica.competencia_id == competencia_id)
-    
-    query = query.order_by(
-        CompetenciaMatematica.codigo,
-        CapacidadMatematica.orden
-    )
-    
-    result = await db.execute(query)
-    capacidades = result.scalars().all()
-    
-    result_list = []
-    for cap in capacidades:
-        result_list.append({
-            "id": cap.id,
-            "orden": cap.orden,
-            "nombre": cap.nombre,
-            "descripcion": cap.descripcion,
-            "competencia_id": cap.competencia_id,
-            "competencia_codigo": cap.competencia.codigo,
-            "competencia_nombre": cap.competencia.nombre
-        })
-    
-    return result_list
+    return curriculo.get_capacidades_mat(competencia_id)
 
 
 @router.get("/competencias/{competencia_id}/capacidades", response_model=List[CapacidadMatResponse])
-async def get_capacidades_por_competencia(competencia_id: int, db: AsyncSession = Depends(get_db)):
+async def get_capacidades_por_competencia(competencia_id: int, curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """
     Obtiene las 4 capacidades de una competencia específica.
     """
-    result = await db.execute(
-        select(CapacidadMatematica)
-        .where(CapacidadMatematica.competencia_id == competencia_id)
-        .order_by(CapacidadMatematica.orden)
-    )
-    
-    return result.scalars().all()
+    return curriculo.get_capacidades_mat(competencia_id)
 
 
 # =============================================================================
@@ -227,34 +201,21 @@ async def get_capacidades_por_competencia(competencia_id: int, db: AsyncSession
 async def get_estandares(
     grado_id: Optional[int] = None,
     competencia_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Obtiene los estándares matemáticos.
     Opcionalmente filtra por grado y/o competencia.
     """
-    query = select(EstandarMatematica)
-    
-    if grado_id:
-        query = query.where(EstandarMatematica.grado_id == grado_id)
-    if competencia_id:
-        query = query.where(EstandarMatematica.competencia_id == competencia_id)
-    
-    result = await db.execute(query)
-    return result.scalars().all()
+    return curriculo.get_estandares(grado_id, competencia_id)
 
 
 @router.get("/grados/{grado_id}/competencias/{competencia_id}/estandar", response_model=Optional[EstandarMatResponse])
-async def get_estandar_especifico(grado_id: int, competencia_id: int, db: AsyncSession = Depends(get_db)):
+async def get_estandar_especifico(grado_id: int, competencia_id: int, curriculo: CurriculumSnapshot = Depends(get_curriculo)):
     """
     Obtiene el estándar específico para un grado y competencia.
     """
-    result = await db.execute(select(EstandarMatematica).where(
-        EstandarMatematica.grado_id == grado_id,
-        EstandarMatematica.competencia_id == competencia_id
-    ))
-    
-    return result.scalars().first()
+    return curriculo.get_estandar(grado_id, competencia_id)
 
 
 # =============================================================================
@@ -266,75 +227,38 @@ async def get_desempenos(
     grado_id: Optional[int] = None,
     competencia_id: Optional[int] = None,
     capacidad_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Obtiene los desempeños matemáticos con información completa.
     Opcionalmente filtra por grado, competencia y/o capacidad.
     """
-    # Necesitamos cargar relaciones para construir la respuesta completa
-    query = select(DesempenoMatematica).options(
-        selectinload(DesempenoMatematica.capacidad).selectinload(CapacidadMatematica.competencia)
-    )
-
-    if grado_id:
-        query = query.where(DesempenoMatematica.grado_id == grado_id)
-    if competencia_id:
-        # Filtrar por competencia a través de la capacidad
-        query = query.join(CapacidadMatematica).where(CapacidadMatematica.competencia_id == competencia_id)
-    if capacidad_id:
-        query = query.where(DesempenoMatematica.capacidad_id == capacidad_id)
-
-    # Ordenar por competencia, capacidad y desempeño
-    query = query.order_by(DesempenoMatematica.codigo)
-    
-    result = await db.execute(query)
-    desempenos = result.scalars().all()
-    
-    result_list = []
-    for des in desempenos:
-        # Con selectinload, estas propiedades están disponibles sin I/O adicional
-        cap = des.capacidad
-        comp = cap.competencia
-        result_list.append({
-            "id": des.id,
-            "codigo": des.codigo,
-            "descripcion": des.descripcion,
-            "grado_id": des.grado_id,
-            "capacidad_id": des.capacidad_id,
-            "capacidad_orden": cap.orden,
-            "capacidad_nombre": cap.nombre,
-            "competencia_id": comp.id,
-            "competencia_codigo": comp.codigo,
-            "competencia_nombre": comp.nombre
-        })
-    
-    return result_list
+    return curriculo.get_desempenos_mat(grado_id, competencia_id, capacidad_id)
 
 
 @router.get("/grados/{grado_id}/desempenos", response_model=List[DesempenoMatCompleto])
 async def get_desempenos_por_grado(
     grado_id: int,
     competencia_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Obtiene los desempeños de un grado específico.
     Opcionalmente filtra por competencia.
     """
-    return await get_desempenos(grado_id=grado_id, competencia_id=competencia_id, db=db)
+    return curriculo.get_desempenos_mat(grado_id, competencia_id)
 
 
 @router.get("/grados/{grado_id}/competencias/{competencia_id}/desempenos", response_model=List[DesempenoMatCompleto])
 async def get_desempenos_por_grado_y_competencia(
     grado_id: int,
     competencia_id: int,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Obtiene los desempeños de un grado y competencia específicos.
     """
-    return await get_desempenos(grado_id=grado_id, competencia_id=competencia_id, db=db)
+    return curriculo.get_desempenos_mat(grado_id, competencia_id)
 
 
 # =============================================================================
@@ -373,6 +297,7 @@ async def create_desempeno(desempeno: DesempenoMatCreate, db: AsyncSession = Dep
 
     db_desempeno = DesempenoMatematica(**desempeno.dict())
     db.add(db_desempeno)
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_desempeno)
     return db_desempeno
@@ -397,6 +322,7 @@ async def update_desempeno(
     for key, value in update_data.items():
         setattr(db_desempeno, key, value)
     
+    await curriculum_service.invalidar(db)
     await db.commit()
     await db.refresh(db_desempeno)
     return db_desempeno
@@ -414,6 +340,7 @@ async def delete_desempeno(desempeno_id: int, db: AsyncSession = Depends(get_db)
         raise HTTPException(status_code=404, detail="Desempeño no encontrado")
     
     await db.delete(db_desempeno)
+    await curriculum_service.invalidar(db)
     await db.commit()
     return {"message": "Desempeño eliminado correctamente"}
 
@@ -426,7 +353,7 @@ async def delete_desempeno(desempeno_id: int, db: AsyncSession = Depends(get_db)
 async def get_curriculo_completo(
     grado_id: int,
     competencia_id: int,
-    db: AsyncSession = Depends(get_db)
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
 ):
     """
     Obtiene el currículo completo para un grado y competencia:
@@ -436,45 +363,24 @@ async def get_curriculo_completo(
     - Las 4 capacidades
     - Todos los desempeños
     """
-    # Obtener grado
-    result_grado = await db.execute(select(Grado).where(Grado.id == grado_id))
-    grado = result_grado.scalars().first()
-    if not grado:
+    if not curriculo.get_grado(grado_id):
         raise HTTPException(status_code=404, detail="Grado no encontrado")
-    
-    # Obtener competencia
-    result_comp = await db.execute(select(CompetenciaMatematica).where(
-        CompetenciaMatematica.id == competencia_id
-    ))
-    competencia = result_comp.scalars().first()
-    if not competencia:
+    if not curriculo.get_competencia(competencia_id):
         raise HTTPException(status_code=404, detail="Competencia no encontrada")
     
-    # Obtener estándar
-    result_est = await db.execute(select(EstandarMatematica).where(
-        EstandarMatematica.grado_id == grado_id,
-        EstandarMatematica.competencia_id == competencia_id
-    ))
-    estandar = result_est.scalars().first()
-    
-    # Obtener capacidades
-    result_cap = await db.execute(
-        select(CapacidadMatematica)
-        .where(CapacidadMatematica.competencia_id == competencia_id)
-        .order_by(CapacidadMatematica.orden)
-    )
-    capacidades = result_cap.scalars().all()
-    
-    # Obtener desempeños
-    desempenos_raw = await get_desempenos(grado_id=grado_id, competencia_id=competencia_id, db=db)
-    
-    return {
-        "grado": grado,
-        "competencia": competencia,
-        "estandar": estandar,
-        "capacidades": capacidades,
-        "desempenos": desempenos_raw
-    }
+    return curriculo.get_curriculo_matematica(grado_id, competencia_id)
+
+
+@router.get("/curriculo", response_model=List[CurriculoGradoMat])
+async def get_curriculo_todos_los_grados(
+    curriculo: CurriculumSnapshot = Depends(get_curriculo)
+):
+    """
+    Obtiene el currículo completo de matemática de todos los grados en una
+    sola respuesta (grados → competencias → estándar, capacidades y desempeños),
+    pensado para que el frontend lo guarde en caché.
+    """
+    return curriculo.get_curriculo_matematica_completo()
 
 
 # =============================================================================
@@ -541,21 +447,33 @@ class GenerarExamenMatRequest(BaseModel):
     situacion_base: Optional[str] = None
     modelo: str = "gemini"
     nivel_dificultad: str = "intermedio"  # basico, intermedio, avanzado
+    cache: Optional[Literal["bypass", "prefer", "only"]] = None  # caché de IA; sin indicar: prefer, o bypass si el docente repite
 
 
 @router.post("/generar")
 async def generar_examen_matematica(
     request: GenerarExamenMatRequest,
     req: Request,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional)
 ):
     """
     Genera un examen de matemática con situación problemática integradora.
     Si el request incluye un token JWT válido, el exámen se guarda automáticamente.
+    Las especificaciones frecuentes se sirven al instante desde el pool de exámenes.
     """
     from app.services.matsistem_service import matsistem_service
 
     try:
+        servido = await exam_pool.tomar(
+            db, "matsistem", request.model_dump(), current_user.id if current_user else None
+        )
+        if servido is not None:
+            return servido
+
+        cache = await solicitudes_docente.modo(
+            "matsistem", request.model_dump(), current_user.id if current_user else None
+        )
         resultado = await matsistem_service.generar_examen_matematica(
             db=db,
             grado_id=request.grado_id,
@@ -564,11 +482,57 @@ async def generar_examen_matematica(
             cantidad=request.cantidad,
             situacion_base=request.situacion_base,
             modelo=request.modelo,
-            nivel_dificultad=request.nivel_dificultad
+            nivel_dificultad=request.nivel_dificultad,
+            cache=cache
         )
 
         return resultado
+    except ProviderOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar examen: {str(e)}")
+
+
+@router.post("/generar/stream")
+async def generar_examen_matematica_stream(
+    request: GenerarExamenMatRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: Optional[DocenteModel] = Depends(get_current_user_optional)
+):
+    """
+    Variante en streaming (Server-Sent Events) de /generar.
+
+    Eventos emitidos a medida que el modelo los completa:
+    saludo, titulo, instrucciones, situacion_problematica, pregunta (una por
+    pregunta) y, al final, completado (resultado completo) o error.
+    """
+    from app.services.matsistem_service import matsistem_service
+
+    try:
+        matsistem_service.get_ai_service(request.modelo)
+        preparacion = await matsistem_service.preparar_examen_matematica(
+            db,
+            grado_id=request.grado_id,
+            competencia_id=request.competencia_id,
+            desempeno_ids=request.desempeno_ids,
+            cantidad=request.cantidad,
+            situacion_base=request.situacion_base,
+            nivel_dificultad=request.nivel_dificultad,
+            modelo=request.modelo
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Liberar la conexión antes de iniciar el streaming
+    await db.commit()
+    cache = await solicitudes_docente.modo(
+        "matsistem", request.model_dump(), current_user.id if current_user else None
+    )
+
+    return respuesta_sse(
+        matsistem_service.generar_stream_desde_preparacion(
+            preparacion, modelo=request.modelo, cache=cache
+        )
+    )
@@ -5,6 +5,7 @@ from app.models.competencia import CompetenciaRequest
 from app.models.rubrica import RubricaRequest
 from app.models.pregunta import PreguntasResponse
 from app.services.ai_factory import ai_factory
+from app.services.ai_rate_limiter import ProviderOverloadedError
 
 router = APIRouter()
 
@@ -12,7 +13,7 @@ router = APIRouter()
 @router.post("/generar", response_model=PreguntasResponse)
 async def generar_preguntas(
     request: CompetenciaRequest,
-    modelo: Literal["gemini", "chatgpt"] = "gemini"
+    modelo: Literal["gemini", "chatgpt", "auto"] = "gemini"
 ):
     """
     Genera preguntas basadas en competencias usando IA.
@@ -41,6 +42,8 @@ async def generar_preguntas(
             total=len(preguntas)
         )
     
+    except ProviderOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -50,7 +53,7 @@ async def generar_preguntas(
 @router.post("/generar-por-rubrica", response_model=PreguntasResponse)
 async def generar_preguntas_por_rubrica(
     request: RubricaRequest,
-    modelo: Literal["gemini", "chatgpt"] = "gemini"
+    modelo: Literal["gemini", "chatgpt", "auto"] = "gemini"
 ):
     """
     Genera preguntas basadas en rúbricas de evaluación usando IA.
@@ -85,6 +88,8 @@ async def generar_preguntas_por_rubrica(
             total=len(preguntas)
         )
     
+    except ProviderOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1,10 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 import json
 import re
 
+from app.services.ai_cache import ai_cache, CACHE_MODES, CacheMissError
+from app.services.ai_rate_limiter import ai_rate_limiter
+
 class AIService(ABC):
     """Abstract base class for AI services."""
+
+    # Identificadores usados en la clave de caché
+    provider: str = ""
+    model_name: str = ""
     
     @abstractmethod
     def is_configured(self) -> bool:
@@ -15,6 +22,93 @@ class AIService(ABC):
     async def generate_content(self, prompt: str) -> str:
         """Generate text content from a prompt."""
         pass
+
+    def generation_config(self) -> dict:
+        """Generation parameters that affect the output (part of the cache key)."""
+        return {}
+
+    async def generate_limited(self, prompt: str) -> str:
+        """Call generate_content respecting the provider quotas (rate limiter + retries)."""
+        return await ai_rate_limiter.para(self.provider).ejecutar(
+            lambda: self.generate_content(prompt), prompt
+        )
+
+    async def generate_content_stream_limited(self, prompt: str) -> AsyncIterator[str]:
+        """Streaming variant of generate_limited (the slot is held until the stream ends)."""
+        async with ai_rate_limiter.para(self.provider).reservar(prompt):
+            async for chunk in self.generate_content_stream(prompt):
+                yield chunk
+
+    async def generate(self, prompt: str, cache: str = "prefer") -> str:
+        """
+        Generate content going through the response cache.
+
+        Args:
+            cache: 'bypass' (ignora la caché), 'prefer' (usa la caché y guarda
+                   respuestas nuevas) u 'only' (solo caché, falla si no existe)
+        """
+        if cache not in CACHE_MODES:
+            raise ValueError(f"Modo de caché no soportado: {cache}")
+
+        if cache == "bypass":
+            return await self.generate_limited(prompt)
+
+        key = ai_cache.build_key(self.provider, self.model_name, prompt, self.generation_config())
+        cached = await ai_cache.get(key)
+        if cached is not None:
+            return cached
+
+        if cache == "only":
+            raise CacheMissError("No existe una respuesta en caché para esta solicitud")
+
+        response_text = await self.generate_limited(prompt)
+
+        # Solo se guardan respuestas que contienen JSON válido
+        try:
+            json.loads(self.clean_json_response(response_text))
+        except (json.JSONDecodeError, TypeError):
+            return response_text
+
+        await ai_cache.set(key, self.provider, self.model_name, response_text)
+        return response_text
+
+    async def generate_content_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream generated text in chunks as the provider produces them.
+        Default implementation yields the full (non-streaming) response once.
+        """
+        yield await self.generate_content(prompt)
+
+    async def generate_stream(self, prompt: str, cache: str = "prefer") -> AsyncIterator[str]:
+        """Streaming variant of generate() with the same cache semantics."""
+        if cache not in CACHE_MODES:
+            raise ValueError(f"Modo de caché no soportado: {cache}")
+
+        if cache == "bypass":
+            async for chunk in self.generate_content_stream_limited(prompt):
+                yield chunk
+            return
+
+        key = ai_cache.build_key(self.provider, self.model_name, prompt, self.generation_config())
+        cached = await ai_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        if cache == "only":
+            raise CacheMissError("No existe una respuesta en caché para esta solicitud")
+
+        parts = []
+        async for chunk in self.generate_content_stream_limited(prompt):
+            parts.append(chunk)
+            yield chunk
+
+        response_text = "".join(parts)
+        try:
+            json.loads(self.clean_json_response(response_text))
+        except (json.JSONDecodeError, TypeError):
+            return
+        await ai_cache.set(key, self.provider, self.model_name, response_text)
     
     @abstractmethod
     async def generar_preguntas(
@@ -0,0 +1,316 @@
+"""
+Caché de respuestas de los servicios de IA.
+
+Las respuestas se indexan por un hash SHA-256 de (proveedor, modelo, prompt,
+configuración de generación) y se guardan en dos niveles:
+
+- Memoria: LRU por proceso, con TTL. Un acierto cuesta microsegundos.
+- Persistente: tabla `respuestas_ia_cache`, compartida entre workers y
+  reinicios, con TTL y límite de filas (se eliminan las menos usadas).
+
+Si la solicitud no indica el modo de caché, se usa 'prefer' salvo que el
+mismo docente repita la especificación dentro del TTL: entonces 'bypass',
+para que volver a pulsar "Generar" produzca un examen distinto
+(ver SolicitudesDocente).
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete, update, func
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.models.db_models import RespuestaIACache, SolicitudDocente
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Modos de uso de la caché por petición
+CACHE_MODES = ("bypass", "prefer", "only")
+
+# Cada cuántas escrituras se purga el nivel persistente
+PURGE_EVERY_WRITES = 50
+
+
+class CacheMissError(ValueError):
+    """No existe una respuesta en caché y el modo solicitado es 'only'."""
+
+
+class MemoryCacheBackend:
+    """Caché LRU en memoria con expiración por TTL."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DatabaseCacheBackend:
+    """Caché persistente en la tabla `respuestas_ia_cache`."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(RespuestaIACache.respuesta).where(
+                    RespuestaIACache.clave == key,
+                    RespuestaIACache.fecha_expiracion > now
+                )
+            )
+            value = result.scalar()
+            if value is not None:
+                await db.execute(
+                    update(RespuestaIACache)
+                    .where(RespuestaIACache.clave == key)
+                    .values(ultimo_acceso=now, aciertos=RespuestaIACache.aciertos + 1)
+                )
+                await db.commit()
+            return value
+
+    async def set(self, key: str, provider: str, model: str, value: str) -> None:
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            await db.merge(RespuestaIACache(
+                clave=key,
+                proveedor=provider,
+                modelo=model,
+                respuesta=value,
+                fecha_creacion=now,
+                fecha_expiracion=now + timedelta(seconds=self.ttl_seconds),
+                ultimo_acceso=now,
+                aciertos=0
+            ))
+            await db.commit()
+
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            await self.purge()
+
+    async def purge(self) -> None:
+        """Elimina entradas expiradas y las menos usadas si se supera el límite."""
+        now = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(RespuestaIACache).where(RespuestaIACache.fecha_expiracion <= now)
+            )
+            total = (await db.execute(
+                select(func.count()).select_from(RespuestaIACache)
+            )).scalar() or 0
+            exceso = total - self.max_entries
+            if exceso > 0:
+                claves = select(RespuestaIACache.clave).order_by(
+                    RespuestaIACache.ultimo_acceso
+                ).limit(exceso)
+                await db.execute(
+                    delete(RespuestaIACache).where(RespuestaIACache.clave.in_(claves))
+                )
+            await db.commit()
+
+    async def clear(self) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(RespuestaIACache))
+            await db.commit()
+
+
+class AIResponseCache:
+    """Caché de dos niveles (memoria + persistente) para respuestas de IA."""
+
+    def __init__(
+        self,
+        memory: MemoryCacheBackend,
+        persistent: Optional[DatabaseCacheBackend] = None,
+        enabled: bool = True
+    ):
+        self.memory = memory
+        self.persistent = persistent
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def build_key(provider: str, model: str, prompt: str, config: Optional[dict] = None) -> str:
+        """Hash SHA-256 estable de (proveedor, modelo, prompt, configuración)."""
+        payload = json.dumps(
+            {
+                "provider": provider,
+                "model": model,
+                "prompt": prompt,
+                "config": config or {},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        value = self.memory.get(key)
+        if value is None and self.persistent:
+            try:
+                value = await self.persistent.get(key)
+            except Exception as e:
+                logger.warning("Caché persistente de IA no disponible: %s", e)
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, provider: str, model: str, value: str) -> None:
+        if not self.enabled:
+            return
+
+        self.memory.set(key, value)
+        if self.persistent:
+            try:
+                await self.persistent.set(key, provider, model, value)
+            except Exception as e:
+                logger.warning("No se pudo guardar en la caché persistente de IA: %s", e)
+
+    async def clear(self) -> None:
+        self.memory.clear()
+        if self.persistent:
+            await self.persistent.clear()
+
+    def stats(self) -> dict:
+        return {
+            "habilitada": self.enabled,
+            "persistente": self.persistent is not None,
+            "entradas_memoria": len(self.memory),
+            "aciertos": self.hits,
+            "fallos": self.misses,
+        }
+
+
+class SolicitudesDocente:
+    """
+    Resuelve el modo de caché de las solicitudes que no lo indican.
+
+    Cada solicitud con sesión se anota en `solicitudes_docente` (compartida
+    entre workers) por (docente, especificación). La primera vez se usa
+    'prefer' y se aprovechan las respuestas de otros docentes con los mismos
+    parámetros; si el docente la repite dentro del TTL de la caché, 'bypass'.
+    Sin sesión no se distingue quién repite y se usa siempre 'prefer'.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self.repetidas = 0
+
+    @staticmethod
+    def build_key(tipo: str, parametros: dict) -> str:
+        """Hash SHA-256 de (tipo, parámetros de la solicitud sin el modo de caché)."""
+        payload = json.dumps(
+            [tipo, {k: v for k, v in parametros.items() if k != "cache"}],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def modo(self, tipo: str, parametros: dict, docente_id: Optional[int]) -> str:
+        """
+        Modo de caché para la solicitud: el indicado en parametros["cache"] o,
+        si no lo indica, 'prefer' / 'bypass' según el docente la repita.
+        """
+        cache = parametros.get("cache")
+        if docente_id is None:
+            return cache or "prefer"
+
+        clave = self.build_key(tipo, parametros)
+        now = datetime.now(timezone.utc)
+        repetida = False
+        try:
+            async with AsyncSessionLocal() as db:
+                repetida = (await db.execute(
+                    select(func.count()).select_from(SolicitudDocente).where(
+                        SolicitudDocente.docente_id == docente_id,
+                        SolicitudDocente.clave == clave,
+                        SolicitudDocente.ultima_solicitud > now - timedelta(seconds=self.ttl_seconds)
+                    )
+                )).scalar() > 0
+                await db.merge(SolicitudDocente(docente_id=docente_id, clave=clave, ultima_solicitud=now))
+                await db.commit()
+        except Exception as e:
+            logger.warning("No se pudo registrar la solicitud del docente: %s", e)
+
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            await self.purge()
+
+        if cache:
+            return cache
+        if repetida:
+            self.repetidas += 1
+            return "bypass"
+        return "prefer"
+
+    async def purge(self) -> None:
+        """Elimina las solicitudes más antiguas que el TTL (ya no cuentan como repetición)."""
+        limite = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    delete(SolicitudDocente).where(SolicitudDocente.ultima_solicitud <= limite)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning("No se pudieron purgar las solicitudes de docentes: %s", e)
+
+
+# Singleton instance
+ai_cache = AIResponseCache(
+    memory=MemoryCacheBackend(
+        max_entries=settings.ai_cache_memory_entries,
+        ttl_seconds=settings.ai_cache_ttl_seconds
+    ),
+    persistent=DatabaseCacheBackend(
+        max_entries=settings.ai_cache_persistent_entries,
+        ttl_seconds=settings.ai_cache_ttl_seconds
+    ) if settings.ai_cache_persistent else None,
+    enabled=settings.ai_cache_enabled
+)
+
+solicitudes_docente = SolicitudesDocente(ttl_seconds=settings.ai_cache_ttl_seconds)
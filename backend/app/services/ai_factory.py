@@ -2,6 +2,7 @@ from typing import Literal
 from app.services.ai_base import AIService
 from app.services.gemini_service import gemini_service
 from app.services.chatgpt_service import chatgpt_service
+from app.services.ai_router import ai_router
 
 class AIServiceFactory:
     """Factory for creating/retrieving AI services."""
@@ -12,7 +13,7 @@ class AIServiceFactory:
         Get an AI service instance by name.
         
         Args:
-            service_name: 'gemini' or 'chatgpt'
+            service_name: 'gemini', 'chatgpt' o 'auto' (failover y hedging entre ambos)
             
         Returns:
             AIService implementation
@@ -21,6 +22,8 @@ class AIServiceFactory:
             return gemini_service
         elif service_name == "chatgpt":
             return chatgpt_service
+        elif service_name == "auto":
+            return ai_router
         else:
             raise ValueError(f"Servicio de IA no soportado: {service_name}")
             
@@ -39,6 +42,12 @@ class AIServiceFactory:
                 "nombre": "OpenAI ChatGPT",
                 "descripcion": "Modelo GPT-4o-mini de OpenAI",
                 "disponible": chatgpt_service.is_configured()
+            },
+            {
+                "id": "auto",
+                "nombre": "Automático",
+                "descripcion": "Usa el proveedor más rápido disponible y cambia de proveedor ante fallas",
+                "disponible": ai_router.is_configured()
             }
         ]
 
@@ -0,0 +1,326 @@
+"""
+Limitador de uso por proveedor de IA.
+
+Cada proveedor tiene:
+
+- Dos cubetas de tokens (token bucket): peticiones por minuto y tokens por
+  minuto, según las cuotas de la API.
+- Un límite de concurrencia adaptativo (AIMD): sube de a poco con cada
+  respuesta exitosa y se reduce a la mitad cuando el proveedor responde
+  429/503, con espera exponencial antes de reintentar. Las llamadas
+  canceladas (p. ej. la perdedora de una solicitud de respaldo) o que fallan
+  por otros motivos liberan el turno sin modificar el límite.
+
+Las llamadas que no pueden salir de inmediato esperan en una cola FIFO (se
+atienden en orden de llegada) en lugar de fallar; solo se rechazan si la
+espera supera AI_LIMIT_QUEUE_TIMEOUT_SECONDS.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.core.config import get_settings
+from app.services.prompt_budget import contar_tokens
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Códigos HTTP que indican saturación o cuota agotada
+CODIGOS_SOBRECARGA = (429, 503)
+EXCEPCIONES_SOBRECARGA = ("ResourceExhausted", "ServiceUnavailable", "TooManyRequests", "RateLimitError")
+
+# Cantidad de latencias recientes que se conservan por proveedor
+VENTANA_LATENCIAS = 200
+
+# Resultado de una llamada al liberar su turno
+RESULTADO_EXITO = "exito"
+RESULTADO_SOBRECARGA = "sobrecarga"
+RESULTADO_NEUTRAL = "neutral"   # cancelada o error ajeno a la carga: no informa al AIMD
+
+# Tiempo mínimo entre dos reducciones de concurrencia (una ráfaga de 429 cuenta una vez)
+SEGUNDOS_ENTRE_REDUCCIONES = 1.0
+
+
+class ProviderOverloadedError(ValueError):
+    """El proveedor de IA respondió 429/503 (cuota agotada o servicio saturado)."""
+
+
+class RateLimitTimeoutError(ProviderOverloadedError):
+    """La petición esperó en la cola más del tiempo permitido."""
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """Indica si una excepción del SDK del proveedor corresponde a un 429/503."""
+    codigo = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(codigo, int) and codigo in CODIGOS_SOBRECARGA:
+        return True
+    return type(exc).__name__ in EXCEPCIONES_SOBRECARGA
+
+
+class TokenBucket:
+    """Cubeta de tokens que se rellena de forma continua hasta `capacidad` por minuto."""
+
+    def __init__(self, capacidad_por_minuto: int):
+        self.capacidad = float(max(1, capacidad_por_minuto))
+        self.tasa = self.capacidad / 60.0
+        self.tokens = self.capacidad
+        self._actualizado = time.monotonic()
+
+    def _rellenar(self) -> None:
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._actualizado) * self.tasa)
+        self._actualizado = ahora
+
+    def espera(self, cantidad: float) -> float:
+        """Segundos hasta que haya `cantidad` tokens disponibles (0 si ya los hay)."""
+        self._rellenar()
+        cantidad = min(cantidad, self.capacidad)
+        if self.tokens >= cantidad:
+            return 0.0
+        return (cantidad - self.tokens) / self.tasa
+
+    def consumir(self, cantidad: float) -> None:
+        """Descuenta tokens; admite saldo negativo (deuda) y devoluciones."""
+        self._rellenar()
+        self.tokens = min(self.capacidad, self.tokens - cantidad)
+
+    @property
+    def disponibles(self) -> int:
+        self._rellenar()
+        return int(self.tokens)
+
+
+class ProviderLimiter:
+    """Cuotas y concurrencia adaptativa de un proveedor de IA."""
+
+    def __init__(
+        self,
+        nombre: str,
+        rpm: int,
+        tpm: int,
+        max_concurrencia: int,
+        max_reintentos: int,
+        backoff_segundos: float,
+        timeout_cola: float
+    ):
+        self.nombre = nombre
+        self.peticiones = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrencia = max(1, max_concurrencia)
+        self.limite = float(self.max_concurrencia)
+        self.max_reintentos = max_reintentos
+        self.backoff_segundos = backoff_segundos
+        self.timeout_cola = timeout_cola
+
+        self.en_curso = 0
+        self.en_cola = 0
+        self._admision = asyncio.Lock()   # FIFO: atiende a los que esperan en orden
+        self._liberado = asyncio.Event()
+        self._pausa_hasta = 0.0
+        self._ultima_reduccion = 0.0
+
+        self.latencias: deque[float] = deque(maxlen=VENTANA_LATENCIAS)
+        self.completadas = 0
+        self.canceladas = 0
+        self.sobrecargas = 0
+        self.reintentos = 0
+        self.rechazadas = 0
+
+    # ──────────────────────────────────────────────
+    # Admisión
+    # ──────────────────────────────────────────────
+
+    async def _esperar_turno(self, tokens: int) -> None:
+        async with self._admision:
+            while True:
+                espera = self._pausa_hasta - time.monotonic()
+                if espera <= 0:
+                    if self.en_curso >= int(self.limite):
+                        self._liberado.clear()
+                        await self._liberado.wait()
+                        continue
+                    espera = max(self.peticiones.espera(1), self.tokens.espera(tokens))
+                    if espera <= 0:
+                        self.peticiones.consumir(1)
+                        self.tokens.consumir(tokens)
+                        self.en_curso += 1
+                        return
+                await asyncio.sleep(espera)
+
+    async def adquirir(self, tokens: int) -> None:
+        """Espera turno en la cola FIFO del proveedor."""
+        self.en_cola += 1
+        try:
+            await asyncio.wait_for(self._esperar_turno(tokens), timeout=self.timeout_cola)
+        except asyncio.TimeoutError:
+            self.rechazadas += 1
+            raise RateLimitTimeoutError(
+                f"El servicio {self.nombre} está saturado; intente nuevamente en unos minutos"
+            )
+        finally:
+            self.en_cola -= 1
+
+    def liberar(self, resultado: str = RESULTADO_EXITO, ajuste_tokens: int = 0) -> None:
+        """
+        Libera el turno y ajusta la concurrencia (AIMD) según el resultado.
+
+        Args:
+            resultado: "exito" (sube el límite), "sobrecarga" (lo reduce a la mitad)
+                o "neutral" (solo libera el turno)
+        """
+        self.en_curso -= 1
+        if ajuste_tokens:
+            self.tokens.consumir(ajuste_tokens)
+
+        if resultado == RESULTADO_SOBRECARGA:
+            self.sobrecargas += 1
+            ahora = time.monotonic()
+            if ahora - self._ultima_reduccion >= SEGUNDOS_ENTRE_REDUCCIONES:
+                self.limite = max(1.0, self.limite / 2)
+                self._ultima_reduccion = ahora
+                logger.warning(
+                    "Proveedor %s saturado: concurrencia reducida a %d", self.nombre, int(self.limite)
+                )
+        elif resultado == RESULTADO_EXITO:
+            self.completadas += 1
+            self.limite = min(float(self.max_concurrencia), self.limite + 1 / self.limite)
+
+        self._liberado.set()
+
+    def _registrar_cancelada(self, transcurrido: float) -> None:
+        """
+        Registra la latencia de una llamada cancelada (p. ej. el primario lento que
+        pierde contra la solicitud de respaldo). Se sabe que habría tardado al menos
+        `transcurrido`: si eso ya alcanza la mediana de la ventana es una muestra de
+        la cola lenta y se registra; si no, no aporta información y se descarta.
+        Sin esto la ventana solo guarda llamadas rápidas y el umbral de hedging baja
+        cada vez más.
+        """
+        self.canceladas += 1
+        mediana = self.percentil(0.5)
+        if mediana is None or transcurrido >= mediana:
+            self.latencias.append(transcurrido)
+
+    def _pausar(self, intento: int) -> float:
+        """Pausa al proveedor con espera exponencial y jitter; devuelve los segundos."""
+        espera = self.backoff_segundos * (2 ** intento) * (0.5 + random.random())
+        self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + espera)
+        return espera
+
+    # ──────────────────────────────────────────────
+    # Ejecución
+    # ──────────────────────────────────────────────
+
+    async def ejecutar(self, llamada: Callable[[], Awaitable[T]], prompt: str) -> T:
+        """Ejecuta la llamada respetando las cuotas, con reintentos ante 429/503."""
+        estimados = contar_tokens(prompt, self.nombre) + settings.ai_limit_output_tokens
+
+        for intento in range(self.max_reintentos + 1):
+            await self.adquirir(estimados)
+            inicio = time.monotonic()
+            try:
+                resultado = await llamada()
+            except ProviderOverloadedError:
+                self.liberar(RESULTADO_SOBRECARGA)
+                if intento == self.max_reintentos:
+                    raise
+                self.reintentos += 1
+                espera = self._pausar(intento)
+                logger.info("Reintentando %s en %.1f s (intento %d)", self.nombre, espera, intento + 1)
+                await asyncio.sleep(espera)
+                continue
+            except asyncio.CancelledError:
+                self._registrar_cancelada(time.monotonic() - inicio)
+                self.liberar(RESULTADO_NEUTRAL)
+                raise
+            except BaseException:
+                self.liberar(RESULTADO_NEUTRAL)
+                raise
+
+            self.latencias.append(time.monotonic() - inicio)
+            reales = contar_tokens(prompt, self.nombre) + contar_tokens(
+                resultado if isinstance(resultado, str) else "", self.nombre
+            )
+            self.liberar(ajuste_tokens=reales - estimados)
+            return resultado
+
+        raise ProviderOverloadedError(f"El servicio {self.nombre} no está disponible")
+
+    @asynccontextmanager
+    async def reservar(self, prompt: str):
+        """Reserva un turno para una llamada en streaming (sin reintentos)."""
+        await self.adquirir(contar_tokens(prompt, self.nombre) + settings.ai_limit_output_tokens)
+        try:
+            yield
+        except ProviderOverloadedError:
+            self.liberar(RESULTADO_SOBRECARGA)
+            self._pausar(0)
+            raise
+        except BaseException:
+            self.liberar(RESULTADO_NEUTRAL)
+            raise
+        else:
+            self.liberar()
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Latencia (s) del percentil p de las llamadas recientes (exitosas y canceladas lentas); None sin datos."""
+        if not self.latencias:
+            return None
+        ordenadas = sorted(self.latencias)
+        indice = min(len(ordenadas) - 1, int(p * len(ordenadas)))
+        return ordenadas[indice]
+
+    def stats(self) -> dict:
+        p95 = self.percentil(0.95)
+        return {
+            "peticiones_por_minuto": int(self.peticiones.capacidad),
+            "peticiones_disponibles": self.peticiones.disponibles,
+            "tokens_por_minuto": int(self.tokens.capacidad),
+            "tokens_disponibles": self.tokens.disponibles,
+            "concurrencia_maxima": self.max_concurrencia,
+            "concurrencia_actual": int(self.limite),
+            "en_curso": self.en_curso,
+            "en_cola": self.en_cola,
+            "pausado_segundos": round(max(0.0, self._pausa_hasta - time.monotonic()), 1),
+            "completadas": self.completadas,
+            "canceladas": self.canceladas,
+            "sobrecargas": self.sobrecargas,
+            "reintentos": self.reintentos,
+            "rechazadas": self.rechazadas,
+            "latencia_p95_segundos": round(p95, 2) if p95 is not None else None,
+        }
+
+
+class AIRateLimiter:
+    """Registro de limitadores, uno por proveedor."""
+
+    def __init__(self):
+        self._proveedores: dict[str, ProviderLimiter] = {}
+
+    def para(self, proveedor: str) -> ProviderLimiter:
+        if proveedor not in self._proveedores:
+            self._proveedores[proveedor] = ProviderLimiter(
+                nombre=proveedor,
+                rpm=getattr(settings, f"ai_limit_{proveedor}_rpm", 60),
+                tpm=getattr(settings, f"ai_limit_{proveedor}_tpm", 100000),
+                max_concurrencia=getattr(settings, f"ai_limit_{proveedor}_concurrency", 4),
+                max_reintentos=settings.ai_limit_max_retries,
+                backoff_segundos=settings.ai_limit_backoff_seconds,
+                timeout_cola=settings.ai_limit_queue_timeout_seconds
+            )
+        return self._proveedores[proveedor]
+
+    def stats(self, proveedores: Optional[list[str]] = None) -> dict:
+        nombres = proveedores or list(self._proveedores.keys())
+        return {nombre: self.para(nombre).stats() for nombre in nombres}
+
+
+# Singleton instance
+ai_rate_limiter = AIRateLimiter()
@@ -0,0 +1,195 @@
+"""
+Enrutamiento automático entre proveedores de IA (modelo "auto").
+
+La solicitud se envía al primer proveedor configurado según AI_ROUTING_ORDER.
+Si no responde antes del umbral de latencia (percentil p95 de sus llamadas
+recientes), se lanza una solicitud de respaldo al siguiente proveedor y se usa
+la primera respuesta con JSON válido; la otra se cancela. Si un proveedor
+falla (error, bloqueo por filtros, JSON inválido) se pasa al siguiente.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from app.core.config import get_settings
+from app.services.ai_base import AIService
+from app.services.ai_rate_limiter import ai_rate_limiter
+from app.services.gemini_service import gemini_service
+from app.services.chatgpt_service import chatgpt_service
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+SERVICIOS = {
+    "gemini": gemini_service,
+    "chatgpt": chatgpt_service,
+}
+
+
+class AIRouterService(AIService):
+    """Servicio de IA que reparte cada solicitud entre los proveedores disponibles."""
+
+    provider = "auto"
+    model_name = "auto"
+
+    def __init__(self, orden: str):
+        """
+        Args:
+            orden: proveedores separados por comas, p. ej. "gemini,chatgpt"
+        """
+        nombres = [nombre.strip() for nombre in orden.split(",")]
+        self.orden = [nombre for nombre in dict.fromkeys(nombres) if nombre in SERVICIOS]
+        self.hedges = 0
+        self.failovers = 0
+        self.victorias: dict[str, int] = {nombre: 0 for nombre in self.orden}
+
+    def is_configured(self) -> bool:
+        return bool(self._disponibles())
+
+    def _disponibles(self) -> list[AIService]:
+        return [SERVICIOS[nombre] for nombre in self.orden if SERVICIOS[nombre].is_configured()]
+
+    def umbral_hedge(self, servicio: AIService) -> float:
+        """
+        Segundos de espera antes de lanzar la solicitud de respaldo. El percentil
+        incluye las llamadas lentas canceladas al perder contra el respaldo.
+        """
+        limiter = ai_rate_limiter.para(servicio.provider)
+        if len(limiter.latencias) < settings.ai_hedge_min_samples:
+            return settings.ai_hedge_default_delay_seconds
+        umbral = limiter.percentil(settings.ai_hedge_percentile)
+        return max(settings.ai_hedge_min_delay_seconds, umbral)
+
+    async def _intentar(self, servicio: AIService, prompt: str, cache: str) -> str:
+        """Llama a un proveedor y valida que la respuesta contenga JSON."""
+        respuesta = await servicio.generate(prompt, cache=cache)
+        try:
+            json.loads(servicio.clean_json_response(respuesta))
+        except (json.JSONDecodeError, TypeError) as e:
+            raise ValueError(f"{servicio.provider} devolvió JSON inválido: {e}")
+        return respuesta
+
+    async def generate(self, prompt: str, cache: str = "prefer") -> str:
+        """
+        Genera con failover entre proveedores y solicitud de respaldo por latencia.
+        La caché se aplica por proveedor (cada uno usa su propia clave).
+        """
+        pendientes = self._disponibles()
+        if not pendientes:
+            raise ValueError("No hay proveedores de IA configurados")
+
+        inicio = time.monotonic()
+        tareas: dict[asyncio.Task, AIService] = {}
+        ultimo_error: Optional[Exception] = None
+
+        def lanzar() -> None:
+            servicio = pendientes.pop(0)
+            tarea = asyncio.create_task(self._intentar(servicio, prompt, cache))
+            tareas[tarea] = servicio
+
+        lanzar()
+        try:
+            while tareas:
+                timeout = None
+                if pendientes and settings.ai_hedge_enabled and len(tareas) == 1:
+                    primario = next(iter(tareas.values()))
+                    timeout = max(0.0, self.umbral_hedge(primario) - (time.monotonic() - inicio))
+
+                terminadas, _ = await asyncio.wait(
+                    tareas.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not terminadas:
+                    # Umbral superado: solicitud de respaldo al siguiente proveedor
+                    self.hedges += 1
+                    logger.info("Hedging: %s supera el umbral, se consulta a %s",
+                                next(iter(tareas.values())).provider, pendientes[0].provider)
+                    lanzar()
+                    continue
+
+                for tarea in terminadas:
+                    servicio = tareas.pop(tarea)
+                    try:
+                        respuesta = tarea.result()
+                    except Exception as e:
+                        ultimo_error = e
+                        logger.warning("Proveedor %s falló: %s", servicio.provider, e)
+                        continue
+                    self.victorias[servicio.provider] += 1
+                    return respuesta
+
+                # Todas las terminadas fallaron: failover inmediato
+                if pendientes and not tareas:
+                    self.failovers += 1
+                    lanzar()
+        finally:
+            for tarea in tareas:
+                tarea.cancel()
+
+        raise ultimo_error or ValueError("Ningún proveedor de IA respondió")
+
+    async def generate_content(self, prompt: str) -> str:
+        return await self.generate(prompt, cache="bypass")
+
+    async def generate_stream(self, prompt: str, cache: str = "prefer") -> AsyncIterator[str]:
+        """
+        Streaming con failover: si un proveedor falla antes de enviar el primer
+        fragmento se pasa al siguiente. No hay hedging (los fragmentos ya se emiten).
+        """
+        servicios = self._disponibles()
+        if not servicios:
+            raise ValueError("No hay proveedores de IA configurados")
+
+        for indice, servicio in enumerate(servicios):
+            emitido = False
+            try:
+                async for chunk in servicio.generate_stream(prompt, cache=cache):
+                    emitido = True
+                    yield chunk
+                self.victorias[servicio.provider] += 1
+                return
+            except Exception as e:
+                if emitido or indice == len(servicios) - 1:
+                    raise
+                self.failovers += 1
+                logger.warning("Proveedor %s falló (streaming): %s", servicio.provider, e)
+
+    async def generar_preguntas(
+        self,
+        competencias: list[dict],
+        cantidad: int = 5,
+        tipo: str = "multiple",
+        dificultad: str = "intermedio"
+    ) -> list:
+        """Delegado al primer proveedor disponible, con failover."""
+        servicios = self._disponibles()
+        if not servicios:
+            raise ValueError("No hay proveedores de IA configurados")
+
+        for indice, servicio in enumerate(servicios):
+            try:
+                return await servicio.generar_preguntas(competencias, cantidad, tipo, dificultad)
+            except ValueError:
+                if indice == len(servicios) - 1:
+                    raise
+                self.failovers += 1
+
+    def stats(self) -> dict:
+        return {
+            "orden": self.orden,
+            "hedging": settings.ai_hedge_enabled,
+            "umbrales_segundos": {
+                servicio.provider: round(self.umbral_hedge(servicio), 2)
+                for servicio in self._disponibles()
+            },
+            "solicitudes_respaldo": self.hedges,
+            "failovers": self.failovers,
+            "respuestas_por_proveedor": self.victorias,
+        }
+
+
+# Singleton instance
+ai_router = AIRouterService(orden=settings.ai_routing_order)
@@ -0,0 +1,50 @@
+"""
+Tabla de respuestas derivada en el servidor.
+
+La tabla_respuestas repite datos que ya están en cada pregunta (código de
+desempeño, nivel o capacidad, alternativa marcada como correcta). Pedirla
+al modelo gastaba tokens de salida en cada generación y era una fuente
+frecuente de inconsistencias (la tabla decía B y la alternativa correcta
+era C). Ahora el modelo solo incluye una breve "justificacion" en cada
+pregunta y la tabla se arma aquí, con la descripción completa del
+desempeño tomada de la instantánea curricular.
+"""
+from typing import Callable, Optional
+
+
+def letra_correcta(pregunta: dict) -> Optional[str]:
+    """Letra de la única alternativa correcta (None si no hay exactamente una)."""
+    correctas = [opcion for opcion in pregunta.get("opciones") or [] if opcion.get("es_correcta") is True]
+    if len(correctas) != 1:
+        return None
+    return str(correctas[0].get("letra", "")).strip().upper() or None
+
+
+def derivar_tabla(examen: dict, fila: Callable[[dict], dict]) -> list[dict]:
+    """
+    Arma la tabla de respuestas del examen y la deja en examen["tabla_respuestas"].
+
+    La justificación pasa de cada pregunta a su fila. Si la pregunta no la trae
+    (respuestas en caché anteriores a este cambio) se conserva la de la tabla
+    que hubiera generado el modelo.
+
+    Args:
+        fila: fila(pregunta) devuelve los campos propios del área (desempeño, nivel, capacidad)
+    """
+    anteriores = {}
+    for anterior in examen.get("tabla_respuestas") or []:
+        if isinstance(anterior, dict):
+            anteriores.setdefault(anterior.get("pregunta"), anterior)
+
+    tabla = []
+    for numero, pregunta in enumerate(examen.get("preguntas") or [], start=1):
+        pregunta["numero"] = numero
+        justificacion = pregunta.pop("justificacion", "") or anteriores.get(numero, {}).get("justificacion", "")
+        tabla.append({
+            "pregunta": numero,
+            **fila(pregunta),
+            "respuesta_correcta": letra_correcta(pregunta) or "",
+            "justificacion": justificacion,
+        })
+    examen["tabla_respuestas"] = tabla
+    return tabla
@@ -0,0 +1,240 @@
+"""
+Servicio de generación de exámenes por lotes (campañas por grado o UGEL).
+
+Recibe una matriz de especificaciones, elimina las duplicadas, prepara todos
+los prompts con la sesión de BD, la libera y luego lanza las llamadas a la IA
+en paralelo con un límite de concurrencia por proveedor. Opcionalmente guarda
+todos los exámenes generados con una sola inserción masiva.
+"""
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.db_models import ExamenLectura, ExamenMatematica
+from app.services.curriculum_service import curriculum_service
+from app.services.lectosistem_service import lectosistem_service
+from app.services.matsistem_service import matsistem_service
+from app.services.question_bank import question_bank
+
+settings = get_settings()
+
+AREAS_LOTE = ("lectosistem", "matsistem")
+
+# Campos que identifican una especificación (para deduplicar)
+CAMPOS_ESPECIFICACION = (
+    "area", "grado_id", "competencia_id", "tipo_capacidad", "desempeno_ids",
+    "nivel_dificultad", "cantidad", "modelo", "texto_base", "situacion_base",
+)
+
+
+def clave_especificacion(item: dict) -> str:
+    """Hash estable de una especificación; dos ítems idénticos comparten clave."""
+    datos = {campo: item.get(campo) for campo in CAMPOS_ESPECIFICACION}
+    if datos["desempeno_ids"]:
+        datos["desempeno_ids"] = sorted(set(datos["desempeno_ids"]))
+    payload = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class BatchService:
+    """Servicio para generar muchos exámenes en una sola petición."""
+
+    def __init__(self):
+        self._semaforos: dict[str, asyncio.Semaphore] = {}
+
+    def _semaforo(self, modelo: str) -> asyncio.Semaphore:
+        if modelo not in self._semaforos:
+            limite = getattr(settings, f"batch_concurrency_{modelo}", 2)
+            self._semaforos[modelo] = asyncio.Semaphore(max(1, limite))
+        return self._semaforos[modelo]
+
+    async def _resolver_desempenos(self, db: AsyncSession, item: dict) -> list[int]:
+        """Si el ítem no trae desempeños, usa todos los del grado (y tipo/competencia)."""
+        if item.get("desempeno_ids"):
+            return item["desempeno_ids"]
+
+        curriculo = await curriculum_service.obtener(db)
+        if item["area"] == "lectosistem":
+            desempenos = curriculo.get_desempenos_lectura(item["grado_id"], item.get("tipo_capacidad"))
+        else:
+            desempenos = curriculo.get_desempenos_mat(item["grado_id"], item["competencia_id"])
+        return [d["id"] for d in desempenos]
+
+    async def _preparar(self, db: AsyncSession, item: dict) -> dict:
+        desempeno_ids = await self._resolver_desempenos(db, item)
+
+        if item["area"] == "lectosistem":
+            return await lectosistem_service.preparar_examen_lectura(
+                db,
+                grado_id=item["grado_id"],
+                desempeno_ids=desempeno_ids,
+                cantidad=item["cantidad"],
+                texto_base=item.get("texto_base"),
+                nivel_dificultad=item["nivel_dificultad"],
+                modelo=item["modelo"]
+            )
+
+        if not item.get("competencia_id"):
+            raise ValueError("Los ítems de matemática requieren competencia_id")
+        return await matsistem_service.preparar_examen_matematica(
+            db,
+            grado_id=item["grado_id"],
+            competencia_id=item["competencia_id"],
+            desempeno_ids=desempeno_ids,
+            cantidad=item["cantidad"],
+            situacion_base=item.get("situacion_base"),
+            nivel_dificultad=item["nivel_dificultad"],
+            modelo=item["modelo"]
+        )
+
+    async def _generar(self, item: dict, preparacion: dict, cache: str) -> dict:
+        servicio = lectosistem_service if item["area"] == "lectosistem" else matsistem_service
+        async with self._semaforo(item["modelo"]):
+            return await servicio.generar_desde_preparacion(
+                preparacion, modelo=item["modelo"], cache=cache
+            )
+
+    def _a_modelo(self, item: dict, resultado: dict, docente_id: int):
+        """Convierte un resultado generado en la fila a insertar."""
+        examen = resultado.get("examen", {})
+        comunes = dict(
+            docente_id=docente_id,
+            grado_id=item["grado_id"],
+            titulo=examen.get("titulo"),
+            grado_nombre=resultado.get("grado"),
+            nivel_dificultad=item["nivel_dificultad"],
+            modelo_ia=item["modelo"],
+            saludo=resultado.get("saludo"),
+            preguntas=examen.get("preguntas"),
+            tabla_respuestas=examen.get("tabla_respuestas"),
+            desempenos_usados=resultado.get("desempenos_usados"),
+        )
+        if item["area"] == "lectosistem":
+            return ExamenLectura(
+                instrucciones=examen.get("instrucciones"),
+                lectura=examen.get("lectura"),
+                **comunes
+            )
+        return ExamenMatematica(
+            competencia_id=item["competencia_id"],
+            situacion_problematica=examen.get("situacion_problematica"),
+            **comunes
+        )
+
+    async def generar_lote(
+        self,
+        db: AsyncSession,
+        items: list[dict],
+        guardar: bool = False,
+        docente_id: Optional[int] = None,
+        cache: str = "prefer",
+        incluir_resultados: bool = True
+    ) -> dict:
+        """
+        Genera todos los exámenes del lote.
+
+        Returns:
+            Manifiesto del lote con el estado de cada ítem.
+        """
+        if not items:
+            raise ValueError("El lote no contiene ítems")
+        if len(items) > settings.batch_max_items:
+            raise ValueError(f"El lote supera el máximo de {settings.batch_max_items} ítems")
+        if guardar and docente_id is None:
+            raise ValueError("Se requiere un docente autenticado para guardar el lote")
+
+        for item in items:
+            if item["area"] not in AREAS_LOTE:
+                raise ValueError(f"Área no soportada: {item['area']}")
+            lectosistem_service.get_ai_service(item["modelo"])
+
+        # ── 1. Deduplicar especificaciones ──
+        claves = [clave_especificacion(item) for item in items]
+        unicos: dict[str, int] = {}
+        for indice, clave in enumerate(claves):
+            unicos.setdefault(clave, indice)
+
+        # ── 2. Preparar prompts (secuencial: una sola sesión de BD) ──
+        preparaciones: dict[str, dict] = {}
+        errores: dict[str, str] = {}
+        for clave, indice in unicos.items():
+            try:
+                preparaciones[clave] = await self._preparar(db, items[indice])
+            except ValueError as e:
+                errores[clave] = str(e)
+
+        # Liberar la conexión antes de las llamadas a la IA
+        await db.commit()
+
+        # ── 3. Generar en paralelo con límite por proveedor ──
+        claves_a_generar = list(preparaciones.keys())
+        respuestas = await asyncio.gather(
+            *[
+                self._generar(items[unicos[clave]], preparaciones[clave], cache)
+                for clave in claves_a_generar
+            ],
+            return_exceptions=True
+        )
+        resultados: dict[str, dict] = {}
+        for clave, respuesta in zip(claves_a_generar, respuestas):
+            if isinstance(respuesta, Exception):
+                errores[clave] = str(respuesta)
+            else:
+                resultados[clave] = respuesta
+
+        # ── 4. Guardar con una sola inserción ──
+        examen_ids: dict[str, int] = {}
+        if guardar and resultados:
+            filas = {
+                clave: self._a_modelo(items[unicos[clave]], resultado, docente_id)
+                for clave, resultado in resultados.items()
+            }
+            db.add_all(list(filas.values()))
+            await db.flush()
+            for area in AREAS_LOTE:
+                await question_bank.registrar(
+                    db, area, [fila for clave, fila in filas.items() if items[unicos[clave]]["area"] == area]
+                )
+            await db.commit()
+            examen_ids = {clave: fila.id for clave, fila in filas.items()}
+
+        # ── 5. Manifiesto ──
+        manifiesto_items = []
+        for indice, (item, clave) in enumerate(zip(items, claves)):
+            entrada = {
+                "indice": indice,
+                "clave": clave,
+                "area": item["area"],
+                "grado_id": item["grado_id"],
+                "estado": "completado" if clave in resultados else "error",
+            }
+            if unicos[clave] != indice:
+                entrada["duplicado_de"] = unicos[clave]
+            if clave in errores:
+                entrada["error"] = errores[clave]
+            if clave in examen_ids:
+                entrada["examen_id"] = examen_ids[clave]
+            if clave in resultados:
+                entrada["total_preguntas"] = resultados[clave].get("total_preguntas", 0)
+                if incluir_resultados and unicos[clave] == indice:
+                    entrada["resultado"] = resultados[clave]
+            manifiesto_items.append(entrada)
+
+        return {
+            "id": str(uuid.uuid4()),
+            "total_items": len(items),
+            "especificaciones_unicas": len(unicos),
+            "completados": sum(1 for e in manifiesto_items if e["estado"] == "completado"),
+            "errores": sum(1 for e in manifiesto_items if e["estado"] == "error"),
+            "guardado": bool(examen_ids),
+            "items": manifiesto_items,
+        }
+
+
+# Singleton instance
+batch_service = BatchService()
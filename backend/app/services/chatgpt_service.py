@@ -1,16 +1,24 @@
 from openai import AsyncOpenAI
 import json
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from app.core.config import get_settings
 from app.models.pregunta import Pregunta, TipoPregunta, OpcionMultiple
 from app.services.ai_base import AIService
+from app.services.ai_rate_limiter import ProviderOverloadedError, is_overload_error
+from app.services.context_cache import context_cache
+from app.services.prompt_templates import prompt_templates
+from app.services.structured_output import structured_output
 
 settings = get_settings()
 
 
 class ChatGPTService(AIService):
     """Service for generating questions using OpenAI ChatGPT API."""
+
+    provider = "chatgpt"
+    model_name = "gpt-4o-mini"
+    system_prompt = "Eres un experto en educación. Siempre respondes en formato JSON válido."
     
     def __init__(self):
         if settings.openai_api_key:
@@ -20,6 +28,44 @@ class ChatGPTService(AIService):
             
     def is_configured(self) -> bool:
         return self.client is not None
+
+    def generation_config(self) -> dict:
+        return {
+            "system": self.system_prompt,
+            "temperature": 0.7,
+            "response_format": "json_object",
+        }
+
+    def _opciones_plantilla(self, prompt: str) -> dict:
+        """
+        Opciones según la plantilla del prompt:
+            - response_format json_schema (strict) si la plantilla declara esquema
+        """
+        plantilla = prompt_templates.buscar_por_prefijo(prompt)
+        opciones = {"response_format": {"type": "json_object"}}
+        if plantilla is None:
+            return opciones
+        if plantilla.esquema is not None:
+            opciones["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": plantilla.esquema.__name__,
+                    "strict": True,
+                    "schema": structured_output.esquema(plantilla.esquema, self.provider),
+                },
+            }
+        return opciones
+
+    def _registrar_uso(self, usage) -> None:
+        if usage is None:
+            return
+        detalles = getattr(usage, "prompt_tokens_details", None)
+        context_cache.registrar_uso(
+            self.provider,
+            entrada=usage.prompt_tokens or 0,
+            cacheados=getattr(detalles, "cached_tokens", 0) or 0,
+            salida=usage.completion_tokens or 0,
+        )
         
     async def generate_content(self, prompt: str) -> str:
         """Generate content implementation for ChatGPT."""
@@ -28,19 +74,49 @@ class ChatGPTService(AIService):
             
         try:
             response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
+                model=self.model_name,
                 messages=[
                     {
                         "role": "system", 
-                        "content": "Eres un experto en educación. Siempre respondes en formato JSON válido."
+                        "content": self.system_prompt
                     },
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.7,
-                response_format={"type": "json_object"}
+                **self._opciones_plantilla(prompt)
             )
+            self._registrar_uso(response.usage)
             return response.choices[0].message.content
         except Exception as e:
+            if is_overload_error(e):
+                raise ProviderOverloadedError(f"ChatGPT no disponible temporalmente: {e}")
+            raise ValueError(f"Error al generar contenido con ChatGPT: {e}")
+
+    async def generate_content_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Streaming generate content implementation for ChatGPT."""
+        if not self.client:
+            raise ValueError("OpenAI API key no configurada")
+
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self._opciones_plantilla(prompt)
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if chunk.usage is not None:  # último fragmento, sin choices
+                    self._registrar_uso(chunk.usage)
+        except Exception as e:
+            if is_overload_error(e):
+                raise ProviderOverloadedError(f"ChatGPT no disponible temporalmente: {e}")
             raise ValueError(f"Error al generar contenido con ChatGPT: {e}")
     
     def _build_prompt(
@@ -95,7 +171,7 @@ IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con la siguiente estructura
         """Generate questions using OpenAI ChatGPT API."""
         
         prompt = self._build_prompt(competencias, cantidad, tipo, dificultad)
-        response_text = await self.generate_content(prompt)
+        response_text = await self.generate(prompt)
         
         try:
             data = json.loads(response_text)
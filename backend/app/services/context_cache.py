@@ -0,0 +1,52 @@
+"""
+Métricas de prompt caching informadas por los proveedores.
+
+Gemini y OpenAI cachean de forma implícita los prefijos idénticos de los
+prompts a partir de cierto tamaño (1024 tokens), y cada respuesta informa
+cuántos tokens de entrada salieron del caché. Los prefijos de las plantillas
+(PlantillaPrompt) miden entre ~270 y ~660 tokens, por debajo de ese mínimo,
+así que no se registra caché explícito (CachedContent / prompt_cache_key):
+aquí solo se acumulan los tokens de entrada cacheados y sin cachear por
+proveedor, para verificar si el ahorro aparece cuando el prompt completo
+(preámbulo + texto base) supera el mínimo.
+"""
+
+
+class ContextCacheService:
+    """Tokens de entrada, cacheados y de salida por proveedor."""
+
+    def __init__(self):
+        self.uso: dict[str, dict[str, int]] = {}
+
+    def registrar_uso(self, proveedor: str, entrada: int, cacheados: int, salida: int) -> None:
+        """Acumula los tokens informados por el proveedor en una llamada."""
+        uso = self.uso.setdefault(proveedor, {
+            "llamadas": 0,
+            "llamadas_con_cache": 0,
+            "tokens_entrada": 0,
+            "tokens_entrada_cacheados": 0,
+            "tokens_salida": 0,
+        })
+        uso["llamadas"] += 1
+        uso["llamadas_con_cache"] += 1 if cacheados else 0
+        uso["tokens_entrada"] += entrada
+        uso["tokens_entrada_cacheados"] += cacheados
+        uso["tokens_salida"] += salida
+
+    def stats(self) -> dict:
+        return {
+            "uso": {
+                proveedor: {
+                    **uso,
+                    "tokens_entrada_sin_cache": uso["tokens_entrada"] - uso["tokens_entrada_cacheados"],
+                    "porcentaje_cacheado": round(
+                        100 * uso["tokens_entrada_cacheados"] / uso["tokens_entrada"], 1
+                    ) if uso["tokens_entrada"] else 0.0,
+                }
+                for proveedor, uso in self.uso.items()
+            },
+        }
+
+
+# Singleton instance
+context_cache = ContextCacheService()
@@ -0,0 +1,388 @@
+"""
+Catálogo curricular en memoria (grados, capacidades, competencias, estándares
+y desempeños de Comunicación y Matemática).
+
+Son datos de referencia que casi nunca cambian, así que cada proceso guarda
+una instantánea indexada y responde desde memoria. Las escrituras (CRUD de
+administración y scripts de carga: scripts/load_desempenos.py,
+scripts/load_matematica.py, init_data.py) incrementan un contador en la
+tabla `versiones_catalogo` con incrementar_version_curriculo();
+cada worker compara su versión con la de la BD cada CURRICULUM_CHECK_SECONDS
+y recarga la instantánea si cambió.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.models.db_models import (
+    Grado,
+    Capacidad,
+    CompetenciaMatematica,
+    CapacidadMatematica,
+    VersionCatalogo
+)
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CATALOGO_CURRICULO = "curriculo"
+
+
+def incrementar_version_curriculo(session: Session) -> None:
+    """
+    Incrementa la versión del currículo dentro de la transacción de una sesión
+    síncrona (scripts de carga). Debe llamarse antes del commit de la escritura,
+    para que los workers recarguen la instantánea y el pool descarte los
+    exámenes generados con el currículo anterior.
+    """
+    result = session.execute(
+        update(VersionCatalogo)
+        .where(VersionCatalogo.nombre == CATALOGO_CURRICULO)
+        .values(version=VersionCatalogo.version + 1)
+    )
+    if result.rowcount == 0:
+        session.add(VersionCatalogo(nombre=CATALOGO_CURRICULO, version=1))
+
+
+class CurriculumSnapshot:
+    """Instantánea inmutable del currículo, indexada para consultas sin BD."""
+
+    def __init__(
+        self,
+        version: int,
+        grados: list,
+        capacidades: list,
+        desempenos: list,
+        competencias: list,
+        capacidades_mat: list,
+        estandares: list,
+        desempenos_mat: list
+    ):
+        self.version = version
+
+        # ── Grados ──
+        self.grados = [
+            {"id": g.id, "nombre": g.nombre, "numero": g.numero, "nivel": g.nivel, "orden": g.orden}
+            for g in sorted(grados, key=lambda g: g.orden)
+        ]
+        self.grados_por_id = {g["id"]: g for g in self.grados}
+        self.grados_por_orden = {g["orden"]: g for g in self.grados}
+
+        # ── Comunicación ──
+        self.capacidades = [
+            {"id": c.id, "nombre": c.nombre, "tipo": c.tipo, "descripcion": c.descripcion}
+            for c in sorted(capacidades, key=lambda c: c.id)
+        ]
+        capacidades_por_id = {c["id"]: c for c in self.capacidades}
+
+        self.desempenos_por_id: dict[int, dict] = {}
+        self.desempenos_por_grado: dict[int, list] = defaultdict(list)
+        self.desempenos_por_grado_tipo: dict[tuple, list] = defaultdict(list)
+        for d in sorted(desempenos, key=lambda d: d.id):
+            capacidad = capacidades_por_id.get(d.capacidad_id)
+            item = {
+                "id": d.id,
+                "codigo": d.codigo,
+                "descripcion": d.descripcion,
+                "grado_id": d.grado_id,
+                "capacidad_id": d.capacidad_id,
+                "capacidad_tipo": capacidad["tipo"] if capacidad else None,
+                "capacidad_nombre": capacidad["nombre"] if capacidad else None,
+            }
+            self.desempenos_por_id[d.id] = item
+            self.desempenos_por_grado[d.grado_id].append(item)
+            self.desempenos_por_grado_tipo[(d.grado_id, item["capacidad_tipo"])].append(item)
+
+        # ── Matemática ──
+        self.competencias = [
+            {"id": c.id, "codigo": c.codigo, "nombre": c.nombre, "descripcion": c.descripcion}
+            for c in sorted(competencias, key=lambda c: c.codigo)
+        ]
+        self.competencias_por_id = {c["id"]: c for c in self.competencias}
+
+        self.capacidades_mat = []
+        for cap in capacidades_mat:
+            competencia = self.competencias_por_id[cap.competencia_id]
+            self.capacidades_mat.append({
+                "id": cap.id,
+                "orden": cap.orden,
+                "nombre": cap.nombre,
+                "descripcion": cap.descripcion,
+                "competencia_id": cap.competencia_id,
+                "competencia_codigo": competencia["codigo"],
+                "competencia_nombre": competencia["nombre"],
+            })
+        self.capacidades_mat.sort(key=lambda c: (c["competencia_codigo"], c["orden"]))
+        self.capacidades_mat_por_id = {c["id"]: c for c in self.capacidades_mat}
+        self.capacidades_mat_por_competencia: dict[int, list] = defaultdict(list)
+        for cap in self.capacidades_mat:
+            self.capacidades_mat_por_competencia[cap["competencia_id"]].append(cap)
+
+        self.estandares = [
+            {
+                "id": e.id,
+                "descripcion": e.descripcion,
+                "ciclo": e.ciclo,
+                "grado_id": e.grado_id,
+                "competencia_id": e.competencia_id,
+            }
+            for e in sorted(estandares, key=lambda e: e.id)
+        ]
+        self.estandar_por_grado_competencia = {
+            (e["grado_id"], e["competencia_id"]): e for e in reversed(self.estandares)
+        }
+
+        self.desempenos_mat: list[dict] = []
+        for d in desempenos_mat:
+            cap = self.capacidades_mat_por_id[d.capacidad_id]
+            self.desempenos_mat.append({
+                "id": d.id,
+                "codigo": d.codigo,
+                "descripcion": d.descripcion,
+                "grado_id": d.grado_id,
+                "capacidad_id": d.capacidad_id,
+                "capacidad_orden": cap["orden"],
+                "capacidad_nombre": cap["nombre"],
+                "competencia_id": cap["competencia_id"],
+                "competencia_codigo": cap["competencia_codigo"],
+                "competencia_nombre": cap["competencia_nombre"],
+            })
+        self.desempenos_mat.sort(key=lambda d: (d["codigo"], d["id"]))
+        self.desempenos_mat_por_id = {d["id"]: d for d in self.desempenos_mat}
+
+        self._curriculo_completo: Optional[list] = None
+
+        # ETag derivado del contenido: igual en todos los workers para los mismos datos
+        self.etag = f'W/"curriculo-{self._digest()}"'
+
+    def _digest(self) -> str:
+        contenido = json.dumps(
+            [
+                self.grados, self.capacidades, list(self.desempenos_por_id.values()),
+                self.competencias, self.capacidades_mat, self.estandares, self.desempenos_mat,
+            ],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:20]
+
+    # ──────────────────────────────────────────────
+    # Consultas
+    # ──────────────────────────────────────────────
+
+    def get_grado(self, grado_id: int) -> Optional[dict]:
+        return self.grados_por_id.get(grado_id)
+
+    def get_grado_adyacente(self, grado_id: int, direccion: str = "inferior") -> Optional[dict]:
+        grado = self.grados_por_id.get(grado_id)
+        if not grado:
+            return None
+        orden = grado["orden"] - 1 if direccion == "inferior" else grado["orden"] + 1
+        return self.grados_por_orden.get(orden)
+
+    def get_desempenos_lectura(self, grado_id: int, tipo_capacidad: Optional[str] = None) -> list[dict]:
+        if tipo_capacidad:
+            return self.desempenos_por_grado_tipo.get((grado_id, tipo_capacidad), [])
+        return self.desempenos_por_grado.get(grado_id, [])
+
+    def get_desempenos_lectura_por_ids(self, ids: list[int]) -> list[dict]:
+        return [self.desempenos_por_id[i] for i in sorted(set(ids)) if i in self.desempenos_por_id]
+
+    def get_competencia(self, competencia_id: int) -> Optional[dict]:
+        return self.competencias_por_id.get(competencia_id)
+
+    def get_capacidades_mat(self, competencia_id: Optional[int] = None) -> list[dict]:
+        if competencia_id:
+            return self.capacidades_mat_por_competencia.get(competencia_id, [])
+        return self.capacidades_mat
+
+    def get_estandares(
+        self,
+        grado_id: Optional[int] = None,
+        competencia_id: Optional[int] = None
+    ) -> list[dict]:
+        return [
+            e for e in self.estandares
+            if (not grado_id or e["grado_id"] == grado_id)
+            and (not competencia_id or e["competencia_id"] == competencia_id)
+        ]
+
+    def get_estandar(self, grado_id: int, competencia_id: int) -> Optional[dict]:
+        return self.estandar_por_grado_competencia.get((grado_id, competencia_id))
+
+    def get_desempenos_mat(
+        self,
+        grado_id: Optional[int] = None,
+        competencia_id: Optional[int] = None,
+        capacidad_id: Optional[int] = None
+    ) -> list[dict]:
+        return [
+            d for d in self.desempenos_mat
+            if (not grado_id or d["grado_id"] == grado_id)
+            and (not competencia_id or d["competencia_id"] == competencia_id)
+            and (not capacidad_id or d["capacidad_id"] == capacidad_id)
+        ]
+
+    def get_desempenos_mat_por_ids(self, ids: list[int]) -> list[dict]:
+        return [self.desempenos_mat_por_id[i] for i in sorted(set(ids)) if i in self.desempenos_mat_por_id]
+
+    def get_curriculo_matematica(self, grado_id: int, competencia_id: int) -> Optional[dict]:
+        """Árbol completo de un grado y competencia; None si alguno no existe."""
+        grado = self.get_grado(grado_id)
+        competencia = self.get_competencia(competencia_id)
+        if not grado or not competencia:
+            return None
+        return {
+            "grado": grado,
+            "competencia": competencia,
+            "estandar": self.get_estandar(grado_id, competencia_id),
+            "capacidades": self.get_capacidades_mat(competencia_id),
+            "desempenos": self.get_desempenos_mat(grado_id, competencia_id),
+        }
+
+    def get_curriculo_matematica_completo(self) -> list[dict]:
+        """Currículo de matemática de todos los grados y competencias (se arma una vez)."""
+        if self._curriculo_completo is None:
+            self._curriculo_completo = [
+                {
+                    **grado,
+                    "competencias": [
+                        {
+                            clave: valor
+                            for clave, valor in self.get_curriculo_matematica(grado["id"], competencia["id"]).items()
+                            if clave != "grado"
+                        }
+                        for competencia in self.competencias
+                    ],
+                }
+                for grado in self.grados
+            ]
+        return self._curriculo_completo
+
+
+class CurriculumService:
+    """Mantiene la instantánea del currículo y la recarga cuando cambia la versión."""
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[CurriculumSnapshot] = None
+        self._ultimo_chequeo = 0.0
+        self._lock = asyncio.Lock()
+        self.recargas = 0
+
+    async def _leer_version(self, db: AsyncSession) -> int:
+        result = await db.execute(
+            select(VersionCatalogo.version).where(VersionCatalogo.nombre == CATALOGO_CURRICULO)
+        )
+        return result.scalar() or 0
+
+    async def _cargar(self, db: AsyncSession) -> CurriculumSnapshot:
+        """
+        Lee todo el currículo en tres consultas con carga ansiosa por JOIN:
+        grados con sus estándares, capacidades de lectura con sus desempeños y
+        el árbol competencia → capacidad → desempeño de matemática.
+        """
+        version = await self._leer_version(db)
+
+        grados = (await db.execute(
+            select(Grado).options(joinedload(Grado.estandares_mat))
+        )).unique().scalars().all()
+
+        capacidades = (await db.execute(
+            select(Capacidad).options(joinedload(Capacidad.desempenos))
+        )).unique().scalars().all()
+
+        competencias = (await db.execute(
+            select(CompetenciaMatematica).options(
+                joinedload(CompetenciaMatematica.capacidades).joinedload(CapacidadMatematica.desempenos)
+            )
+        )).unique().scalars().all()
+
+        capacidades_mat = [cap for comp in competencias for cap in comp.capacidades]
+        snapshot = CurriculumSnapshot(
+            version=version,
+            grados=grados,
+            capacidades=capacidades,
+            desempenos=[d for cap in capacidades for d in cap.desempenos],
+            competencias=competencias,
+            capacidades_mat=capacidades_mat,
+            estandares=[e for g in grados for e in g.estandares_mat],
+            desempenos_mat=[d for cap in capacidades_mat for d in cap.desempenos]
+        )
+        self.recargas += 1
+        logger.info("Currículo cargado en memoria (versión %d)", version)
+        return snapshot
+
+    async def cargar(self, db: Optional[AsyncSession] = None) -> CurriculumSnapshot:
+        """Carga (o recarga) la instantánea desde la base de datos."""
+        async with self._lock:
+            if db is not None:
+                self._snapshot = await self._cargar(db)
+            else:
+                async with AsyncSessionLocal() as sesion:
+                    self._snapshot = await self._cargar(sesion)
+            self._ultimo_chequeo = time.monotonic()
+            return self._snapshot
+
+    async def obtener(self, db: Optional[AsyncSession] = None) -> CurriculumSnapshot:
+        """
+        Devuelve la instantánea vigente. Solo consulta la BD (una fila) si pasó
+        el intervalo de verificación, y recarga si la versión cambió.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.cargar(db)
+        if time.monotonic() - self._ultimo_chequeo < self.check_seconds:
+            return snapshot
+
+        async with self._lock:
+            if self._snapshot is not snapshot or time.monotonic() - self._ultimo_chequeo < self.check_seconds:
+                return self._snapshot
+            try:
+                if db is not None:
+                    version = await self._leer_version(db)
+                else:
+                    async with AsyncSessionLocal() as sesion:
+                        version = await self._leer_version(sesion)
+            except Exception as e:
+                logger.warning("No se pudo verificar la versión del currículo: %s", e)
+                return snapshot
+            self._ultimo_chequeo = time.monotonic()
+            if version == snapshot.version:
+                return snapshot
+
+        return await self.cargar(db)
+
+    async def invalidar(self, db: AsyncSession) -> None:
+        """
+        Incrementa la versión del currículo dentro de la transacción actual.
+        Debe llamarse antes del commit de una escritura sobre datos curriculares.
+        """
+        await db.run_sync(incrementar_version_curriculo)
+        # Forzar la verificación en la próxima lectura de este worker
+        self._ultimo_chequeo = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "version": self._snapshot.version if self._snapshot else None,
+            "etag": self._snapshot.etag if self._snapshot else None,
+            "recargas": self.recargas,
+            "grados": len(self._snapshot.grados) if self._snapshot else 0,
+            "desempenos_lectura": len(self._snapshot.desempenos_por_id) if self._snapshot else 0,
+            "desempenos_matematica": len(self._snapshot.desempenos_mat) if self._snapshot else 0,
+        }
+
+
+# Singleton instance
+curriculum_service = CurriculumService(check_seconds=settings.curriculum_check_seconds)
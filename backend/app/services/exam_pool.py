@@ -0,0 +1,374 @@
+"""
+Pool de exámenes generados por adelantado para las especificaciones más solicitadas.
+
+El uso se concentra en pocas combinaciones (unos grados, dificultad
+intermedia, cantidad por defecto). Para ellas se mantienen EXAM_POOL_SIZE
+exámenes ya generados y validados, de modo que /generar responde al
+instante y el examen servido se repone en segundo plano.
+
+    - Especificación: los parámetros de la solicitud que definen el examen,
+      normalizados (desempeños ordenados, sin el modo de caché). Las
+      solicitudes con texto o situación base propios no se atienden desde
+      el pool.
+    - Uso: cada solicitud suma en memoria; el ciclo de reposición lo vuelca
+      a pool_especificaciones (sin escrituras en el camino de la solicitud).
+    - Reposición: cada EXAM_POOL_REFILL_SECONDS se completan las
+      especificaciones con al menos EXAM_POOL_MIN_REQUESTS solicitudes en la
+      ventana reciente (las EXAM_POOL_MAX_SPECS más pedidas). Se genera con
+      cache="bypass" para que cada examen sea distinto, y solo se guardan
+      exámenes sin preguntas pendientes de reparar.
+    - Un solo uso: el examen se reclama con un UPDATE condicionado a su
+      estado "disponible", así que dos solicitudes (del mismo docente o de
+      otro) nunca reciben el mismo examen.
+    - Un cambio del currículo deja sin efecto los exámenes generados antes.
+
+Con varios workers cada uno ejecuta su ciclo; a lo sumo se generan algunos
+exámenes de más, que se sirven igual.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.models.db_models import EspecificacionPool, ExamenPool
+from app.services.curriculum_service import curriculum_service
+from app.services.job_service import job_service
+from app.services.lectosistem_service import lectosistem_service
+from app.services.matsistem_service import matsistem_service
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Parámetros que definen el examen, por tipo (el resto no cambia el contenido)
+CAMPOS_ESPECIFICACION = {
+    "lectosistem": (
+        "grado_id", "desempeno_ids", "cantidad", "nivel_dificultad", "modelo",
+        "tipo_textual", "formato_textual",
+        "cantidad_literal", "cantidad_inferencial", "cantidad_critico", "modo_generacion",
+    ),
+    "matsistem": (
+        "grado_id", "competencia_id", "desempeno_ids", "cantidad", "nivel_dificultad", "modelo",
+    ),
+}
+
+# Texto propio del docente: hace único el examen
+CAMPO_TEXTO_BASE = {"lectosistem": "texto_base", "matsistem": "situacion_base"}
+
+# Exámenes ya usados que se conservan como registro antes de borrarlos
+RETENCION_USADOS_DIAS = 30
+
+# Candidatos que se intentan reclamar si otra solicitud se adelanta
+INTENTOS_RECLAMO = 3
+
+
+def especificacion(tipo: str, parametros: dict) -> Optional[tuple[str, dict]]:
+    """
+    Clave y parámetros normalizados de la solicitud.
+
+    Returns:
+        None si la solicitud no se puede atender desde el pool
+        (tipo desconocido, texto base propio o cache="bypass")
+    """
+    campos = CAMPOS_ESPECIFICACION.get(tipo)
+    if campos is None or parametros.get(CAMPO_TEXTO_BASE[tipo]) or parametros.get("cache") == "bypass":
+        return None
+    normalizados = {campo: parametros.get(campo) for campo in campos}
+    normalizados["desempeno_ids"] = sorted(set(normalizados["desempeno_ids"] or []))
+    if not normalizados["desempeno_ids"]:
+        return None
+    normalizados["nivel_dificultad"] = (normalizados["nivel_dificultad"] or "intermedio").lower()
+    normalizados["modelo"] = normalizados["modelo"] or "gemini"
+    contenido = json.dumps([tipo, normalizados], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest(), normalizados
+
+
+class ExamPoolService:
+    """Sirve exámenes desde el pool y lo repone en segundo plano."""
+
+    def __init__(
+        self,
+        enabled: bool,
+        tamano: int,
+        max_especificaciones: int,
+        min_solicitudes: int,
+        ventana_horas: int,
+        intervalo_segundos: int,
+        concurrencia: int
+    ):
+        self.enabled = enabled
+        self.tamano = tamano
+        self.max_especificaciones = max_especificaciones
+        self.min_solicitudes = min_solicitudes
+        self.ventana_horas = ventana_horas
+        self.intervalo_segundos = intervalo_segundos
+        self.concurrencia = concurrencia
+        self._tarea: Optional[asyncio.Task] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._uso: dict[str, list] = {}  # clave -> [tipo, parámetros, solicitudes sin guardar]
+        self._reponiendo: set[str] = set()
+        self._reposiciones: set[asyncio.Task] = set()
+        self.servidos = 0
+        self.fallos = 0
+        self.generados = 0
+        self.descartados = 0
+        self.ultimo_ciclo: Optional[dict] = None
+
+    # ──────────────────────────────────────────────
+    # Ciclo de vida
+    # ──────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Inicia el ciclo de reposición (si el pool está habilitado)."""
+        if not self.enabled or self._tarea is not None:
+            return
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self._tarea = asyncio.create_task(self._ciclo(), name="pool-examenes")
+
+    async def stop(self) -> None:
+        tareas = [t for t in (self._tarea, *self._reposiciones) if t is not None]
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._tarea = None
+        self._reposiciones.clear()
+        await self._guardar_uso()
+
+    # ──────────────────────────────────────────────
+    # API pública
+    # ──────────────────────────────────────────────
+
+    async def tomar(
+        self,
+        db: AsyncSession,
+        tipo: str,
+        parametros: dict,
+        docente_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Reclama un examen listo para la solicitud y lo repone en segundo plano.
+
+        Returns:
+            El resultado del examen (mismo formato que generar_desde_preparacion)
+            o None si no hay ninguno disponible
+        """
+        if not self.enabled:
+            return None
+        spec = especificacion(tipo, parametros)
+        if spec is None:
+            return None
+        clave, normalizados = spec
+        self._registrar_uso(clave, tipo, normalizados)
+
+        version = (await curriculum_service.obtener(db)).version
+        candidatos = (await db.execute(
+            select(ExamenPool.id)
+            .where(
+                ExamenPool.clave == clave,
+                ExamenPool.estado == "disponible",
+                ExamenPool.version_curriculo == version
+            )
+            .order_by(ExamenPool.id)
+            .limit(INTENTOS_RECLAMO)
+        )).scalars().all()
+
+        for examen_id in candidatos:
+            if not await self._reclamar(db, examen_id, docente_id):
+                continue
+            resultado = (await db.execute(
+                select(ExamenPool.resultado).where(ExamenPool.id == examen_id)
+            )).scalar_one()
+            self.servidos += 1
+            self._reponer_pronto(clave, tipo, normalizados)
+            return {**resultado, "origen": "pool"}
+
+        self.fallos += 1
+        return None
+
+    def stats(self) -> dict:
+        solicitudes = self.servidos + self.fallos
+        return {
+            "habilitado": self.enabled,
+            "tamano_por_especificacion": self.tamano,
+            "max_especificaciones": self.max_especificaciones,
+            "servidos": self.servidos,
+            "sin_examen_disponible": self.fallos,
+            "tasa_aciertos": round(self.servidos / solicitudes, 3) if solicitudes else None,
+            "generados": self.generados,
+            "descartados": self.descartados,
+            "reponiendo": len(self._reponiendo),
+            "ultimo_ciclo": self.ultimo_ciclo,
+        }
+
+    # ──────────────────────────────────────────────
+    # Uso
+    # ──────────────────────────────────────────────
+
+    def _registrar_uso(self, clave: str, tipo: str, parametros: dict) -> None:
+        uso = self._uso.setdefault(clave, [tipo, parametros, 0])
+        uso[2] += 1
+
+    async def _guardar_uso(self) -> None:
+        """Vuelca a la base de datos las solicitudes contadas en memoria."""
+        if not self._uso:
+            return
+        pendientes, self._uso = self._uso, {}
+        ahora = datetime.now(timezone.utc)
+        async with AsyncSessionLocal() as db:
+            for clave, (tipo, parametros, cantidad) in pendientes.items():
+                result = await db.execute(
+                    update(EspecificacionPool)
+                    .where(EspecificacionPool.clave == clave)
+                    .values(solicitudes=EspecificacionPool.solicitudes + cantidad, ultima_solicitud=ahora)
+                )
+                if result.rowcount:
+                    continue
+                try:
+                    async with db.begin_nested():
+                        db.add(EspecificacionPool(
+                            clave=clave, tipo=tipo, parametros=parametros,
+                            solicitudes=cantidad, ultima_solicitud=ahora
+                        ))
+                except IntegrityError:
+                    # Otro worker la creó entre el UPDATE y el INSERT
+                    await db.execute(
+                        update(EspecificacionPool)
+                        .where(EspecificacionPool.clave == clave)
+                        .values(solicitudes=EspecificacionPool.solicitudes + cantidad, ultima_solicitud=ahora)
+                    )
+            await db.commit()
+
+    # ──────────────────────────────────────────────
+    # Reposición
+    # ──────────────────────────────────────────────
+
+    async def _reclamar(self, db: AsyncSession, examen_id: int, docente_id: Optional[int]) -> bool:
+        """Marca el examen como usado solo si sigue disponible (un solo uso)."""
+        result = await db.execute(
+            update(ExamenPool)
+            .where(ExamenPool.id == examen_id, ExamenPool.estado == "disponible")
+            .values(estado="usado", docente_id=docente_id, fecha_uso=datetime.now(timezone.utc))
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    def _reponer_pronto(self, clave: str, tipo: str, parametros: dict) -> None:
+        """Repone en segundo plano el examen recién servido."""
+        if clave in self._reponiendo or self._semaforo is None:
+            return
+        tarea = asyncio.create_task(self._reponer(clave, tipo, parametros))
+        self._reposiciones.add(tarea)
+        tarea.add_done_callback(self._reposiciones.discard)
+
+    async def _ciclo(self) -> None:
+        while True:
+            try:
+                await self._reponer_todo()
+            except Exception as e:
+                logger.warning("No se pudo reponer el pool de exámenes: %s", e)
+            await asyncio.sleep(self.intervalo_segundos)
+
+    async def _reponer_todo(self) -> None:
+        """Guarda el uso, limpia exámenes obsoletos y completa las especificaciones frecuentes."""
+        inicio = time.perf_counter()
+        await self._guardar_uso()
+        ahora = datetime.now(timezone.utc)
+
+        async with AsyncSessionLocal() as db:
+            version = (await curriculum_service.obtener(db)).version
+            descartados = await db.execute(
+                delete(ExamenPool).where(
+                    ExamenPool.estado == "disponible",
+                    ExamenPool.version_curriculo != version
+                )
+            )
+            await db.execute(
+                delete(ExamenPool).where(
+                    ExamenPool.estado == "usado",
+                    ExamenPool.fecha_uso < ahora - timedelta(days=RETENCION_USADOS_DIAS)
+                )
+            )
+            await db.commit()
+
+            especificaciones = (await db.execute(
+                select(EspecificacionPool.clave, EspecificacionPool.tipo, EspecificacionPool.parametros)
+                .where(
+                    EspecificacionPool.solicitudes >= self.min_solicitudes,
+                    EspecificacionPool.ultima_solicitud >= ahora - timedelta(hours=self.ventana_horas)
+                )
+                .order_by(EspecificacionPool.solicitudes.desc())
+                .limit(self.max_especificaciones)
+            )).all()
+
+        await asyncio.gather(*(
+            self._reponer(clave, tipo, parametros) for clave, tipo, parametros in especificaciones
+        ))
+        self.descartados += descartados.rowcount or 0
+        self.ultimo_ciclo = {
+            "fecha": ahora.isoformat(),
+            "especificaciones": len(especificaciones),
+            "obsoletos_descartados": descartados.rowcount or 0,
+            "segundos": round(time.perf_counter() - inicio, 2),
+        }
+
+    async def _disponibles(self, db: AsyncSession, clave: str, version: int) -> int:
+        return (await db.execute(
+            select(func.count(ExamenPool.id)).where(
+                ExamenPool.clave == clave,
+                ExamenPool.estado == "disponible",
+                ExamenPool.version_curriculo == version
+            )
+        )).scalar_one()
+
+    async def _reponer(self, clave: str, tipo: str, parametros: dict) -> None:
+        """Genera los exámenes que faltan para completar la especificación."""
+        if clave in self._reponiendo:
+            return
+        self._reponiendo.add(clave)
+        try:
+            async with AsyncSessionLocal() as db:
+                version = (await curriculum_service.obtener(db)).version
+                faltan = self.tamano - await self._disponibles(db, clave, version)
+                if faltan <= 0:
+                    return
+                preparacion = await job_service.preparar(db, tipo, parametros)
+
+            servicio = lectosistem_service if tipo == "lectosistem" else matsistem_service
+            for _ in range(faltan):
+                async with self._semaforo:
+                    resultado = await servicio.generar_desde_preparacion(
+                        preparacion, modelo=parametros["modelo"], cache="bypass"
+                    )
+                if resultado.get("validacion", {}).get("pendientes"):
+                    self.descartados += 1
+                    continue
+                async with AsyncSessionLocal() as db:
+                    db.add(ExamenPool(clave=clave, version_curriculo=version, resultado=resultado))
+                    await db.commit()
+                self.generados += 1
+        except ValueError as e:
+            # Incluye sobrecarga del proveedor: se reintenta en el próximo ciclo
+            logger.warning("No se pudo reponer la especificación %s del pool: %s", clave[:12], e)
+        finally:
+            self._reponiendo.discard(clave)
+
+
+# Singleton instance
+exam_pool = ExamPoolService(
+    enabled=settings.exam_pool_enabled,
+    tamano=settings.exam_pool_size,
+    max_especificaciones=settings.exam_pool_max_specs,
+    min_solicitudes=settings.exam_pool_min_requests,
+    ventana_horas=settings.exam_pool_window_hours,
+    intervalo_segundos=settings.exam_pool_refill_seconds,
+    concurrencia=settings.exam_pool_concurrency
+)
@@ -0,0 +1,176 @@
+"""
+Validación y reparación de exámenes generados.
+
+Tras generar un examen se comprueba:
+    - que tenga la cantidad de preguntas solicitada
+    - que cada pregunta tenga enunciado, 4 alternativas A-D y UNA sola correcta
+
+La tabla de respuestas no se valida aquí: se deriva después a partir de las
+preguntas ya reparadas (ver answer_key).
+
+Los problemas se corrigen de la forma más barata posible:
+    - preguntas sobrantes: se descartan
+    - preguntas inválidas o faltantes: se regeneran SOLO esas con un prompt
+      breve (misma lectura/situación, sin volver a generar el examen) y se
+      insertan en su lugar
+
+Regenerar 1 de 10 preguntas es mucho más rápido y barato que repetir el
+examen completo. Si tras EXAM_REPAIR_MAX_ROUNDS rondas quedan preguntas
+inválidas, el examen se devuelve igual con el detalle en el reporte.
+"""
+import logging
+from typing import Callable, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+from app.models.examen_ia import LETRAS
+from app.services.prompt_templates import PromptRenderizado
+from app.services.structured_output import structured_output
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class Solicitud(NamedTuple):
+    """Pregunta a regenerar: número, motivo y la pregunta original (None si falta)."""
+    numero: int
+    motivo: str
+    original: Optional[dict]
+
+
+def problemas_pregunta(pregunta: dict) -> list[str]:
+    """Motivos por los que una pregunta no es válida (lista vacía si es válida)."""
+    motivos = []
+    if not str(pregunta.get("enunciado") or "").strip():
+        motivos.append("no tiene enunciado")
+    opciones = pregunta.get("opciones") or []
+    letras = sorted(str(opcion.get("letra", "")).strip().upper() for opcion in opciones)
+    if letras != LETRAS:
+        motivos.append(f"no tiene exactamente las alternativas A, B, C y D (tiene {len(opciones)})")
+    correctas = sum(1 for opcion in opciones if opcion.get("es_correcta") is True)
+    if correctas != 1:
+        motivos.append(f"tiene {correctas} alternativas marcadas como correctas")
+    return motivos
+
+
+class ExamRepairService:
+    """Valida exámenes generados y regenera solo las preguntas inválidas."""
+
+    def __init__(self, enabled: bool, max_rondas: int):
+        self.enabled = enabled
+        self.max_rondas = max_rondas
+        self.examenes = 0
+        self.examenes_con_problemas = 0
+        self.preguntas_regeneradas = 0
+        self.preguntas_pendientes = 0
+
+    def _solicitudes(self, preguntas: list[dict], cantidad: int) -> list[Solicitud]:
+        solicitudes = []
+        for pregunta in preguntas:
+            motivos = problemas_pregunta(pregunta)
+            if motivos:
+                solicitudes.append(Solicitud(pregunta["numero"], "; ".join(motivos), pregunta))
+        for numero in range(len(preguntas) + 1, cantidad + 1):
+            solicitudes.append(Solicitud(numero, "falta en el examen", None))
+        return solicitudes
+
+    async def _regenerar(
+        self,
+        ai_service,
+        prompt: PromptRenderizado,
+        esquema: type[BaseModel],
+        cache: str
+    ) -> list[dict]:
+        try:
+            texto = await ai_service.generate(prompt.texto, cache=cache)
+            return structured_output.parsear(texto, esquema, ai_service.clean_json_response)["preguntas"]
+        except ValueError as e:
+            # Incluye sobrecarga del proveedor: el examen se devuelve con las preguntas pendientes
+            logger.warning("No se pudieron regenerar preguntas: %s", e)
+            return []
+
+    async def reparar(
+        self,
+        ai_service,
+        examen: dict,
+        cantidad: int,
+        construir: Callable[[dict, list[Solicitud]], PromptRenderizado],
+        esquema: type[BaseModel],
+        cache: str = "prefer"
+    ) -> dict:
+        """
+        Valida el examen y lo repara en su lugar.
+
+        Args:
+            construir: construir(examen, solicitudes) arma el prompt de reparación
+            esquema: modelo de la respuesta de reparación ({"preguntas": [...]})
+
+        Returns:
+            Reporte con los problemas encontrados, las preguntas regeneradas y las pendientes
+        """
+        preguntas = examen.setdefault("preguntas", [])
+        reporte = {"problemas": [], "regeneradas": [], "pendientes": []}
+
+        if len(preguntas) > cantidad:
+            reporte["problemas"].append(
+                f"El examen tiene {len(preguntas)} preguntas en lugar de {cantidad}; se descartan las sobrantes"
+            )
+            del preguntas[cantidad:]
+        for numero, pregunta in enumerate(preguntas, start=1):
+            pregunta["numero"] = numero
+
+        regeneradas: set[int] = set()
+        solicitudes = self._solicitudes(preguntas, cantidad)
+        reporte["problemas"].extend(f"Pregunta {s.numero}: {s.motivo}" for s in solicitudes)
+
+        for ronda in range(self.max_rondas):
+            if not solicitudes:
+                break
+            # En rondas posteriores no se reutiliza una reparación en caché que ya falló
+            modo = cache if ronda == 0 or cache == "only" else "bypass"
+            nuevas = await self._regenerar(ai_service, construir(examen, solicitudes), esquema, modo)
+            for solicitud, nueva in zip(solicitudes, nuevas):
+                if problemas_pregunta(nueva):
+                    continue
+                nueva["numero"] = solicitud.numero
+                if solicitud.original is not None:
+                    preguntas[solicitud.numero - 1] = nueva
+                elif solicitud.numero == len(preguntas) + 1:
+                    preguntas.append(nueva)
+                else:
+                    continue
+                regeneradas.add(solicitud.numero)
+            solicitudes = self._solicitudes(preguntas, cantidad)
+
+        reporte["regeneradas"] = sorted(regeneradas)
+        reporte["pendientes"] = [s.numero for s in solicitudes]
+
+        self.examenes += 1
+        if reporte["problemas"]:
+            self.examenes_con_problemas += 1
+            logger.info(
+                "Examen reparado: %s problemas, %s preguntas regeneradas, %s pendientes",
+                len(reporte["problemas"]), len(regeneradas), len(solicitudes)
+            )
+        self.preguntas_regeneradas += len(regeneradas)
+        self.preguntas_pendientes += len(solicitudes)
+        return reporte
+
+    def stats(self) -> dict:
+        return {
+            "habilitada": self.enabled,
+            "max_rondas": self.max_rondas,
+            "examenes_validados": self.examenes,
+            "examenes_con_problemas": self.examenes_con_problemas,
+            "preguntas_regeneradas": self.preguntas_regeneradas,
+            "preguntas_pendientes": self.preguntas_pendientes,
+        }
+
+
+# Singleton instance
+exam_repair = ExamRepairService(
+    enabled=settings.exam_repair_enabled,
+    max_rondas=settings.exam_repair_max_rounds
+)
@@ -0,0 +1,162 @@
+"""
+Caché persistente de archivos subidos.
+
+Guarda, por SHA-256 del contenido, el resultado de procesar el archivo:
+el veredicto de seguridad y el texto extraído (o el error). El mismo PDF del
+MINEDU que circula entre los docentes de una UGEL se procesa una sola vez.
+
+Cada entrada registra la versión de las reglas del escáner con que se
+obtuvo; una entrada de otra versión se ignora y se vuelve a procesar.
+La tabla se limita por el tamaño total del texto guardado, eliminando las
+entradas menos usadas.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select, delete, update, func
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.models.db_models import ExtraccionArchivoCache
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Cada cuántas escrituras se purga la tabla
+PURGE_EVERY_WRITES = 20
+
+# (texto, error) con el mismo formato que file_service.procesar_documento
+ResultadoExtraccion = Tuple[str, Optional[Tuple[int, str]]]
+
+
+class ExtractionCache:
+    """Caché de resultados de extracción indexada por hash de contenido."""
+
+    def __init__(self, max_bytes: int, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    async def get(self, hash_contenido: str, extension: str, version: str) -> Optional[ResultadoExtraccion]:
+        if not self.enabled:
+            return None
+        try:
+            async with AsyncSessionLocal() as db:
+                entrada = (await db.execute(
+                    select(ExtraccionArchivoCache).where(
+                        ExtraccionArchivoCache.hash_contenido == hash_contenido,
+                        ExtraccionArchivoCache.extension == extension,
+                        ExtraccionArchivoCache.version_escaner == version
+                    )
+                )).scalars().first()
+                if entrada is not None:
+                    await db.execute(
+                        update(ExtraccionArchivoCache)
+                        .where(ExtraccionArchivoCache.hash_contenido == hash_contenido)
+                        .values(
+                            ultimo_acceso=datetime.now(timezone.utc),
+                            aciertos=ExtraccionArchivoCache.aciertos + 1
+                        )
+                    )
+                    await db.commit()
+        except Exception as e:
+            logger.warning("Caché de extracciones no disponible: %s", e)
+            return None
+
+        if entrada is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if entrada.valido:
+            return entrada.texto or "", None
+        return "", (entrada.error_status, entrada.error_detalle)
+
+    async def set(
+        self,
+        hash_contenido: str,
+        extension: str,
+        version: str,
+        size_bytes: int,
+        resultado: ResultadoExtraccion
+    ) -> None:
+        if not self.enabled:
+            return
+        texto, error = resultado
+        now = datetime.now(timezone.utc)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.merge(ExtraccionArchivoCache(
+                    hash_contenido=hash_contenido,
+                    extension=extension,
+                    version_escaner=version,
+                    valido=error is None,
+                    texto=texto if error is None else None,
+                    error_status=error[0] if error else None,
+                    error_detalle=error[1] if error else None,
+                    size_bytes=size_bytes,
+                    tamano_texto=len((texto if error is None else error[1]).encode("utf-8")),
+                    fecha_creacion=now,
+                    ultimo_acceso=now,
+                    aciertos=0
+                ))
+                await db.commit()
+        except Exception as e:
+            logger.warning("No se pudo guardar en la caché de extracciones: %s", e)
+            return
+
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            await self.purge(version)
+
+    async def purge(self, version: str) -> None:
+        """Elimina entradas de otras versiones del escáner y las menos usadas si se supera el tamaño."""
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    delete(ExtraccionArchivoCache).where(ExtraccionArchivoCache.version_escaner != version)
+                )
+                total = (await db.execute(
+                    select(func.coalesce(func.sum(ExtraccionArchivoCache.tamano_texto), 0))
+                )).scalar() or 0
+                exceso = total - self.max_bytes
+                if exceso > 0:
+                    filas = await db.execute(
+                        select(ExtraccionArchivoCache.hash_contenido, ExtraccionArchivoCache.tamano_texto)
+                        .order_by(ExtraccionArchivoCache.ultimo_acceso)
+                    )
+                    claves = []
+                    for hash_contenido, tamano in filas:
+                        claves.append(hash_contenido)
+                        exceso -= tamano
+                        if exceso <= 0:
+                            break
+                    await db.execute(
+                        delete(ExtraccionArchivoCache).where(ExtraccionArchivoCache.hash_contenido.in_(claves))
+                    )
+                await db.commit()
+        except Exception as e:
+            logger.warning("No se pudo purgar la caché de extracciones: %s", e)
+
+    async def clear(self) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(ExtraccionArchivoCache))
+            await db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "habilitada": self.enabled,
+            "limite_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "aciertos": self.hits,
+            "fallos": self.misses,
+        }
+
+
+# Singleton instance
+extraction_cache = ExtractionCache(
+    max_bytes=settings.file_cache_max_mb * 1024 * 1024,
+    enabled=settings.file_cache_enabled
+)
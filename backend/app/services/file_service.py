@@ -5,13 +5,22 @@ Incluye validaciones de seguridad multicapa para prevenir archivos maliciosos.
 import fitz  # PyMuPDF
 from docx import Document
 from fastapi import UploadFile, HTTPException
+import asyncio
+import hashlib
 import io
+import os
 import re
+import tempfile
 import unicodedata
-from typing import Tuple
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
 import zipfile
 import logging
 
+from app.core.config import get_settings
+from app.services.process_pool import process_pool, TiempoAgotadoError
+from app.services.extraction_cache import extraction_cache
+
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
 # ──────────────────────────────────────────────
@@ -21,6 +30,12 @@ logger = logging.getLogger(__name__)
 # Tamaño máximo permitido: 10 MB
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024
 
+# Lectura por bloques de la subida: el primer bloque basta para validar la firma
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Documento a procesar: contenido en memoria o ruta a un archivo temporal
+Origen = Union[bytes, str]
+
 # Extensiones permitidas
 ALLOWED_EXTENSIONS = {"pdf", "docx", "doc"}
 
@@ -45,27 +60,44 @@ PDF_DANGEROUS_PATTERNS = [
     rb"<script",
 ]
 
-# Patrones peligrosos en XML interno de DOCX
+# Patrones peligrosos en XML interno de DOCX (se inspeccionan todas las partes XML)
 DOCX_DANGEROUS_PATTERNS = [
-    r"<\s*script",
-    r"javascript\s*:",
-    r"vbscript\s*:",
-    r"on\w+\s*=",       # onload=, onclick=, etc.
-    r"<\s*object\b",
-    r"<\s*embed\b",
-    r"<\s*iframe\b",
-    r"macroEnabled",
-    r"w:macros",
+    rb"<\s*script",
+    rb"javascript\s*:",
+    rb"vbscript\s*:",
+    rb"(?<![\w:])on[a-z]+\s*=",   # onload=, onclick=, etc. (no standalone=, w:on...=)
+    rb"<\s*object\b",
+    rb"<\s*embed\b",
+    rb"<\s*iframe\b",
+    rb"macroEnabled",
+    rb"w:macros",
 ]
 
-# Archivos XML internos del DOCX que se deben inspeccionar
-DOCX_XML_MEMBERS = [
-    "word/document.xml",
-    "word/settings.xml",
-    "word/webSettings.xml",
-    "[Content_Types].xml",
-    "_rels/.rels",
-]
+# Extensiones de las partes XML internas de un DOCX
+DOCX_XML_EXTENSIONS = (".xml", ".rels")
+
+# Versión de las reglas de validación y extracción. Los veredictos guardados en la
+# caché de extracciones solo valen para la misma versión: cambia sola si cambian los
+# patrones; incrementar REGLAS_REVISION si cambia la lógica de escaneo o extracción.
+REGLAS_REVISION = 1
+SCANNER_VERSION = f"{REGLAS_REVISION}-" + hashlib.sha256(
+    repr((PDF_DANGEROUS_PATTERNS, DOCX_DANGEROUS_PATTERNS, DOCX_XML_EXTENSIONS)).encode()
+).hexdigest()[:12]
+
+# Selección de páginas: rangos 1-based inclusivos, p. ej. ((3, 4), (10, 10)) para "3-4,10"
+RangosPaginas = Tuple[Tuple[int, int], ...]
+MAX_RANGOS_PAGINAS = 20
+
+# Detección de títulos en PDF: un bloque corto cuya letra es al menos este factor
+# mayor que la del cuerpo de la página (o todo en negrita) se considera título
+TITULO_FACTOR_TAMANO = 1.15
+TITULO_MAX_CARACTERES = 120
+MAX_SECCION_CARACTERES = 200
+
+# Escaneo por bloques: tamaño del bloque y solapamiento entre bloques consecutivos
+# (el solapamiento debe cubrir la coincidencia más larga esperable, incluidos espacios)
+SCAN_CHUNK_BYTES = 1024 * 1024
+SCAN_OVERLAP_BYTES = 256
 
 
 # ──────────────────────────────────────────────
@@ -117,31 +149,100 @@ def validate_magic_bytes(content: bytes, extension: str) -> None:
     )
 
 
-def scan_pdf_for_threats(content: bytes) -> None:
+class Deteccion(NamedTuple):
+    """Coincidencia del escáner: patrón que coincidió y texto encontrado (en minúsculas)."""
+    patron: str
+    texto: str
+
+
+class EscanerAmenazas:
+    """
+    Busca una lista de patrones en una sola pasada y se detiene en la primera
+    coincidencia.
+
+    Los patrones se combinan en una sola alternancia precompilada que se
+    aplica al contenido en minúsculas (bytes.lower es muy rápido) en lugar de
+    usar re.IGNORECASE: así el motor de re puede prefiltrar por el primer
+    carácter de cada rama, cosa que no hace con IGNORECASE ni con grupos con
+    nombre. Al encontrar una coincidencia se identifica qué patrón fue
+    probando cada uno en esa posición.
+    """
+
+    def __init__(self, patrones: list[bytes]):
+        for patron in patrones:
+            # Al pasar a minúsculas, \S, \W, \B... cambiarían de significado
+            if re.search(rb"\\[A-Z]", patron):
+                raise ValueError(f"Patrón no soportado (escape en mayúscula): {patron!r}")
+        self.patrones = patrones
+        minusculas = [patron.lower() for patron in patrones]
+        self._regex = re.compile(b"|".join(b"(?:%s)" % patron for patron in minusculas))
+        self._individuales = [re.compile(patron) for patron in minusculas]
+
+    def buscar(self, datos: bytes) -> Optional[Deteccion]:
+        """Devuelve la primera coincidencia o None."""
+        datos = datos.lower()
+        coincidencia = self._regex.search(datos)
+        if coincidencia is None:
+            return None
+        texto = coincidencia.group().decode("utf-8", errors="replace")[:60]
+        for patron, regex in zip(self.patrones, self._individuales):
+            if regex.match(datos, coincidencia.start()):
+                return Deteccion(patron.decode(), texto)
+        return Deteccion(self.patrones[0].decode(), texto)  # inalcanzable: alguna rama coincidió
+
+    def buscar_en_flujo(self, flujo: BinaryIO) -> Optional[Deteccion]:
+        """
+        Igual que buscar(), leyendo el flujo por bloques. Cada bloque se
+        examina junto con el final del anterior para no perder coincidencias
+        que crucen el límite entre bloques.
+        """
+        cola = b""
+        while True:
+            bloque = flujo.read(SCAN_CHUNK_BYTES)
+            if not bloque:
+                return None
+            datos = cola + bloque
+            deteccion = self.buscar(datos)
+            if deteccion:
+                return deteccion
+            cola = datos[-SCAN_OVERLAP_BYTES:]
+
+
+PDF_SCANNER = EscanerAmenazas(PDF_DANGEROUS_PATTERNS)
+DOCX_SCANNER = EscanerAmenazas(DOCX_DANGEROUS_PATTERNS)
+
+
+def scan_pdf_for_threats(origen: Origen) -> None:
     """
     Escanea el contenido binario de un PDF en busca de patrones
     peligrosos (JavaScript embebido, acciones automáticas, etc.).
+    Con una ruta, el archivo se lee por bloques.
     """
-    for pattern in PDF_DANGEROUS_PATTERNS:
-        if re.search(pattern, content, re.IGNORECASE):
-            logger.warning("PDF rechazado: patrón peligroso detectado: %s", pattern)
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    "El archivo PDF contiene elementos potencialmente peligrosos "
-                    "(JavaScript, acciones automáticas u objetos embebidos). "
-                    "Por seguridad, el archivo fue rechazado."
-                )
+    if isinstance(origen, bytes):
+        deteccion = PDF_SCANNER.buscar(origen)
+    else:
+        with open(origen, "rb") as f:
+            deteccion = PDF_SCANNER.buscar_en_flujo(f)
+
+    if deteccion:
+        logger.warning("PDF rechazado: patrón peligroso detectado: %s", deteccion.patron)
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "El archivo PDF contiene elementos potencialmente peligrosos "
+                "(JavaScript, acciones automáticas u objetos embebidos). "
+                f"Por seguridad, el archivo fue rechazado (detectado: '{deteccion.texto}')."
             )
+        )
 
 
-def scan_docx_for_threats(content: bytes) -> None:
+def scan_docx_for_threats(origen: Origen) -> None:
     """
     Abre el DOCX como ZIP e inspecciona los archivos XML internos
     en busca de scripts, macros o contenido malicioso.
     """
     try:
-        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+        with zipfile.ZipFile(io.BytesIO(origen) if isinstance(origen, bytes) else origen) as zf:
             member_names = zf.namelist()
 
             # Verificar que no haya archivos ejecutables embebidos
@@ -161,28 +262,6 @@ def scan_docx_for_threats(content: bytes) -> None:
                     )
                 )
 
-            # Inspeccionar XMLs internos
-            for member in DOCX_XML_MEMBERS:
-                if member in member_names:
-                    try:
-                        xml_content = zf.read(member).decode("utf-8", errors="replace")
-                        for pattern in DOCX_DANGEROUS_PATTERNS:
-                            if re.search(pattern, xml_content, re.IGNORECASE):
-                                logger.warning(
-                                    "DOCX rechazado: patrón peligroso '%s' en %s", pattern, member
-                                )
-                                raise HTTPException(
-                                    status_code=400,
-                                    detail=(
-                                        "El archivo Word contiene scripts o macros potencialmente peligrosos. "
-                                        "Por seguridad, el archivo fue rechazado."
-                                    )
-                                )
-                    except HTTPException:
-                        raise
-                    except Exception:
-                        pass  # Si no se puede leer el XML, continuar
-
             # Detectar macros habilitadas (archivos .xlsm / .docm)
             macro_files = [
                 name for name in member_names
@@ -198,6 +277,25 @@ def scan_docx_for_threats(content: bytes) -> None:
                     )
                 )
 
+            # Inspeccionar todas las partes XML internas, por bloques
+            for member in member_names:
+                if not member.lower().endswith(DOCX_XML_EXTENSIONS):
+                    continue
+                try:
+                    with zf.open(member) as parte:
+                        deteccion = DOCX_SCANNER.buscar_en_flujo(parte)
+                except Exception:
+                    continue  # Si no se puede leer el XML, continuar
+                if deteccion:
+                    logger.warning("DOCX rechazado: patrón peligroso '%s' en %s", deteccion.patron, member)
+                    raise HTTPException(
+                        status_code=400,
+                        detail=(
+                            "El archivo Word contiene scripts o macros potencialmente peligrosos. "
+                            f"Por seguridad, el archivo fue rechazado (detectado: '{deteccion.texto}' en {member})."
+                        )
+                    )
+
     except HTTPException:
         raise
     except zipfile.BadZipFile:
@@ -217,20 +315,201 @@ def scan_docx_for_threats(content: bytes) -> None:
 # Extractores de texto
 # ──────────────────────────────────────────────
 
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extrae texto de un archivo PDF usando PyMuPDF."""
-    try:
-        doc = fitz.open(stream=file_content, filetype="pdf")
-        text_parts = []
+class Bloque(NamedTuple):
+    """Bloque de texto de un documento; es_titulo marca los encabezados."""
+    texto: str
+    es_titulo: bool = False
+
+
+class PaginaPDF(NamedTuple):
+    """Página extraída de un PDF (numero es 1-based)."""
+    numero: int
+    texto: str
+    bloques: list[Bloque]
+
 
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            if text.strip():
-                text_parts.append(text)
+def parsear_rangos_paginas(texto: Optional[str]) -> Optional[RangosPaginas]:
+    """
+    Convierte "1-3, 7, 10-12" en ((1, 3), (7, 7), (10, 12)).
+    Devuelve None si no se indicó ningún rango.
+    """
+    if texto is None or not texto.strip():
+        return None
+
+    rangos = []
+    for parte in texto.replace(" ", "").split(","):
+        coincidencia = re.fullmatch(r"(\d{1,5})(?:-(\d{1,5}))?", parte)
+        if not coincidencia:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Rango de páginas inválido: '{parte}'. Use el formato 1-3,7,10-12."
+            )
+        inicio = int(coincidencia.group(1))
+        fin = int(coincidencia.group(2) or inicio)
+        if inicio < 1 or fin < inicio:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Rango de páginas inválido: '{parte}'. "
+                    "Las páginas empiezan en 1 y el inicio no puede ser mayor que el fin."
+                )
+            )
+        rangos.append((inicio, fin))
+
+    if len(rangos) > MAX_RANGOS_PAGINAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Se permiten máximo {MAX_RANGOS_PAGINAS} rangos de páginas."
+        )
+    return tuple(rangos)
+
+
+def formatear_rangos_paginas(rangos: Optional[RangosPaginas]) -> Optional[str]:
+    """Inverso de parsear_rangos_paginas: ((1, 3), (7, 7)) -> "1-3,7"."""
+    if not rangos:
+        return None
+    return ",".join(f"{inicio}-{fin}" if fin != inicio else str(inicio) for inicio, fin in rangos)
+
+
+def _bloques_con_estructura(page) -> list[Bloque]:
+    """Bloques de la página marcando como título los de letra mayor o en negrita."""
+    bloques = []
+    tamanos: dict[float, int] = {}
+    for bloque in page.get_text("dict")["blocks"]:
+        if bloque.get("type") != 0:  # 1 = imagen
+            continue
+        spans = [span for linea in bloque["lines"] for span in linea["spans"] if span["text"].strip()]
+        if not spans:
+            continue
+        texto = "\n".join(
+            "".join(span["text"] for span in linea["spans"]).strip()
+            for linea in bloque["lines"]
+        ).strip()
+        tamano = max(span["size"] for span in spans)
+        negrita = all(span["flags"] & 16 for span in spans)
+        for span in spans:
+            clave = round(span["size"], 1)
+            tamanos[clave] = tamanos.get(clave, 0) + len(span["text"])
+        bloques.append((texto, tamano, negrita))
+
+    # Tamaño del cuerpo: el que más caracteres cubre en la página
+    cuerpo = max(tamanos, key=tamanos.get) if tamanos else 0
+    return [
+        Bloque(
+            texto,
+            len(texto) <= TITULO_MAX_CARACTERES
+            and (tamano >= cuerpo * TITULO_FACTOR_TAMANO or negrita)
+        )
+        for texto, tamano, negrita in bloques
+    ]
+
+
+def iterar_paginas_pdf(
+    origen: Origen,
+    rangos: Optional[RangosPaginas] = None,
+    estructura: bool = False
+) -> Iterator[PaginaPDF]:
+    """
+    Genera las páginas del PDF de una en una, solo las de los rangos pedidos.
 
+    Con estructura=True cada página incluye sus bloques con los títulos
+    marcados (más costoso: requiere la información de fuentes).
+    """
+    if isinstance(origen, bytes):
+        doc = fitz.open(stream=origen, filetype="pdf")
+    else:
+        doc = fitz.open(origen, filetype="pdf")
+    try:
+        total = len(doc)
+        if rangos is None:
+            numeros: Sequence[int] = range(1, total + 1)
+        else:
+            fuera = [inicio for inicio, _ in rangos if inicio > total]
+            if fuera:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"El PDF tiene {total} páginas; no existe la página {fuera[0]}."
+                )
+            numeros = sorted({
+                numero for inicio, fin in rangos
+                for numero in range(inicio, min(fin, total) + 1)
+            })
+
+        for numero in numeros:
+            page = doc[numero - 1]
+            if estructura:
+                bloques = _bloques_con_estructura(page)
+                texto = "\n".join(bloque.texto for bloque in bloques)
+            else:
+                bloques = []
+                texto = page.get_text()
+            yield PaginaPDF(numero, texto, bloques)
+    finally:
         doc.close()
-        return "\n".join(text_parts)
+
+
+def _normalizar_palabras(texto: str) -> set[str]:
+    sin_tildes = unicodedata.normalize("NFKD", texto.lower()).encode("ascii", "ignore").decode()
+    return {palabra for palabra in re.findall(r"[a-z0-9]+", sin_tildes) if len(palabra) > 2}
+
+
+def seleccionar_seccion(bloques: Sequence[Bloque], consulta: str) -> str:
+    """
+    Devuelve la sección (título y bloques hasta el siguiente título) más
+    relevante para la consulta. Las coincidencias en el título pesan más
+    que las del cuerpo.
+    """
+    secciones: list[list[Bloque]] = []
+    for bloque in bloques:
+        if bloque.es_titulo or not secciones:
+            secciones.append([])
+        secciones[-1].append(bloque)
+
+    palabras_consulta = _normalizar_palabras(consulta)
+    mejor, mejor_puntaje = None, 0.0
+    for seccion in secciones:
+        titulo = seccion[0].texto if seccion[0].es_titulo else ""
+        en_titulo = len(palabras_consulta & _normalizar_palabras(titulo))
+        en_cuerpo = len(palabras_consulta & _normalizar_palabras(" ".join(b.texto for b in seccion)))
+        puntaje = 3 * en_titulo + en_cuerpo
+        if puntaje > mejor_puntaje:
+            mejor, mejor_puntaje = seccion, puntaje
+
+    if mejor is None:
+        titulos = [s[0].texto for s in secciones if s[0].es_titulo][:10]
+        detalle = f"No se encontró la sección '{consulta}' en el documento."
+        if titulos:
+            detalle += " Secciones disponibles: " + "; ".join(t.replace("\n", " ") for t in titulos)
+        raise HTTPException(status_code=400, detail=detalle)
+    return "\n".join(bloque.texto for bloque in mejor)
+
+
+def extract_text_from_pdf(
+    origen: Origen,
+    rangos: Optional[RangosPaginas] = None,
+    seccion: Optional[str] = None
+) -> str:
+    """
+    Extrae texto de un archivo PDF usando PyMuPDF.
+
+    Solo se leen las páginas de los rangos indicados; con seccion se analizan
+    los títulos y se devuelve únicamente la sección más relevante.
+    """
+    try:
+        if seccion:
+            bloques = [
+                bloque
+                for pagina in iterar_paginas_pdf(origen, rangos, estructura=True)
+                for bloque in pagina.bloques
+            ]
+            return seleccionar_seccion(bloques, seccion)
+
+        return "\n".join(
+            pagina.texto for pagina in iterar_paginas_pdf(origen, rangos)
+            if pagina.texto.strip()
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -238,24 +517,32 @@ def extract_text_from_pdf(file_content: bytes) -> str:
         )
 
 
-def extract_text_from_docx(file_content: bytes) -> str:
-    """Extrae texto de un archivo Word (.docx)."""
+def extract_text_from_docx(origen: Origen, seccion: Optional[str] = None) -> str:
+    """
+    Extrae texto de un archivo Word (.docx). Con seccion se usan los estilos
+    de título de Word para devolver solo la sección más relevante.
+    """
     try:
-        doc = Document(io.BytesIO(file_content))
-        text_parts = []
+        doc = Document(io.BytesIO(origen) if isinstance(origen, bytes) else origen)
+        bloques = []
 
         for paragraph in doc.paragraphs:
             if paragraph.text.strip():
-                text_parts.append(paragraph.text)
+                estilo = (paragraph.style.name if paragraph.style is not None else "").lower()
+                bloques.append(Bloque(paragraph.text, estilo.startswith(("heading", "título", "title"))))
 
         # También extraer de tablas
         for table in doc.tables:
             for row in table.rows:
                 for cell in row.cells:
                     if cell.text.strip():
-                        text_parts.append(cell.text)
+                        bloques.append(Bloque(cell.text))
 
-        return "\n".join(text_parts)
+        if seccion:
+            return seleccionar_seccion(bloques, seccion)
+        return "\n".join(bloque.texto for bloque in bloques)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -263,11 +550,91 @@ def extract_text_from_docx(file_content: bytes) -> str:
         )
 
 
+def procesar_documento(
+    origen: Origen,
+    extension: str,
+    rangos: Optional[RangosPaginas] = None,
+    seccion: Optional[str] = None
+) -> Tuple[str, Optional[Tuple[int, str]]]:
+    """
+    Etapas CPU intensivas: escaneo de amenazas y extracción de texto.
+    Se ejecuta en el pool de procesos, por eso devuelve el error como
+    (status_code, detail) en lugar de lanzar HTTPException.
+
+    Con una ruta, el escaneo lee el archivo por bloques y los parsers leen
+    directamente del disco, sin copiar el contenido completo a memoria.
+    Los rangos de páginas solo aplican a PDF (Word no tiene páginas fijas).
+
+    Returns:
+        Tuple con (texto, error) donde error es None si todo fue bien
+    """
+    try:
+        if extension == "pdf":
+            scan_pdf_for_threats(origen)
+            return extract_text_from_pdf(origen, rangos, seccion), None
+        if extension == "docx":
+            scan_docx_for_threats(origen)
+        # .doc (OLE2) no es ZIP, solo escaneamos DOCX
+        return extract_text_from_docx(origen, seccion), None
+    except HTTPException as e:
+        return "", (e.status_code, e.detail)
+
+
+# ──────────────────────────────────────────────
+# Recepción de la subida
+# ──────────────────────────────────────────────
+
+def _archivo_demasiado_grande(safe_filename: str, size_bytes: int) -> HTTPException:
+    size_mb = size_bytes / (1024 * 1024)
+    return HTTPException(
+        status_code=413,
+        detail=(
+            f"El archivo '{safe_filename}' pesa {size_mb:.1f} MB. "
+            f"El tamaño máximo permitido es {MAX_FILE_SIZE_BYTES // (1024*1024)} MB."
+        )
+    )
+
+
+async def _volcar_a_temporal(
+    file: UploadFile, primer_bloque: bytes, destino, safe_filename: str
+) -> Tuple[int, str]:
+    """
+    Escribe la subida en el archivo temporal bloque a bloque y corta en
+    cuanto se supera MAX_FILE_SIZE_BYTES. Calcula el SHA-256 en la misma pasada.
+
+    Returns:
+        Tuple con (tamaño total, hash SHA-256 en hexadecimal)
+    """
+    size_bytes = 0
+    digest = hashlib.sha256()
+    bloque = primer_bloque
+    while bloque:
+        size_bytes += len(bloque)
+        if size_bytes > MAX_FILE_SIZE_BYTES:
+            # Tamaño real solo para el mensaje: puede ser mayor al leído
+            raise _archivo_demasiado_grande(safe_filename, file.size or size_bytes)
+        digest.update(bloque)
+        await asyncio.to_thread(destino.write, bloque)
+        bloque = await file.read(UPLOAD_CHUNK_BYTES)
+    return size_bytes, digest.hexdigest()
+
+
 # ──────────────────────────────────────────────
 # Función principal (pipeline de seguridad)
 # ──────────────────────────────────────────────
 
-async def extract_text_from_file(file: UploadFile) -> Tuple[str, dict]:
+def _clave_cache(hash_contenido: str, rangos: Optional[RangosPaginas], seccion: Optional[str]) -> str:
+    """Clave de la caché: el hash del archivo, combinado con las opciones si las hay."""
+    if rangos is None and not seccion:
+        return hash_contenido
+    return hashlib.sha256(f"{hash_contenido}|{rangos}|{seccion}".encode()).hexdigest()
+
+
+async def extract_text_from_file(
+    file: UploadFile,
+    rangos: Optional[RangosPaginas] = None,
+    seccion: Optional[str] = None
+) -> Tuple[str, dict]:
     """
     Extrae texto de un archivo subido (PDF o Word) aplicando un
     pipeline de seguridad multicapa:
@@ -279,6 +646,18 @@ async def extract_text_from_file(file: UploadFile) -> Tuple[str, dict]:
     5. Escanear contenido en busca de amenazas
     6. Extraer texto
 
+    La subida se recibe por bloques: la firma se valida con el primer bloque
+    y el tamaño se controla mientras se vuelca a un archivo temporal, así un
+    archivo falso o demasiado grande se rechaza sin cargarlo entero en memoria.
+    Los pasos 5 y 6 se ejecutan en un proceso aparte con tiempo máximo,
+    para que un documento pesado no bloquee el event loop, salvo que el mismo
+    contenido ya se haya procesado (caché por SHA-256 del archivo).
+
+    Args:
+        file: Archivo subido
+        rangos: Páginas a extraer de un PDF (ver parsear_rangos_paginas)
+        seccion: Título o tema de la sección a conservar; se descarta el resto
+
     Returns:
         Tuple con (texto_extraido, metadata)
     """
@@ -298,40 +677,56 @@ async def extract_text_from_file(file: UploadFile) -> Tuple[str, dict]:
     # ── 2. Sanitizar nombre ───────────────────
     safe_filename = sanitize_filename(filename)
 
-    # ── 3. Leer contenido y verificar tamaño ─
-    content = await file.read()
+    if seccion and len(seccion) > MAX_SECCION_CARACTERES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El nombre de la sección admite máximo {MAX_SECCION_CARACTERES} caracteres."
+        )
+    if extension != "pdf":
+        rangos = None
+
+    # ── 3 y 4. Recibir por bloques: firma en el primer bloque, tamaño incremental ──
+    if file.size is not None and file.size > MAX_FILE_SIZE_BYTES:
+        raise _archivo_demasiado_grande(safe_filename, file.size)
 
-    if len(content) == 0:
+    primer_bloque = await file.read(UPLOAD_CHUNK_BYTES)
+    if not primer_bloque:
         raise HTTPException(status_code=400, detail="El archivo está vacío.")
 
-    if len(content) > MAX_FILE_SIZE_BYTES:
-        size_mb = len(content) / (1024 * 1024)
-        raise HTTPException(
-            status_code=413,
-            detail=(
-                f"El archivo '{safe_filename}' pesa {size_mb:.1f} MB. "
-                f"El tamaño máximo permitido es {MAX_FILE_SIZE_BYTES // (1024*1024)} MB."
-            )
-        )
+    validate_magic_bytes(primer_bloque, extension)
 
-    # ── 4. Verificar magic bytes ──────────────
-    validate_magic_bytes(content, extension)
+    temporal = tempfile.NamedTemporaryFile(prefix="upload_", suffix=f".{extension}", delete=False)
+    try:
+        with temporal:
+            size_bytes, hash_contenido = await _volcar_a_temporal(file, primer_bloque, temporal, safe_filename)
+
+        # ── 5 y 6. Escanear amenazas y extraer texto (caché por hash o pool de procesos) ──
+        clave = _clave_cache(hash_contenido, rangos, seccion)
+        resultado = await extraction_cache.get(clave, extension, SCANNER_VERSION)
+        desde_cache = resultado is not None
+        if not desde_cache:
+            try:
+                resultado = await process_pool.ejecutar(
+                    procesar_documento, temporal.name, extension, rangos, seccion,
+                    timeout=settings.file_parse_timeout_seconds
+                )
+            except TiempoAgotadoError:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"El archivo '{safe_filename}' tardó demasiado en procesarse. "
+                        "Intente con un archivo más pequeño o sin imágenes pesadas."
+                    )
+                )
+            await extraction_cache.set(clave, extension, SCANNER_VERSION, size_bytes, resultado)
+    finally:
+        os.unlink(temporal.name)
 
-    # ── 5. Escanear amenazas ──────────────────
-    if extension == "pdf":
-        scan_pdf_for_threats(content)
-    elif extension in ("docx", "doc"):
-        # .doc (OLE2) no es ZIP, solo escaneamos DOCX
-        if extension == "docx":
-            scan_docx_for_threats(content)
+    text, error = resultado
 
-    # ── 6. Extraer texto ──────────────────────
-    if extension == "pdf":
-        text = extract_text_from_pdf(content)
-    elif extension in ("docx", "doc"):
-        text = extract_text_from_docx(content)
-    else:
-        raise HTTPException(status_code=400, detail="Tipo de archivo no soportado.")
+    if error:
+        status_code, detail = error
+        raise HTTPException(status_code=status_code, detail=detail)
 
     text = text.strip()
 
@@ -348,11 +743,14 @@ async def extract_text_from_file(file: UploadFile) -> Tuple[str, dict]:
         "filename": safe_filename,
         "filename_original": filename,
         "extension": extension,
-        "size_bytes": len(content),
-        "size_kb": round(len(content) / 1024, 1),
+        "size_bytes": size_bytes,
+        "size_kb": round(size_bytes / 1024, 1),
         "caracteres": len(text),
         "palabras": len(text.split()),
         "lineas": text.count("\n") + 1,
+        "desde_cache": desde_cache,
+        "paginas": formatear_rangos_paginas(rangos),
+        "seccion": seccion or None,
     }
 
     logger.info(
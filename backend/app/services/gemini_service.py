@@ -1,16 +1,22 @@
 import google.generativeai as genai
 import json
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from app.core.config import get_settings
 from app.models.pregunta import Pregunta, TipoPregunta, OpcionMultiple
 from app.services.ai_base import AIService
+from app.services.ai_rate_limiter import ProviderOverloadedError, is_overload_error
+from app.services.context_cache import context_cache
+from app.services.prompt_templates import PlantillaPrompt, prompt_templates
+from app.services.structured_output import structured_output
 
 settings = get_settings()
 
 
 class GeminiService(AIService):
     """Service for generating questions using Google Gemini API."""
+
+    provider = "gemini"
     
     def __init__(self):
         self.model_name = 'gemini-3-flash-preview'
@@ -22,20 +28,47 @@ class GeminiService(AIService):
             
     def is_configured(self) -> bool:
         return self.model is not None
+
+    def generation_config(self) -> dict:
+        return {
+            "response_mime_type": "application/json",
+            "max_output_tokens": 8192,
+        }
+
+    def _config_para(self, plantilla: Optional[PlantillaPrompt]) -> genai.types.GenerationConfig:
+        """Configuración de la llamada; con el esquema de la plantilla si lo tiene (salida estructurada)."""
+        config = self.generation_config()
+        if plantilla is not None and plantilla.esquema is not None:
+            config["response_schema"] = structured_output.esquema(plantilla.esquema, self.provider)
+        return genai.types.GenerationConfig(**config)
         
+    def _registrar_uso(self, usage_metadata) -> None:
+        if usage_metadata is None:
+            return
+        context_cache.registrar_uso(
+            self.provider,
+            entrada=getattr(usage_metadata, "prompt_token_count", 0) or 0,
+            cacheados=getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+            salida=getattr(usage_metadata, "candidates_token_count", 0) or 0,
+        )
+
+    def _error(self, e: Exception) -> Exception:
+        if is_overload_error(e):
+            return ProviderOverloadedError(f"Gemini no disponible temporalmente: {e}")
+        return ValueError(f"Error al generar contenido con Gemini: {e}")
+
     async def generate_content(self, prompt: str) -> str:
         """Generate content implementation for Gemini."""
         if not self.model:
             raise ValueError("Google API key no configurada")
 
+        plantilla = prompt_templates.buscar_por_prefijo(prompt)
         try:
             response = await self.model.generate_content_async(
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    response_mime_type="application/json",
-                    max_output_tokens=8192,
-                ),
+                generation_config=self._config_para(plantilla),
             )
+            self._registrar_uso(getattr(response, "usage_metadata", None))
 
             # Handle blocked or empty responses
             if not response.candidates:
@@ -50,7 +83,41 @@ class GeminiService(AIService):
         except ValueError:
             raise
         except Exception as e:
-            raise ValueError(f"Error al generar contenido con Gemini: {e}")
+            raise self._error(e)
+
+    async def generate_content_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Streaming generate content implementation for Gemini."""
+        if not self.model:
+            raise ValueError("Google API key no configurada")
+
+        plantilla = prompt_templates.buscar_por_prefijo(prompt)
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self._config_para(plantilla),
+                stream=True,
+            )
+
+            received = False
+            usage_metadata = None
+            async for chunk in response:
+                # El uso de tokens acumulado llega en el último fragmento
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                if not chunk.candidates:
+                    block_reason = getattr(chunk.prompt_feedback, 'block_reason', 'desconocido')
+                    raise ValueError(f"Respuesta bloqueada por filtros de seguridad: {block_reason}")
+                text = chunk.text
+                if text:
+                    received = True
+                    yield text
+            self._registrar_uso(usage_metadata)
+
+            if not received:
+                raise ValueError("Gemini devolvió una respuesta vacía")
+        except ValueError:
+            raise
+        except Exception as e:
+            raise self._error(e)
     
     def _build_prompt(
         self, 
@@ -104,7 +171,7 @@ IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con la siguiente estructura
         """Generate questions using Gemini API."""
         
         prompt = self._build_prompt(competencias, cantidad, tipo, dificultad)
-        response_text = await self.generate_content(prompt)
+        response_text = await self.generate(prompt)
         
         try:
             response_text = self.clean_json_response(response_text)
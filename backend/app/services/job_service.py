@@ -0,0 +1,348 @@
+"""
+Cola de trabajos asíncronos para la generación de exámenes.
+
+El envío crea un registro en `trabajos_generacion` y devuelve su id de
+inmediato. Un grupo acotado de tareas asyncio ejecuta los trabajos en tres
+fases: preparación (sesión corta de BD), llamada al modelo de IA (sin sesión
+abierta) y guardado del resultado (otra sesión corta).
+
+Los trabajos pendientes o interrumpidos se recuperan desde la base de datos al
+iniciar y periódicamente, por lo que un reinicio del worker no los pierde: al
+detenerse, el proceso devuelve a "pendiente" los trabajos que tenía en curso,
+y los de un worker caído se recuperan tras JOBS_STALE_SECONDS. Un trabajo que
+ya se intentó JOBS_MAX_ATTEMPTS veces (p. ej. uno que hace caer al worker)
+pasa a "error" en lugar de reencolarse indefinidamente.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import AsyncSessionLocal
+from app.models.db_models import TrabajoGeneracion
+from app.services.lectosistem_service import lectosistem_service
+from app.services.matsistem_service import matsistem_service
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+TIPOS_TRABAJO = ("lectosistem", "matsistem")
+ESTADOS_FINALES = ("completado", "error")
+
+
+class JobService:
+    """Servicio para encolar, ejecutar y consultar trabajos de generación."""
+
+    def __init__(self, max_workers: int, poll_seconds: int, stale_seconds: int, max_intentos: int):
+        self.max_workers = max_workers
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self.max_intentos = max(1, max_intentos)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._encolados: set[str] = set()
+        self._eventos: dict[str, asyncio.Event] = {}
+        self._en_ejecucion: set[str] = set()   # trabajos reclamados por este proceso
+
+    # ──────────────────────────────────────────────
+    # Ciclo de vida
+    # ──────────────────────────────────────────────
+
+    async def start(self) -> None:
+        """Inicia los workers y recupera los trabajos pendientes."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        await self._recuperar_pendientes()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.max_workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._sondeo(), name="job-sondeo"))
+
+    async def stop(self) -> None:
+        """Detiene los workers y devuelve a "pendiente" los trabajos que tenía en curso."""
+        en_curso = list(self._en_ejecucion)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if not en_curso:
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                # La interrupción no es culpa del trabajo: no cuenta como intento
+                await db.execute(
+                    update(TrabajoGeneracion)
+                    .where(
+                        TrabajoGeneracion.id.in_(en_curso),
+                        TrabajoGeneracion.estado == "en_proceso"
+                    )
+                    .values(
+                        estado="pendiente",
+                        fecha_inicio=None,
+                        intentos=TrabajoGeneracion.intentos - 1
+                    )
+                )
+                await db.commit()
+            logger.info("%d trabajos en curso devueltos a la cola", len(en_curso))
+        except Exception as e:
+            logger.warning("No se pudieron devolver los trabajos en curso: %s", e)
+
+    # ──────────────────────────────────────────────
+    # API pública
+    # ──────────────────────────────────────────────
+
+    async def enviar(
+        self,
+        db: AsyncSession,
+        tipo: str,
+        parametros: dict,
+        docente_id: Optional[int] = None
+    ) -> TrabajoGeneracion:
+        """Registra un trabajo nuevo y lo encola."""
+        if tipo not in TIPOS_TRABAJO:
+            raise ValueError(f"Tipo de trabajo no soportado: {tipo}")
+
+        trabajo = TrabajoGeneracion(
+            id=str(uuid.uuid4()),
+            tipo=tipo,
+            estado="pendiente",
+            parametros=parametros,
+            intentos=0,
+            docente_id=docente_id
+        )
+        db.add(trabajo)
+        await db.commit()
+        await db.refresh(trabajo)
+
+        self._eventos[trabajo.id] = asyncio.Event()
+        self._encolar(trabajo.id)
+        return trabajo
+
+    async def obtener(self, db: AsyncSession, trabajo_id: str) -> Optional[TrabajoGeneracion]:
+        result = await db.execute(
+            select(TrabajoGeneracion).where(TrabajoGeneracion.id == trabajo_id)
+        )
+        return result.scalars().first()
+
+    async def esperar(self, trabajo_id: str, timeout: float) -> None:
+        """
+        Espera hasta que el trabajo termine o se agote el tiempo.
+        Si el trabajo se ejecuta en otro proceso, consulta la base de datos cada segundo.
+        """
+        evento = self._eventos.get(trabajo_id)
+        if evento is not None:
+            try:
+                await asyncio.wait_for(evento.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        loop = asyncio.get_running_loop()
+        limite = loop.time() + timeout
+        while loop.time() < limite:
+            async with AsyncSessionLocal() as db:
+                trabajo = await self.obtener(db, trabajo_id)
+            if trabajo is None or trabajo.estado in ESTADOS_FINALES:
+                return
+            await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "en_cola": self._queue.qsize() if self._queue else 0,
+        }
+
+    # ──────────────────────────────────────────────
+    # Ejecución
+    # ──────────────────────────────────────────────
+
+    def _encolar(self, trabajo_id: str) -> None:
+        if self._queue is None or trabajo_id in self._encolados:
+            return
+        self._encolados.add(trabajo_id)
+        self._queue.put_nowait(trabajo_id)
+
+    async def _worker(self) -> None:
+        while True:
+            trabajo_id = await self._queue.get()
+            try:
+                await self._ejecutar(trabajo_id)
+            except Exception as e:
+                logger.exception("Error inesperado en el trabajo %s: %s", trabajo_id, e)
+            finally:
+                self._encolados.discard(trabajo_id)
+                evento = self._eventos.pop(trabajo_id, None)
+                if evento is not None:
+                    evento.set()
+                self._queue.task_done()
+
+    async def _sondeo(self) -> None:
+        """Recupera periódicamente trabajos enviados a workers que ya no existen."""
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self._recuperar_pendientes()
+            except Exception as e:
+                logger.warning("No se pudieron recuperar trabajos pendientes: %s", e)
+
+    async def _recuperar_pendientes(self) -> None:
+        limite = datetime.now(timezone.utc) - timedelta(seconds=self.stale_seconds)
+        async with AsyncSessionLocal() as db:
+            # Trabajos que agotaron sus intentos (abandonados por un worker caído
+            # o pendientes tras el último intento): no se reencolan más
+            abandonado = (TrabajoGeneracion.estado == "en_proceso") & (TrabajoGeneracion.fecha_inicio < limite)
+            await db.execute(
+                update(TrabajoGeneracion)
+                .where(
+                    abandonado | (TrabajoGeneracion.estado == "pendiente"),
+                    TrabajoGeneracion.intentos >= self.max_intentos
+                )
+                .values(
+                    estado="error",
+                    error=f"El trabajo se interrumpió {self.max_intentos} veces sin completarse",
+                    fecha_fin=datetime.now(timezone.utc)
+                )
+            )
+
+            # Trabajos "en_proceso" abandonados por un worker caído
+            await db.execute(
+                update(TrabajoGeneracion)
+                .where(
+                    TrabajoGeneracion.estado == "en_proceso",
+                    TrabajoGeneracion.fecha_inicio < limite
+                )
+                .values(estado="pendiente")
+            )
+            await db.commit()
+
+            result = await db.execute(
+                select(TrabajoGeneracion.id)
+                .where(TrabajoGeneracion.estado == "pendiente")
+                .order_by(TrabajoGeneracion.fecha_creacion)
+            )
+            for trabajo_id in result.scalars().all():
+                self._encolar(trabajo_id)
+
+    async def _reclamar(self, db: AsyncSession, trabajo_id: str) -> bool:
+        """
+        Marca el trabajo como en proceso solo si sigue pendiente (evita duplicados
+        entre workers) y le quedan intentos.
+        """
+        result = await db.execute(
+            update(TrabajoGeneracion)
+            .where(
+                TrabajoGeneracion.id == trabajo_id,
+                TrabajoGeneracion.estado == "pendiente",
+                TrabajoGeneracion.intentos < self.max_intentos
+            )
+            .values(
+                estado="en_proceso",
+                fecha_inicio=datetime.now(timezone.utc),
+                intentos=TrabajoGeneracion.intentos + 1
+            )
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+    async def _ejecutar(self, trabajo_id: str) -> None:
+        # ── Reclamar (sesión corta); desde aquí stop() sabe que lo tiene este proceso ──
+        async with AsyncSessionLocal() as db:
+            if not await self._reclamar(db, trabajo_id):
+                return
+            self._en_ejecucion.add(trabajo_id)
+        try:
+            await self._procesar(trabajo_id)
+        finally:
+            self._en_ejecucion.discard(trabajo_id)
+
+    async def _procesar(self, trabajo_id: str) -> None:
+        # ── 1. Preparar (sesión corta) ──
+        async with AsyncSessionLocal() as db:
+            trabajo = await self.obtener(db, trabajo_id)
+            tipo = trabajo.tipo
+            parametros = dict(trabajo.parametros)
+            try:
+                preparacion = await self.preparar(db, tipo, parametros)
+            except Exception as e:
+                await self._finalizar(trabajo_id, error=str(e))
+                return
+
+        # ── 2. Llamada al modelo de IA (sin sesión de BD) ──
+        try:
+            servicio = lectosistem_service if tipo == "lectosistem" else matsistem_service
+            resultado = await servicio.generar_desde_preparacion(
+                preparacion,
+                modelo=parametros.get("modelo") or "gemini",
+                cache=parametros.get("cache") or "prefer"
+            )
+        except Exception as e:
+            await self._finalizar(trabajo_id, error=str(e))
+            return
+
+        # ── 3. Guardar resultado (sesión corta) ──
+        await self._finalizar(trabajo_id, resultado=resultado)
+
+    async def preparar(self, db: AsyncSession, tipo: str, parametros: dict) -> dict:
+        """Prepara la generación a partir de los parámetros de la solicitud (también la usa el pool)."""
+        if tipo == "lectosistem":
+            return await lectosistem_service.preparar_examen_lectura(
+                db,
+                grado_id=parametros["grado_id"],
+                desempeno_ids=parametros.get("desempeno_ids") or [],
+                cantidad=parametros.get("cantidad", 3),
+                texto_base=parametros.get("texto_base"),
+                nivel_dificultad=parametros.get("nivel_dificultad", "intermedio"),
+                tipo_textual=parametros.get("tipo_textual"),
+                formato_textual=parametros.get("formato_textual"),
+                cantidad_literal=parametros.get("cantidad_literal"),
+                cantidad_inferencial=parametros.get("cantidad_inferencial"),
+                cantidad_critico=parametros.get("cantidad_critico"),
+                modelo=parametros.get("modelo") or "gemini",
+                modo_generacion=parametros.get("modo_generacion") or "completo"
+            )
+        return await matsistem_service.preparar_examen_matematica(
+            db,
+            grado_id=parametros["grado_id"],
+            competencia_id=parametros["competencia_id"],
+            desempeno_ids=parametros.get("desempeno_ids") or [],
+            cantidad=parametros.get("cantidad", 3),
+            situacion_base=parametros.get("situacion_base"),
+            nivel_dificultad=parametros.get("nivel_dificultad", "intermedio"),
+            modelo=parametros.get("modelo") or "gemini"
+        )
+
+    async def _finalizar(
+        self,
+        trabajo_id: str,
+        resultado: Optional[dict] = None,
+        error: Optional[str] = None
+    ) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(TrabajoGeneracion)
+                .where(TrabajoGeneracion.id == trabajo_id)
+                .values(
+                    estado="error" if error else "completado",
+                    resultado=resultado,
+                    error=error,
+                    fecha_fin=datetime.now(timezone.utc)
+                )
+            )
+            await db.commit()
+
+
+# Singleton instance
+job_service = JobService(
+    max_workers=settings.jobs_max_workers,
+    poll_seconds=settings.jobs_poll_seconds,
+    stale_seconds=settings.jobs_stale_seconds,
+    max_intentos=settings.jobs_max_attempts
+)
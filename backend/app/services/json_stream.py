@@ -0,0 +1,173 @@
+"""
+Parser JSON incremental para respuestas de IA transmitidas por partes.
+
+Recibe fragmentos de texto a medida que llegan del modelo y emite cada valor
+en cuanto se completa, siempre que su ruta esté entre las rutas de interés.
+Tolera salida parcial: mientras un valor no se cierra, simplemente no se emite.
+También ignora texto previo al primer '{' (p. ej. cercas ```json).
+
+Ejemplo de rutas:
+    ("saludo",)                     -> valor de data["saludo"]
+    ("examen", "preguntas", "*")    -> cada elemento de data["examen"]["preguntas"]
+"""
+import json
+from typing import Any, Iterable
+
+WILDCARD = "*"
+
+
+class _Frame:
+    """Contenedor (objeto o arreglo) abierto durante el análisis."""
+
+    __slots__ = ("kind", "path", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, path: tuple, start: int):
+        self.kind = kind          # "o" (objeto) o "a" (arreglo)
+        self.path = path
+        self.start = start
+        self.key = None
+        self.index = -1
+        self.expect_key = kind == "o"
+
+
+class IncrementalJSONParser:
+    """Analiza JSON por fragmentos y emite los valores completos de rutas de interés."""
+
+    def __init__(self, paths: Iterable[tuple]):
+        self.paths = [tuple(p) for p in paths]
+        self._text = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._started = False
+        self._finished = False
+        # Estado del escalar en curso (string, número o literal)
+        self._scalar_start = -1
+        self._scalar_path: tuple = ()
+        self._scalar_is_key = False
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self) -> str:
+        """Texto completo recibido hasta el momento."""
+        return self._text
+
+    def feed(self, chunk: str) -> list[tuple[tuple, Any]]:
+        """Agrega un fragmento y devuelve los valores completados: [(ruta, valor), ...]."""
+        self._text += chunk
+        events: list[tuple[tuple, Any]] = []
+        text = self._text
+
+        while self._pos < len(text) and not self._finished:
+            ch = text[self._pos]
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._open("o", self._pos)
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_scalar(self._pos + 1, events)
+                self._pos += 1
+                continue
+
+            if self._scalar_start != -1:
+                # Número o literal (true/false/null) en curso
+                if ch in ",}] \t\r\n":
+                    self._close_scalar(self._pos, events)
+                else:
+                    self._pos += 1
+                    continue
+
+            top = self._stack[-1] if self._stack else None
+
+            if ch in " \t\r\n":
+                pass
+            elif ch == '"':
+                self._in_string = True
+                self._scalar_start = self._pos
+                if top is not None and top.kind == "o" and top.expect_key:
+                    self._scalar_is_key = True
+                else:
+                    self._scalar_is_key = False
+                    self._scalar_path = self._begin_value()
+            elif ch == ":":
+                if top is not None and top.kind == "o":
+                    top.expect_key = False
+            elif ch == ",":
+                if top is not None and top.kind == "o":
+                    top.expect_key = True
+            elif ch in "{[":
+                path = self._begin_value()
+                self._open("o" if ch == "{" else "a", self._pos, path)
+            elif ch in "}]":
+                self._close_container(self._pos + 1, events)
+            else:
+                self._scalar_start = self._pos
+                self._scalar_is_key = False
+                self._scalar_path = self._begin_value()
+
+            self._pos += 1
+
+        return events
+
+    # ──────────────────────────────────────────────
+    # Internos
+    # ──────────────────────────────────────────────
+
+    def _open(self, kind: str, start: int, path: tuple = ()) -> None:
+        self._stack.append(_Frame(kind, path, start))
+
+    def _begin_value(self) -> tuple:
+        """Calcula la ruta del valor que empieza en la posición actual."""
+        if not self._stack:
+            return ()
+        top = self._stack[-1]
+        if top.kind == "a":
+            top.index += 1
+            return top.path + (top.index,)
+        return top.path + (top.key,)
+
+    def _close_scalar(self, end: int, events: list) -> None:
+        raw = self._text[self._scalar_start:end]
+        self._scalar_start = -1
+        if self._scalar_is_key:
+            try:
+                self._stack[-1].key = json.loads(raw)
+            except (json.JSONDecodeError, IndexError):
+                self._stack[-1].key = raw.strip('"')
+            return
+        if self._matches(self._scalar_path):
+            try:
+                events.append((self._scalar_path, json.loads(raw)))
+            except json.JSONDecodeError:
+                pass
+
+    def _close_container(self, end: int, events: list) -> None:
+        if not self._stack:
+            return
+        frame = self._stack.pop()
+        if not self._stack:
+            self._finished = True
+        if frame.path and self._matches(frame.path):
+            try:
+                events.append((frame.path, json.loads(self._text[frame.start:end])))
+            except json.JSONDecodeError:
+                # Valor con comas finales u otros defectos: se omite en el streaming
+                pass
+
+    def _matches(self, path: tuple) -> bool:
+        for pattern in self.paths:
+            if len(pattern) != len(path):
+                continue
+            if all(p == WILDCARD or p == q for p, q in zip(pattern, path)):
+                return True
+        return False
@@ -1,19 +1,408 @@
 """
 Servicio para gestionar desempeños y generar preguntas de comprensión lectora.
 """
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
+import asyncio
 import json
+import logging
 import random
+import time
 
 from app.models.db_models import Grado, Capacidad, Desempeno
+from app.models.examen_ia import (
+    EncabezadoLectura,
+    RespuestaExamenLectura,
+    RespuestaPreguntasNivel,
+    RespuestaReparacionLectura,
+)
 from app.core.config import get_settings
 from app.services.ai_factory import ai_factory
+from app.services.ai_rate_limiter import ProviderOverloadedError
+from app.services.curriculum_service import curriculum_service
+from app.services.answer_key import derivar_tabla
+from app.services.exam_repair import Solicitud, exam_repair
+from app.services.json_stream import IncrementalJSONParser
+from app.services.prompt_budget import construir_con_presupuesto
+from app.services.prompt_templates import FragmentoPrompt, PromptRenderizado, prompt_templates
+from app.services.structured_output import structured_output
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Modos de generación del examen por desempeños:
+#   completo: una sola llamada genera todo el examen
+#   paralelo: lectura primero y luego una llamada por nivel, en paralelo
+MODOS_GENERACION = ("completo", "paralelo")
+
+# Orden de los niveles en el examen ensamblado (modo paralelo)
+NIVELES_LECTURA = ("LITERAL", "INFERENCIAL", "CRITICO")
+
+# Instrucciones por defecto si falla la llamada del encabezado con texto proporcionado
+INSTRUCCIONES_POR_DEFECTO = "Lee atentamente el texto y responde cada pregunta marcando la alternativa correcta."
+
+# Secciones del JSON que se envían al cliente en cuanto se completan (streaming)
+STREAM_PATHS = [
+    ("saludo",),
+    ("examen", "titulo"),
+    ("examen", "instrucciones"),
+    ("examen", "lectura"),
+    ("examen", "preguntas", "*"),
+]
+
+# ──────────────────────────────────────────────
+# Plantillas de prompt (se validan una vez al importar el módulo)
+# ──────────────────────────────────────────────
+
+PREFIJO_NIVEL = """Eres un experto pedagogo peruano, especialista en Comprensión Lectora y Evaluación Formativa según el Currículo Nacional de Educación Básica (CNEB).
+Tu misión es crear un instrumento de evaluación de alta calidad para los estudiantes del grado indicado más abajo.
+
+**ENFOQUE:**
+- Área: Comunicación / Comprensión Lectora
+- Enfoque: Comunicativo y Textual
+- Contexto: Regional Peruano (usa nombres, lugares y situaciones culturalmente relevantes)
+
+**CRITERIOS PARA LAS PREGUNTAS:**
+- Todas las preguntas deben evaluar DIRECTAMENTE el desempeño indicado más abajo.
+- Tipo: Opción Múltiple con 4 alternativas (A, B, C, D).
+- Las alternativas deben ser plausibles. La respuesta correcta debe ser INEQUÍVOCA.
+
+**FORMATO DE SALIDA (JSON ESTRICTO):**
+Responde ÚNICAMENTE con un JSON válido que siga esta estructura exacta, sin comentarios ni texto adicional:
+
+{
+    "saludo": "¡Hola colega maestro! Aquí tienes una propuesta de evaluación contextualizada...",
+    "examen": {
+        "titulo": "Título creativo y motivador para la lectura",
+        "grado": "Nombre del grado indicado",
+        "instrucciones": "Lee atentamente el siguiente texto y marca la alternativa correcta.",
+        "lectura": "Texto completo de la lectura...",
+        "preguntas": [
+            {
+                "numero": 1,
+                "enunciado": "¿Pregunta clara y precisa?",
+                "opciones": [
+                    {"letra": "A", "texto": "Alternativa 1", "es_correcta": false},
+                    {"letra": "B", "texto": "Alternativa 2", "es_correcta": true},
+                    {"letra": "C", "texto": "Alternativa 3", "es_correcta": false},
+                    {"letra": "D", "texto": "Alternativa 4", "es_correcta": false}
+                ],
+                "nivel": "Literal/Inferencial/Crítico",
+                "desempeno_codigo": "Código o ID del desempeño (si aplica)",
+                "justificacion": "Explicación breve de por qué es la respuesta correcta"
+            }
+        ]
+    }
+}
+
+"""
+
+CUERPO_NIVEL = """**CONTEXTO EDUCATIVO:**
+- Grado: $grado_nombre
+
+**ESPECIFICACIONES DEL CONTENIDO:**
+1. **TEXTO BASE:**
+   $instruccion_texto
+
+2. **COMPETENCIA Y DESEMPEÑO A EVALUAR:**
+   - Capacidad: $capacidad
+   - Desempeño Seleccionado: "$desempeno"
+   - Nivel de Logro Esperado: $nivel_logro
+
+3. **DISEÑO DE PREGUNTAS ($cantidad preguntas):**
+   - Nivel de Dificultad: **$nivel_logro_mayusculas**.
+"""
+
+TEXTO_NUEVO_NIVEL = (
+    "GENERA UN TEXTO NUEVO. El texto debe ser original, creativo, motivador y adecuado para la edad "
+    "de estudiantes, con una extensión de 250-400 palabras. Temas sugeridos: Tradiciones peruanas, "
+    "cuidado del medio ambiente, tecnología en la escuela, convivencia escolar."
+)
+
+TEXTO_BASE_NIVEL = FragmentoPrompt("texto_base_nivel", '''Usa el siguiente texto proporcionado:
+TEXTO BASE PARA LAS PREGUNTAS:
+"""
+$texto_base
+"""
+
+Las preguntas deben basarse en este texto.''', ["texto_base"])
+
+PREFIJO_DESEMPENOS = """Eres un experto en la elaboración de preguntas de comprensión lectora que trabaja con estudiantes de Perú. Utiliza el Currículo Nacional de Educación Básica (CNEB).
+
+Primero saluda muy amablemente como un experto en la elaboración de preguntas de comprensión lectora.
+
+El examen debe presentar:
+1. Un 'título' motivador para el examen
+2. Una sección para que los estudiantes ingresen sus 'Apellidos y Nombres' y la 'Fecha'
+3. 'Instrucciones precisas en un párrafo' para responder el examen
+4. La 'lectura completa' o 'un fragmento de la lectura' que utilizarás para que los estudiantes respondan las preguntas. SI SE ESPECIFICÓ UN FORMATO DISCONTINUO O MIXTO, REPRESENTA LOS ELEMENTOS VISUALES (TABLAS, GRÁFICOS) USANDO MARKDOWN O DESCRIBIÉNDOLOS CLARAMENTE.
+5. Las preguntas con esquema de opción múltiple (4 alternativas A, B, C, D siendo una sola la correcta, en orden aleatorio), cada una con el código del desempeño evaluado, su nivel (LITERAL/INFERENCIAL/CRÍTICO) y una breve 'justificación' de la respuesta correcta
+
+IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con esta estructura exacta:
+{
+    "saludo": "texto del saludo amable del experto",
+    "examen": {
+        "titulo": "título motivador del examen",
+        "grado": "nombre del grado indicado",
+        "instrucciones": "instrucciones precisas para responder el examen",
+        "lectura": "texto de lectura completo o fragmento para las preguntas",
+        "preguntas": [
+            {
+                "numero": 1,
+                "enunciado": "texto de la pregunta",
+                "opciones": [
+                    {"letra": "A", "texto": "opción a", "es_correcta": false},
+                    {"letra": "B", "texto": "opción b", "es_correcta": true},
+                    {"letra": "C", "texto": "opción c", "es_correcta": false},
+                    {"letra": "D", "texto": "opción d", "es_correcta": false}
+                ],
+                "desempeno_codigo": "01",
+                "nivel": "LITERAL|INFERENCIAL|CRITICO",
+                "justificacion": "por qué es la respuesta correcta"
+            }
+        ]
+    }
+}
+
+DATOS DEL EXAMEN:
+"""
+
+CUERPO_DESEMPENOS = """El examen debe tener exactamente $cantidad preguntas para estudiantes de $grado_nombre.
+$texto_lectura
+Usarás los siguientes desempeños que están enumerados e indican entre paréntesis si es de nivel LITERAL, INFERENCIAL o CRÍTICO:
+$desempenos_texto
+
+$instruccion_dificultad
+$instruccion_diversidad
+$instruccion_distribucion
+"""
+
+TEXTO_LECTURA = FragmentoPrompt("texto_lectura", '''
+TEXTO DE LECTURA:
+"""
+$texto_base
+"""
+''', ["texto_base"])
+
+TEXTO_LECTURA_GENERAR = "Debes GENERAR un texto original que cumpla con el TIPO y FORMATO especificados arriba."
+
+DIFICULTAD_INSTRUCCIONES = {
+    "basico": """
+**NIVEL DE DIFICULTAD: BÁSICO (Simple y sencillo)**
+- Las preguntas deben ser DIRECTAS y de fácil comprensión
+- Usar vocabulario simple y accesible para el grado
+- Las alternativas incorrectas deben ser claramente distinguibles
+- Enfocarse en la comprensión LITERAL del texto
+- Evitar preguntas que requieran inferencias complejas
+- La lectura debe ser corta y con estructura clara
+- Las preguntas deben extraer información EXPLÍCITA del texto""",
+    "intermedio": """
+**NIVEL DE DIFICULTAD: INTERMEDIO (Demanda cognitiva media)**
+- Las preguntas deben requerir comprensión y algo de análisis
+- Incluir algunas preguntas inferenciales además de las literales
+- Las alternativas incorrectas deben ser plausibles pero distinguibles
+- La lectura puede tener complejidad moderada
+- Algunas preguntas pueden requerir relacionar información del texto
+- Equilibrar preguntas de diferentes niveles de complejidad""",
+    "avanzado": """
+**NIVEL DE DIFICULTAD: AVANZADO (Alta demanda cognitiva)**
+- Las preguntas deben ser COMPLEJAS y desafiantes
+- Priorizar preguntas INFERENCIALES y CRÍTICAS
+- Incluir preguntas de reflexión y evaluación del contenido
+- Las alternativas incorrectas deben ser PLAUSIBLES (distractores bien elaborados)
+- La lectura puede tener mayor complejidad y extensión
+- Requerir que el estudiante analice, sintetice y evalúe información
+- Incluir preguntas que requieran establecer relaciones entre partes del texto
+- Algunas preguntas pueden requerir conocimientos previos para contextualizare"""
+}
+
+TIPOS_TEXTUALES = {
+    "narrativo": "Narrativo: relata una secuencia de hechos (cuento, noticia, biografía, crónica).",
+    "descriptivo": "Descriptivo: caracteriza a personas, animales, objetos o lugares (guía turística, artículo enciclopédico).",
+    "instructivo": "Instructivo: brinda procedimientos o recomendaciones (receta, manual, ley).",
+    "argumentativo": "Argumentativo: defiende una opinión con razones (columna de opinión, ensayo).",
+    "expositivo": "Expositivo: explica fenómenos o conceptos (artículo de divulgación, informe)."
+}
+
+FORMATOS_TEXTUALES = {
+    "continuo": "Continuo: sucesión de oraciones estructuradas en párrafos.",
+    "discontinuo": "Discontinuo: organizado visualmente en columnas, tablas, cuadros, gráficos, etc.",
+    "mixto": "Mixto: presenta secciones continuas y otras discontinuas.",
+    "multiple": "Múltiple: incluye dos o más textos de fuentes diferentes."
+}
+
+DISTRIBUCION = FragmentoPrompt("distribucion", """
+**DISTRIBUCIÓN OBLIGATORIA DE PREGUNTAS (TOTAL $cantidad):**
+Debes generar EXACTAMENTE:
+- $cantidad_literal preguntas de nivel LITERAL.
+- $cantidad_inferencial preguntas de nivel INFERENCIAL.
+- $cantidad_critico preguntas de nivel CRÍTICO.
+
+Selecciona de la lista de desempeños proporcionada aquellos que mejor se ajusten a cada nivel solicitado. Si no hay un desempeño explícito para un nivel, ADAPTA el enfoque de la pregunta para cumplir con el nivel exigido, pero manteniendo la coherencia con el grado.
+""", ["cantidad", "cantidad_literal", "cantidad_inferencial", "cantidad_critico"])
+
+# Reparación: regenera solo las preguntas inválidas o faltantes de un examen ya generado
+PREFIJO_REPARACION = """Eres un experto en la elaboración de preguntas de comprensión lectora que trabaja con estudiantes de Perú. Utiliza el Currículo Nacional de Educación Básica (CNEB).
+
+Un examen ya elaborado tiene preguntas con errores o le faltan preguntas. Genera SOLO las preguntas solicitadas, sobre la misma lectura.
+
+REGLAS:
+- Cada pregunta tiene exactamente 4 alternativas con las letras A, B, C y D.
+- Exactamente UNA alternativa tiene "es_correcta": true.
+- Respeta el número, el nivel y el desempeño indicados para cada pregunta.
+- No repitas las preguntas que ya tiene el examen.
+
+IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con esta estructura exacta:
+{
+    "preguntas": [
+        {
+            "numero": 1,
+            "enunciado": "texto de la pregunta",
+            "opciones": [
+                {"letra": "A", "texto": "opción a", "es_correcta": false},
+                {"letra": "B", "texto": "opción b", "es_correcta": true},
+                {"letra": "C", "texto": "opción c", "es_correcta": false},
+                {"letra": "D", "texto": "opción d", "es_correcta": false}
+            ],
+            "desempeno_codigo": "01",
+            "nivel": "LITERAL|INFERENCIAL|CRITICO",
+            "justificacion": "por qué es la respuesta correcta"
+        }
+    ]
+}
+
+DATOS DEL EXAMEN:
+"""
+
+CUERPO_REPARACION = '''Grado: $grado_nombre
+
+Desempeños del examen:
+$desempenos_texto
+
+LECTURA:
+"""
+$lectura
+"""
+
+Preguntas que ya tiene el examen (no las repitas):
+$preguntas_existentes
+
+Genera exactamente $cantidad preguntas:
+$solicitudes
+'''
+
+# Generación por secciones (modo "paralelo"): primero saludo, título, instrucciones
+# y lectura; luego una llamada por nivel con solo las preguntas de ese nivel
+PREFIJO_ENCABEZADO = """Eres un experto en la elaboración de preguntas de comprensión lectora que trabaja con estudiantes de Perú. Utiliza el Currículo Nacional de Educación Básica (CNEB).
+
+Estás preparando un examen de comprensión lectora. En esta etapa NO generes preguntas; solo:
+1. Un 'saludo' muy amable como experto en la elaboración de preguntas de comprensión lectora
+2. Un 'título' motivador para el examen
+3. 'Instrucciones precisas en un párrafo' para responder el examen
+4. La 'lectura' del examen, SOLO si se indica que debes generarla; si el texto de lectura ya se proporciona, deja "lectura" vacío. SI SE ESPECIFICÓ UN FORMATO DISCONTINUO O MIXTO, REPRESENTA LOS ELEMENTOS VISUALES (TABLAS, GRÁFICOS) USANDO MARKDOWN O DESCRIBIÉNDOLOS CLARAMENTE.
+
+IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con esta estructura exacta:
+{
+    "saludo": "texto del saludo amable del experto",
+    "titulo": "título motivador del examen",
+    "instrucciones": "instrucciones precisas para responder el examen",
+    "lectura": "texto de lectura completo, o vacío si ya se proporcionó"
+}
+
+DATOS DEL EXAMEN:
+"""
+
+CUERPO_ENCABEZADO = """El examen tendrá $cantidad preguntas para estudiantes de $grado_nombre.
+$texto_lectura
+Desempeños que evaluará el examen (entre paréntesis su nivel LITERAL, INFERENCIAL o CRÍTICO):
+$desempenos_texto
+
+$instruccion_dificultad
+$instruccion_diversidad
+"""
+
+TEXTO_LECTURA_PROPORCIONADA = 'El texto de lectura ya está proporcionado: deja "lectura" vacío.'
+
+TEXTO_LECTURA_GENERAR_LIBRE = "Debes GENERAR un texto de lectura original, adecuado para el grado y el nivel de dificultad."
+
+PREFIJO_PREGUNTAS_NIVEL = """Eres un experto en la elaboración de preguntas de comprensión lectora que trabaja con estudiantes de Perú. Utiliza el Currículo Nacional de Educación Básica (CNEB).
+
+Elabora preguntas de un examen de comprensión lectora sobre la lectura indicada, TODAS del nivel solicitado (LITERAL, INFERENCIAL o CRÍTICO).
+
+REGLAS:
+- Cada pregunta tiene exactamente 4 alternativas con las letras A, B, C y D, en orden aleatorio, y una sola correcta ("es_correcta": true).
+- Usa los desempeños que corresponden al nivel solicitado. Si no hay un desempeño explícito para ese nivel, ADAPTA el enfoque de la pregunta al nivel, manteniendo la coherencia con el grado.
+- En "justificacion" explica brevemente por qué la alternativa es correcta.
+
+IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con esta estructura exacta:
+{
+    "preguntas": [
+        {
+            "numero": 1,
+            "enunciado": "texto de la pregunta",
+            "opciones": [
+                {"letra": "A", "texto": "opción a", "es_correcta": false},
+                {"letra": "B", "texto": "opción b", "es_correcta": true},
+                {"letra": "C", "texto": "opción c", "es_correcta": false},
+                {"letra": "D", "texto": "opción d", "es_correcta": false}
+            ],
+            "desempeno_codigo": "01",
+            "nivel": "LITERAL|INFERENCIAL|CRITICO",
+            "justificacion": "por qué es la respuesta correcta"
+        }
+    ]
+}
+
+DATOS DEL EXAMEN:
+"""
+
+# La lectura va antes del nivel: las llamadas de cada nivel comparten un prefijo más largo
+CUERPO_PREGUNTAS_NIVEL = '''Grado: $grado_nombre
+
+Desempeños, enumerados e indicando entre paréntesis si son de nivel LITERAL, INFERENCIAL o CRÍTICO:
+$desempenos_texto
+$instruccion_dificultad
+
+LECTURA:
+"""
+$lectura
+"""
+
+Genera exactamente $cantidad preguntas de nivel $nivel.
+'''
+
+PLANTILLA_NIVEL = prompt_templates.registrar(
+    "lectura_por_nivel", PREFIJO_NIVEL, CUERPO_NIVEL,
+    ["grado_nombre", "instruccion_texto", "capacidad", "desempeno", "nivel_logro",
+     "cantidad", "nivel_logro_mayusculas"],
+    esquema=RespuestaExamenLectura
+)
+PLANTILLA_DESEMPENOS = prompt_templates.registrar(
+    "lectura_por_desempenos", PREFIJO_DESEMPENOS, CUERPO_DESEMPENOS,
+    ["cantidad", "grado_nombre", "texto_lectura", "desempenos_texto",
+     "instruccion_dificultad", "instruccion_diversidad", "instruccion_distribucion"],
+    esquema=RespuestaExamenLectura
+)
+PLANTILLA_REPARACION = prompt_templates.registrar(
+    "lectura_reparacion", PREFIJO_REPARACION, CUERPO_REPARACION,
+    ["grado_nombre", "desempenos_texto", "lectura", "preguntas_existentes", "cantidad", "solicitudes"],
+    esquema=RespuestaReparacionLectura
+)
+PLANTILLA_ENCABEZADO = prompt_templates.registrar(
+    "lectura_encabezado", PREFIJO_ENCABEZADO, CUERPO_ENCABEZADO,
+    ["cantidad", "grado_nombre", "texto_lectura", "desempenos_texto",
+     "instruccion_dificultad", "instruccion_diversidad"],
+    esquema=EncabezadoLectura
+)
+PLANTILLA_PREGUNTAS_NIVEL = prompt_templates.registrar(
+    "lectura_preguntas_nivel", PREFIJO_PREGUNTAS_NIVEL, CUERPO_PREGUNTAS_NIVEL,
+    ["grado_nombre", "desempenos_texto", "instruccion_dificultad", "lectura", "cantidad", "nivel"],
+    esquema=RespuestaPreguntasNivel
+)
+
 
 class LectoSistemService:
     """Servicio para consultar desempeños y generar preguntas."""
@@ -79,82 +468,17 @@ class LectoSistemService:
         nivel_logro: str,
         cantidad: int,
         texto_base: Optional[str] = None
-    ) -> str:
+    ) -> PromptRenderizado:
         """Construye el prompt para generar preguntas."""
-        
-        texto_instruccion = ""
-        if texto_base:
-            texto_instruccion = f"""
-TEXTO BASE PARA LAS PREGUNTAS:
-\"\"\"
-{texto_base}
-\"\"\"
-
-Las preguntas deben basarse en este texto.
-"""
-        
-        prompt = f"""Eres un experto pedagogo peruano, especialista en Comprensión Lectora y Evaluación Formativa según el Currículo Nacional de Educación Básica (CNEB).
-Tu misión es crear un instrumento de evaluación de alta calidad para estudiantes de **{grado_nombre}**.
-
-**CONTEXTO EDUCATIVO:**
-- Grado: {grado_nombre}
-- Área: Comunicación / Comprensión Lectora
-- Enfoque: Comunicativo y Textual
-- Contexto: Regional Peruano (usa nombres, lugares y situaciones culturalmente relevantes)
-
-**ESPECIFICACIONES DEL CONTENIDO:**
-1. **TEXTO BASE:**
-   {f'Usa el siguiente texto proporcionado:' if texto_base else 'GENERA UN TEXTO NUEVO.'}
-   {texto_instruccion if texto_base else 'El texto debe ser original, creativo, motivador y adecuado para la edad de estudiantes, con una extensión de 250-400 palabras. Temas sugeridos: Tradiciones peruanas, cuidado del medio ambiente, tecnología en la escuela, convivencia escolar.'}
-
-2. **COMPETENCIA Y DESEMPEÑO A EVALUAR:**
-   - Capacidad: {capacidad}
-   - Desempeño Seleccionado: "{desempeno}"
-   - Nivel de Logro Esperado: {nivel_logro}
-
-3. **DISEÑO DE PREGUNTAS ({cantidad} preguntas):**
-   - Todas las preguntas deben evaluar DIRECTAMENTE el desempeño indicado anteriormente.
-   - Nivel de Dificultad: **{nivel_logro.upper()}**.
-   - Tipo: Opción Múltiple con 4 alternativas (A, B, C, D).
-   - Las alternativas deben ser plausibles. La respuesta correcta debe ser INEQUÍVOCA.
-   
-**FORMATO DE SALIDA (JSON ESTRICTO):**
-Responde ÚNICAMENTE con un JSON válido que siga esta estructura exacta, sin comentarios ni texto adicional:
-
-{{
-    "saludo": "¡Hola colega maestro! Aquí tienes una propuesta de evaluación contextualizada...",
-    "examen": {{
-        "titulo": "Título creativo y motivador para la lectura",
-        "grado": "{grado_nombre}",
-        "instrucciones": "Lee atentamente el siguiente texto y marca la alternativa correcta.",
-        "lectura": "Texto completo de la lectura...",
-        "preguntas": [
-            {{
-                "numero": 1,
-                "enunciado": "¿Pregunta clara y precisa?",
-                "opciones": [
-                    {{"letra": "A", "texto": "Alternativa 1", "es_correcta": false}},
-                    {{"letra": "B", "texto": "Alternativa 2", "es_correcta": true}},
-                    {{"letra": "C", "texto": "Alternativa 3", "es_correcta": false}},
-                    {{"letra": "D", "texto": "Alternativa 4", "es_correcta": false}}
-                ],
-                "nivel": "Literal/Inferencial/Crítico",
-                "desempeno_codigo": "Código o ID del desempeño (si aplica)"
-            }}
-        ],
-        "tabla_respuestas": [
-            {{
-                "pregunta": 1,
-                "desempeno": "Descripción del desempeño evaluado",
-                "nivel": "Nivel cognitivo",
-                "respuesta_correcta": "B",
-                "justificacion": "Explicación breve de por qué es la respuesta correcta"
-            }}
-        ]
-    }}
-}}
-"""
-        return prompt
+        return PLANTILLA_NIVEL.renderizar(
+            grado_nombre=grado_nombre,
+            instruccion_texto=TEXTO_BASE_NIVEL.renderizar(texto_base=texto_base) if texto_base else TEXTO_NUEVO_NIVEL,
+            capacidad=capacidad,
+            desempeno=desempeno,
+            nivel_logro=nivel_logro,
+            cantidad=cantidad,
+            nivel_logro_mayusculas=nivel_logro.upper()
+        )
 
     async def generar_preguntas_por_nivel(
         self,
@@ -163,7 +487,8 @@ Responde ÚNICAMENTE con un JSON válido que siga esta estructura exacta, sin co
         nivel_logro: str,
         cantidad: int = 3,
         texto_base: Optional[str] = None,
-        modelo: str = "gemini"
+        modelo: str = "gemini",
+        cache: str = "prefer"
     ) -> dict:
         """
         Genera preguntas según el nivel de logro del estudiante.
@@ -231,262 +556,646 @@ Responde ÚNICAMENTE con un JSON válido que siga esta estructura exacta, sin co
                  capacidad_nombre = cap.nombre
 
         # Construir y enviar prompt
-        prompt = self._build_prompt(
-            desempeno=desempeno.descripcion,
-            grado_nombre=grado.nombre,
-            capacidad=capacidad_nombre,
-            nivel_logro=nivel_logro,
-            cantidad=cantidad,
-            texto_base=texto_base
+        prompt, tokens = construir_con_presupuesto(
+            lambda texto: self._build_prompt(
+                desempeno=desempeno.descripcion,
+                grado_nombre=grado.nombre,
+                capacidad=capacidad_nombre,
+                nivel_logro=nivel_logro,
+                cantidad=cantidad,
+                texto_base=texto
+            ),
+            texto_base,
+            modelo
         )
         
         try:
-            response_text = await ai_service.generate_content(prompt)
-            response_text = ai_service.clean_json_response(response_text)
+            response_text = await ai_service.generate(prompt.texto, cache=cache)
             
             try:
-                data = json.loads(response_text)
-            except json.JSONDecodeError as je:
-                print(f"FAILED LECTOSISTEM (NIVEL) JSON: {response_text}")
-                raise ValueError(f"Error al parsear respuesta JSON: {je}")
+                data = structured_output.parsear(
+                    response_text, RespuestaExamenLectura, ai_service.clean_json_response
+                )
+            except ValueError as ve:
+                raise ValueError(f"Error al parsear respuesta JSON: {ve}")
             
+            preguntas = data["examen"]["preguntas"]
             return {
                 "grado": grado.nombre,
                 "nivel_logro": nivel_logro,
                 "desempeno_base": desempeno.descripcion,
                 "capacidad": capacidad_nombre,
-                "preguntas": data.get("preguntas", []),
-                "total": len(data.get("preguntas", []))
+                "preguntas": preguntas,
+                "total": len(preguntas),
+                "tokens": tokens
             }
             
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Error al parsear respuesta de {modelo}: {e}")
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             raise ValueError(f"Error al generar preguntas: {e}")
     
-    async def generar_preguntas_por_desempenos(
+    def _instruccion_diversidad(
         self,
-        db: AsyncSession,
-        grado_id: int,
-        desempeno_ids: list[int],
-        cantidad: int = 3,
+        tipo_textual: Optional[str],
+        formato_textual: Optional[str],
+        texto_base: Optional[str]
+    ) -> str:
+        """Instrucciones de diversidad textual (tipo y formato del texto)."""
+        if not (tipo_textual or formato_textual):
+            return ""
+        lineas = ["\n**ESPECIFICACIONES DE DIVERSIDAD TEXTUAL (Muy Importante):**"]
+        if tipo_textual:
+            desc = TIPOS_TEXTUALES.get(tipo_textual.lower(), tipo_textual)
+            lineas.append(f"- TIPO TEXTUAL REQUERIDO: {tipo_textual.upper()}. ({desc})")
+        if formato_textual:
+            desc = FORMATOS_TEXTUALES.get(formato_textual.lower(), formato_textual)
+            lineas.append(f"- FORMATO TEXTUAL REQUERIDO: {formato_textual.upper()}. ({desc})")
+        if not texto_base:
+            lineas.append("Genera el texto de la lectura cumpliendo ESTRICTAMENTE estas características.")
+        else:
+            lineas.append("Asegúrate de que las preguntas y el análisis respeten estas características del texto base.")
+        return "\n".join(lineas)
+
+    def _build_prompt_desempenos(
+        self,
+        grado_nombre: str,
+        desempenos_texto: str,
+        cantidad: int,
         texto_base: Optional[str] = None,
-        modelo: str = "gemini",
         nivel_dificultad: str = "intermedio",
         tipo_textual: Optional[str] = None,
         formato_textual: Optional[str] = None,
         cantidad_literal: Optional[int] = None,
         cantidad_inferencial: Optional[int] = None,
         cantidad_critico: Optional[int] = None
-    ) -> dict:
+    ) -> PromptRenderizado:
+        """Construye el prompt del examen basado en desempeños seleccionados."""
+        instruccion_dificultad = DIFICULTAD_INSTRUCCIONES.get(
+            nivel_dificultad.lower(), 
+            DIFICULTAD_INSTRUCCIONES["intermedio"]
+        )
+
+        instruccion_diversidad = self._instruccion_diversidad(tipo_textual, formato_textual, texto_base)
+        
+        # Instrucciones de distribución de preguntas
+        instruccion_distribucion = ""
+        if cantidad_literal is not None and cantidad_inferencial is not None and cantidad_critico is not None:
+            instruccion_distribucion = DISTRIBUCION.renderizar(
+                cantidad=cantidad,
+                cantidad_literal=cantidad_literal,
+                cantidad_inferencial=cantidad_inferencial,
+                cantidad_critico=cantidad_critico
+            )
+        
+        # Texto de lectura
+        texto_lectura = ""
+        if texto_base:
+            texto_lectura = TEXTO_LECTURA.renderizar(texto_base=texto_base)
+        elif tipo_textual or formato_textual:
+            texto_lectura = TEXTO_LECTURA_GENERAR
+
+        return PLANTILLA_DESEMPENOS.renderizar(
+            cantidad=cantidad,
+            grado_nombre=grado_nombre,
+            texto_lectura=texto_lectura,
+            desempenos_texto=desempenos_texto,
+            instruccion_dificultad=instruccion_dificultad,
+            instruccion_diversidad=instruccion_diversidad,
+            instruccion_distribucion=instruccion_distribucion
+        )
+
+    def _distribuir_niveles(
+        self,
+        cantidad: int,
+        desempenos: list[dict],
+        cantidad_literal: Optional[int] = None,
+        cantidad_inferencial: Optional[int] = None,
+        cantidad_critico: Optional[int] = None
+    ) -> list[dict]:
         """
-        Genera un examen completo basado en desempeños específicos seleccionados.
+        Cantidad de preguntas por nivel para la generación en paralelo.
+
+        Usa la distribución indicada si está completa; si no, reparte la cantidad
+        entre los niveles de los desempeños seleccionados (o entre los tres).
         """
+        if cantidad_literal is not None and cantidad_inferencial is not None and cantidad_critico is not None:
+            cantidades = dict(zip(NIVELES_LECTURA, (cantidad_literal, cantidad_inferencial, cantidad_critico)))
+        else:
+            tipos = {(d.get("capacidad_tipo") or "").upper() for d in desempenos}
+            presentes = [nivel for nivel in NIVELES_LECTURA if nivel in tipos] or list(NIVELES_LECTURA)
+            base, resto = divmod(cantidad, len(presentes))
+            cantidades = {nivel: base + (1 if i < resto else 0) for i, nivel in enumerate(presentes)}
+        return [
+            {"nivel": nivel, "cantidad": cantidades[nivel]}
+            for nivel in NIVELES_LECTURA if cantidades.get(nivel)
+        ]
+
+    def _build_prompt_encabezado(
+        self,
+        grado_nombre: str,
+        desempenos_texto: str,
+        cantidad: int,
+        texto_base: Optional[str] = None,
+        nivel_dificultad: str = "intermedio",
+        tipo_textual: Optional[str] = None,
+        formato_textual: Optional[str] = None
+    ) -> PromptRenderizado:
+        """Construye el prompt de la primera etapa: saludo, título, instrucciones y lectura."""
+        if texto_base:
+            texto_lectura = TEXTO_LECTURA.renderizar(texto_base=texto_base) + TEXTO_LECTURA_PROPORCIONADA
+        elif tipo_textual or formato_textual:
+            texto_lectura = TEXTO_LECTURA_GENERAR
+        else:
+            texto_lectura = TEXTO_LECTURA_GENERAR_LIBRE
+
+        return PLANTILLA_ENCABEZADO.renderizar(
+            cantidad=cantidad,
+            grado_nombre=grado_nombre,
+            texto_lectura=texto_lectura,
+            desempenos_texto=desempenos_texto,
+            instruccion_dificultad=DIFICULTAD_INSTRUCCIONES.get(
+                nivel_dificultad.lower(), DIFICULTAD_INSTRUCCIONES["intermedio"]
+            ),
+            instruccion_diversidad=self._instruccion_diversidad(tipo_textual, formato_textual, texto_base)
+        )
+
+    def _build_prompt_preguntas_nivel(
+        self,
+        preparacion: dict,
+        lectura: str,
+        nivel: str,
+        cantidad: int
+    ) -> PromptRenderizado:
+        """Construye el prompt con las preguntas de un solo nivel sobre la lectura ya fijada."""
+        return PLANTILLA_PREGUNTAS_NIVEL.renderizar(
+            grado_nombre=preparacion["grado"],
+            desempenos_texto=preparacion["desempenos_usados"],
+            instruccion_dificultad=DIFICULTAD_INSTRUCCIONES.get(
+                preparacion["nivel_dificultad"], DIFICULTAD_INSTRUCCIONES["intermedio"]
+            ),
+            lectura=lectura,
+            cantidad=cantidad,
+            nivel=nivel
+        )
+
+    def get_ai_service(self, modelo: str):
+        """Obtiene el servicio de IA y verifica que esté configurado."""
         ai_service = ai_factory.get_service(modelo)
         
         if not ai_service.is_configured():
             raise ValueError(f"Configuración de API para {modelo} incompleta")
         
+        return ai_service
+
+    async def preparar_examen_lectura(
+        self,
+        db: AsyncSession,
+        grado_id: int,
+        desempeno_ids: list[int],
+        cantidad: int = 3,
+        texto_base: Optional[str] = None,
+        nivel_dificultad: str = "intermedio",
+        tipo_textual: Optional[str] = None,
+        formato_textual: Optional[str] = None,
+        cantidad_literal: Optional[int] = None,
+        cantidad_inferencial: Optional[int] = None,
+        cantidad_critico: Optional[int] = None,
+        modelo: str = "gemini",
+        modo_generacion: str = "completo"
+    ) -> dict:
+        """
+        Obtiene los datos curriculares (instantánea en memoria) y construye el prompt.
+        No llama al modelo de IA, de modo que la sesión puede cerrarse antes.
+        El texto base se recorta si excede el presupuesto de tokens del modelo.
+
+        Args:
+            modo_generacion: 'completo' (una llamada) o 'paralelo' (lectura y luego
+                             una llamada por nivel, ver _generar_secciones)
+
+        Returns:
+            dict con 'grado', 'desempenos_usados', 'desempenos' (código -> descripción),
+            'cantidad', 'prompt' y 'tokens'.
+            En modo paralelo, 'prompt' es el del encabezado y además incluye 'modo',
+            'lectura' (None si la genera la IA), 'niveles' y 'nivel_dificultad'
+        """
         if not desempeno_ids:
             raise ValueError("Debe seleccionar al menos un desempeño")
+        if modo_generacion not in MODOS_GENERACION:
+            raise ValueError(f"Modo de generación '{modo_generacion}' no válido. Use: {', '.join(MODOS_GENERACION)}")
         
-        result_grado = await db.execute(select(Grado).where(Grado.id == grado_id))
-        grado = result_grado.scalars().first()
-        
+        # Datos curriculares desde la instantánea en memoria (sin consultas a la BD)
+        curriculo = await curriculum_service.obtener(db)
+
+        grado = curriculo.get_grado(grado_id)
         if not grado:
             raise ValueError(f"Grado con id {grado_id} no encontrado")
         
-        # Obtener desempeños seleccionados
-        # Necesitamos cargar la capacidad también para el prompt
-        from sqlalchemy.orm import selectinload
-        result_desempenos = await db.execute(
-            select(Desempeno)
-            .where(Desempeno.id.in_(desempeno_ids))
-            .options(selectinload(Desempeno.capacidad))
-        )
-        desempenos = result_desempenos.scalars().all()
-        
+        desempenos = curriculo.get_desempenos_lectura_por_ids(desempeno_ids)
         if not desempenos:
             raise ValueError("No se encontraron los desempeños seleccionados")
         
         # Construir lista de desempeños con nivel para el prompt
         desempenos_texto = "\n".join([
-            f"{d.codigo}. {d.descripcion} ({d.capacidad.tipo.upper() if d.capacidad else 'GENERAL'})"
+            f"{d['codigo']}. {d['descripcion']} ({d['capacidad_tipo'].upper() if d['capacidad_tipo'] else 'GENERAL'})"
             for d in desempenos
         ])
         
-        # Configurar instrucciones según nivel de dificultad
-        dificultad_instrucciones = {
-            "basico": """
-**NIVEL DE DIFICULTAD: BÁSICO (Simple y sencillo)**
-- Las preguntas deben ser DIRECTAS y de fácil comprensión
-- Usar vocabulario simple y accesible para el grado
-- Las alternativas incorrectas deben ser claramente distinguibles
-- Enfocarse en la comprensión LITERAL del texto
-- Evitar preguntas que requieran inferencias complejas
-- La lectura debe ser corta y con estructura clara
-- Las preguntas deben extraer información EXPLÍCITA del texto""",
-            "intermedio": """
-**NIVEL DE DIFICULTAD: INTERMEDIO (Demanda cognitiva media)**
-- Las preguntas deben requerir comprensión y algo de análisis
-- Incluir algunas preguntas inferenciales además de las literales
-- Las alternativas incorrectas deben ser plausibles pero distinguibles
-- La lectura puede tener complejidad moderada
-- Algunas preguntas pueden requerir relacionar información del texto
-- Equilibrar preguntas de diferentes niveles de complejidad""",
-            "avanzado": """
-**NIVEL DE DIFICULTAD: AVANZADO (Alta demanda cognitiva)**
-- Las preguntas deben ser COMPLEJAS y desafiantes
-- Priorizar preguntas INFERENCIALES y CRÍTICAS
-- Incluir preguntas de reflexión y evaluación del contenido
-- Las alternativas incorrectas deben ser PLAUSIBLES (distractores bien elaborados)
-- La lectura puede tener mayor complejidad y extensión
-- Requerir que el estudiante analice, sintetice y evalúe información
-- Incluir preguntas que requieran establecer relaciones entre partes del texto
-- Algunas preguntas pueden requerir conocimientos previos para contextualizare"""
+        if modo_generacion == "paralelo":
+            return self._preparar_paralelo(
+                grado["nombre"], desempenos, desempenos_texto, cantidad, texto_base, nivel_dificultad,
+                tipo_textual, formato_textual, cantidad_literal, cantidad_inferencial, cantidad_critico, modelo
+            )
+
+        prompt, tokens = construir_con_presupuesto(
+            lambda texto: self._build_prompt_desempenos(
+                grado_nombre=grado["nombre"],
+                desempenos_texto=desempenos_texto,
+                cantidad=cantidad,
+                texto_base=texto,
+                nivel_dificultad=nivel_dificultad,
+                tipo_textual=tipo_textual,
+                formato_textual=formato_textual,
+                cantidad_literal=cantidad_literal,
+                cantidad_inferencial=cantidad_inferencial,
+                cantidad_critico=cantidad_critico
+            ),
+            texto_base,
+            modelo
+        )
+        
+        return {
+            "grado": grado["nombre"],
+            "desempenos_usados": desempenos_texto,
+            "desempenos": {d["codigo"]: d["descripcion"] for d in desempenos},
+            "cantidad": cantidad,
+            "prompt": prompt.texto,
+            "tokens": tokens
         }
+
+    def _preparar_paralelo(
+        self,
+        grado_nombre: str,
+        desempenos: list[dict],
+        desempenos_texto: str,
+        cantidad: int,
+        texto_base: Optional[str],
+        nivel_dificultad: str,
+        tipo_textual: Optional[str],
+        formato_textual: Optional[str],
+        cantidad_literal: Optional[int],
+        cantidad_inferencial: Optional[int],
+        cantidad_critico: Optional[int],
+        modelo: str
+    ) -> dict:
+        """Preparación del modo paralelo: prompt del encabezado y cantidad de preguntas por nivel."""
+        niveles = self._distribuir_niveles(
+            cantidad, desempenos, cantidad_literal, cantidad_inferencial, cantidad_critico
+        )
+        total = sum(n["cantidad"] for n in niveles)
+        if not total:
+            raise ValueError("La distribución de preguntas por nivel no puede sumar 0")
+
+        # El presupuesto se aplica al texto base una sola vez: las llamadas por nivel usan el mismo texto
+        texto_usado = {}
+
+        def construir(texto: Optional[str]) -> PromptRenderizado:
+            texto_usado["texto"] = texto
+            return self._build_prompt_encabezado(
+                grado_nombre=grado_nombre,
+                desempenos_texto=desempenos_texto,
+                cantidad=total,
+                texto_base=texto,
+                nivel_dificultad=nivel_dificultad,
+                tipo_textual=tipo_textual,
+                formato_textual=formato_textual
+            )
+
+        prompt, tokens = construir_con_presupuesto(construir, texto_base, modelo)
+
+        return {
+            "grado": grado_nombre,
+            "desempenos_usados": desempenos_texto,
+            "desempenos": {d["codigo"]: d["descripcion"] for d in desempenos},
+            "cantidad": total,
+            "prompt": prompt.texto,
+            "tokens": tokens,
+            "modo": "paralelo",
+            "lectura": texto_usado.get("texto") or None,
+            "niveles": niveles,
+            "nivel_dificultad": nivel_dificultad.lower(),
+        }
+
+    def _construir_resultado(self, ai_service, preparacion: dict, response_text: str) -> dict:
+        """Valida la respuesta del modelo contra el esquema y arma el resultado del examen."""
+        try:
+            data = structured_output.parsear(
+                response_text, RespuestaExamenLectura, ai_service.clean_json_response
+            )
+        except ValueError as ve:
+            raise ValueError(f"Error al parsear respuesta JSON de la IA: {ve}")
         
-        instruccion_dificultad = dificultad_instrucciones.get(
-            nivel_dificultad.lower(), 
-            dificultad_instrucciones["intermedio"]
+        return {
+            "grado": preparacion["grado"],
+            "desempenos_usados": preparacion["desempenos_usados"],
+            "saludo": data["saludo"],
+            "examen": data["examen"],
+            "total_preguntas": len(data["examen"]["preguntas"]),
+            "tokens": preparacion.get("tokens")
+        }
+
+    def _build_prompt_reparacion(
+        self,
+        preparacion: dict,
+        examen: dict,
+        solicitudes: list[Solicitud]
+    ) -> PromptRenderizado:
+        """Construye el prompt breve que regenera solo las preguntas solicitadas."""
+        pendientes = {s.numero for s in solicitudes}
+        existentes = "\n".join(
+            f"{p['numero']}. {p.get('enunciado', '')}"
+            for p in examen["preguntas"] if p["numero"] not in pendientes
+        )
+        lineas = []
+        for solicitud in solicitudes:
+            original = solicitud.original
+            if original is None:
+                lineas.append(f"- Pregunta {solicitud.numero}: pregunta nueva, con cualquiera de los desempeños.")
+            else:
+                lineas.append(
+                    f"- Pregunta {solicitud.numero} (nivel {original.get('nivel') or 'el más adecuado'}, "
+                    f"desempeño {original.get('desempeno_codigo') or 'el más adecuado'}): reemplaza a "
+                    f"\"{original.get('enunciado', '')}\", que {solicitud.motivo}."
+                )
+        return PLANTILLA_REPARACION.renderizar(
+            grado_nombre=preparacion["grado"],
+            desempenos_texto=preparacion["desempenos_usados"],
+            lectura=examen.get("lectura", ""),
+            preguntas_existentes=existentes or "(ninguna)",
+            cantidad=len(solicitudes),
+            solicitudes="\n".join(lineas)
         )
 
-        # Instrucciones de Diversidad Textual
-        instruccion_diversidad = ""
-        if tipo_textual or formato_textual:
-            instruccion_diversidad = "\n**ESPECIFICACIONES DE DIVERSIDAD TEXTUAL (Muy Importante):**\n"
-            
-            if tipo_textual:
-                tipos_info = {
-                    "narrativo": "Narrativo: relata una secuencia de hechos (cuento, noticia, biografía, crónica).",
-                    "descriptivo": "Descriptivo: caracteriza a personas, animales, objetos o lugares (guía turística, artículo enciclopédico).",
-                    "instructivo": "Instructivo: brinda procedimientos o recomendaciones (receta, manual, ley).",
-                    "argumentativo": "Argumentativo: defiende una opinión con razones (columna de opinión, ensayo).",
-                    "expositivo": "Expositivo: explica fenómenos o conceptos (artículo de divulgación, informe)."
-                }
-                desc = tipos_info.get(tipo_textual.lower(), tipo_textual)
-                instruccion_diversidad += f"- TIPO TEXTUAL REQUERIDO: {tipo_textual.upper()}. ({desc})\n"
-                
-            if formato_textual:
-                formatos_info = {
-                    "continuo": "Continuo: sucesión de oraciones estructuradas en párrafos.",
-                    "discontinuo": "Discontinuo: organizado visualmente en columnas, tablas, cuadros, gráficos, etc.",
-                    "mixto": "Mixto: presenta secciones continuas y otras discontinuas.",
-                    "multiple": "Múltiple: incluye dos o más textos de fuentes diferentes."
-                }
-                desc = formatos_info.get(formato_textual.lower(), formato_textual)
-                instruccion_diversidad += f"- FORMATO TEXTUAL REQUERIDO: {formato_textual.upper()}. ({desc})\n"
-                
-            if not texto_base:
-                instruccion_diversidad += "Genera el texto de la lectura cumpliendo ESTRICTAMENTE estas características."
+    async def _finalizar_examen(self, ai_service, preparacion: dict, resultado: dict, cache: str) -> dict:
+        """
+        Repara las preguntas inválidas (ver exam_repair) y deriva la tabla de
+        respuestas en el servidor (ver answer_key).
+        """
+        examen = resultado["examen"]
+        desempenos = preparacion.get("desempenos", {})
+
+        if exam_repair.enabled:
+            resultado["validacion"] = await exam_repair.reparar(
+                ai_service,
+                examen,
+                preparacion.get("cantidad") or len(examen["preguntas"]),
+                construir=lambda examen, solicitudes: self._build_prompt_reparacion(preparacion, examen, solicitudes),
+                esquema=RespuestaReparacionLectura,
+                cache=cache
+            )
+
+        def fila_tabla(pregunta: dict) -> dict:
+            codigo = pregunta.get("desempeno_codigo", "")
+            return {
+                "desempeno": f"({codigo}) {desempenos[codigo]}" if codigo in desempenos else codigo,
+                "nivel": pregunta.get("nivel", ""),
+            }
+
+        derivar_tabla(examen, fila_tabla)
+        resultado["total_preguntas"] = len(examen["preguntas"])
+        return resultado
+
+    def _ensamblar_secciones(
+        self,
+        preparacion: dict,
+        encabezado: dict,
+        lectura: str,
+        por_nivel: dict[int, list[dict]]
+    ) -> dict:
+        """Une las preguntas de cada nivel en orden (la tabla de respuestas se deriva al finalizar)."""
+        preguntas = []
+        for indice, nivel in enumerate(preparacion["niveles"]):
+            for pregunta in por_nivel.get(indice, []):
+                pregunta["numero"] = len(preguntas) + 1
+                pregunta["nivel"] = nivel["nivel"]
+                preguntas.append(pregunta)
+
+        return {
+            "grado": preparacion["grado"],
+            "desempenos_usados": preparacion["desempenos_usados"],
+            "saludo": encabezado.get("saludo", ""),
+            "examen": {
+                "titulo": encabezado.get("titulo", ""),
+                "grado": preparacion["grado"],
+                "instrucciones": encabezado.get("instrucciones") or INSTRUCCIONES_POR_DEFECTO,
+                "lectura": lectura,
+                "preguntas": preguntas,
+            },
+            "total_preguntas": len(preguntas),
+            "tokens": preparacion.get("tokens")
+        }
+
+    async def _generar_secciones(
+        self,
+        ai_service,
+        preparacion: dict,
+        cache: str
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Generación por secciones (modo paralelo).
+
+        Si la IA debe crear la lectura, primero se genera el encabezado (con la
+        lectura) y luego se lanzan en paralelo las llamadas de cada nivel; si la
+        lectura ya se proporcionó, el encabezado va en paralelo con los niveles.
+        Cada llamada genera pocas preguntas, así que el tiempo total es el de la
+        lectura más el del nivel más lento, no la suma.
+
+        Produce (evento, datos) a medida que termina cada sección y, al final,
+        ('completado', resultado).
+        """
+        inicio = time.perf_counter()
+        niveles = preparacion["niveles"]
+        lectura = preparacion["lectura"]
+        encabezado = {}
+        tiempos = {}
+
+        async def generar(prompt: str, esquema) -> dict:
+            texto = await ai_service.generate(prompt, cache=cache)
+            return structured_output.parsear(texto, esquema, ai_service.clean_json_response)
+
+        tarea_encabezado = asyncio.create_task(generar(preparacion["prompt"], EncabezadoLectura))
+        pendientes: dict[asyncio.Task, Optional[int]] = {}
+        try:
+            if lectura:
+                pendientes[tarea_encabezado] = None
+                yield "lectura", lectura
             else:
-                instruccion_diversidad += "Asegúrate de que las preguntas y el análisis respeten estas características del texto base."
-        
-        # Instrucciones de distribución de preguntas
-        instruccion_distribucion = ""
-        if cantidad_literal is not None and cantidad_inferencial is not None and cantidad_critico is not None:
-             instruccion_distribucion = f"""
-**DISTRIBUCIÓN OBLIGATORIA DE PREGUNTAS (TOTAL {cantidad}):**
-Debes generar EXACTAMENTE:
-- {cantidad_literal} preguntas de nivel LITERAL.
-- {cantidad_inferencial} preguntas de nivel INFERENCIAL.
-- {cantidad_critico} preguntas de nivel CRÍTICO.
+                encabezado = await tarea_encabezado
+                lectura = encabezado["lectura"].strip()
+                if not lectura:
+                    raise ValueError("La IA no generó el texto de lectura")
+                tiempos["segundos_lectura"] = round(time.perf_counter() - inicio, 2)
+                for clave in ("saludo", "titulo", "instrucciones"):
+                    yield clave, encabezado[clave]
+                yield "lectura", lectura
 
-Selecciona de la lista de desempeños proporcionada aquellos que mejor se ajusten a cada nivel solicitado. Si no hay un desempeño explícito para un nivel, ADAPTA el enfoque de la pregunta para cumplir con el nivel exigido, pero manteniendo la coherencia con el grado.
-"""
-        
-        # Texto de lectura
-        texto_lectura = ""
-        if texto_base:
-            texto_lectura = f"""
-TEXTO DE LECTURA:
-\"\"\"
-{texto_base}
-\"\"\"
-"""
-        elif tipo_textual or formato_textual:
-             texto_lectura = "Debes GENERAR un texto original que cumpla con el TIPO y FORMATO especificados arriba."
+            for indice, nivel in enumerate(niveles):
+                prompt = self._build_prompt_preguntas_nivel(preparacion, lectura, nivel["nivel"], nivel["cantidad"])
+                pendientes[asyncio.create_task(generar(prompt.texto, RespuestaPreguntasNivel))] = indice
 
-        
-        # Prompt basado en el formato del usuario
-        prompt = f"""Eres un experto en la elaboración de preguntas de comprensión lectora que trabaja con estudiantes de Perú. Utiliza el Currículo Nacional de Educación Básica (CNEB).
+            # Numeración provisional para el streaming; la definitiva se fija al ensamblar
+            desde = [sum(n["cantidad"] for n in niveles[:i]) for i in range(len(niveles))]
+            por_nivel: dict[int, list[dict]] = {}
+            errores = []
+            while pendientes:
+                terminadas, _ = await asyncio.wait(pendientes, return_when=asyncio.FIRST_COMPLETED)
+                for tarea in terminadas:
+                    indice = pendientes.pop(tarea)
+                    try:
+                        datos = tarea.result()
+                    except ValueError as e:
+                        if indice is None:
+                            logger.warning("No se pudo generar el encabezado del examen: %s", e)
+                        else:
+                            logger.warning("No se pudieron generar las preguntas de nivel %s: %s", niveles[indice]["nivel"], e)
+                            errores.append(e)
+                        continue
 
-Primero saluda muy amablemente como un experto en la elaboración de preguntas de comprensión lectora.
+                    if indice is None:
+                        encabezado = datos
+                        for clave in ("saludo", "titulo", "instrucciones"):
+                            yield clave, encabezado[clave]
+                        continue
 
-El examen debe tener exactamente {cantidad} preguntas para estudiantes de {grado.nombre}.
-{texto_lectura}
-Usarás los siguientes desempeños que están enumerados e indican entre paréntesis si es de nivel LITERAL, INFERENCIAL o CRÍTICO:
-{desempenos_texto}
+                    preguntas = datos["preguntas"][:niveles[indice]["cantidad"]]
+                    for numero, pregunta in enumerate(preguntas, start=desde[indice] + 1):
+                        pregunta["numero"] = numero
+                        pregunta["nivel"] = niveles[indice]["nivel"]
+                        yield "pregunta", pregunta
+                    por_nivel[indice] = preguntas
 
-{instruccion_dificultad}
-{instruccion_diversidad}
-{instruccion_distribucion}
+            if not por_nivel and errores:
+                raise errores[0]
+        finally:
+            for tarea in pendientes:
+                tarea.cancel()
 
-El examen debe presentar:
-1. Un 'título' motivador para el examen
-2. Una sección para que los estudiantes ingresen sus 'Apellidos y Nombres' y la 'Fecha'
-3. 'Instrucciones precisas en un párrafo' para responder el examen
-4. La 'lectura completa' o 'un fragmento de la lectura' que utilizarás para que los estudiantes respondan las preguntas. SI SE ESPECIFICÓ UN FORMATO DISCONTINUO O MIXTO, REPRESENTA LOS ELEMENTOS VISUALES (TABLAS, GRÁFICOS) USANDO MARKDOWN O DESCRIBIÉNDOLOS CLARAMENTE.
-5. Las preguntas con esquema de opción múltiple (4 alternativas A, B, C, D siendo una sola la correcta, en orden aleatorio)
-6. Al final una 'tabla' indicando: los desempeños utilizados, número de pregunta, nivel (LITERAL/INFERENCIAL/CRÍTICO) y alternativa correcta. EN LA TABLA EL DESEMPEÑO DEBE TENER EL FORMATO EXACTO: "(CÓDIGO) DESCRIPCIÓN", por ejemplo: "(01) Obtiene información explícita..."
+        resultado = self._ensamblar_secciones(preparacion, encabezado, lectura, por_nivel)
+        tiempos["segundos_total"] = round(time.perf_counter() - inicio, 2)
+        resultado["generacion"] = {
+            "modo": "paralelo",
+            "llamadas": 1 + len(niveles),
+            "niveles_fallidos": len(niveles) - len(por_nivel),
+            **tiempos,
+        }
+        yield "completado", resultado
 
-IMPORTANTE: Responde ÚNICAMENTE con un JSON válido con esta estructura exacta:
-{{
-    "saludo": "texto del saludo amable del experto",
-    "examen": {{
-        "titulo": "título motivador del examen",
-        "grado": "{grado.nombre}",
-        "instrucciones": "instrucciones precisas para responder el examen",
-        "lectura": "texto de lectura completo o fragmento para las preguntas",
-        "preguntas": [
-            {{
-                "numero": 1,
-                "enunciado": "texto de la pregunta",
-                "opciones": [
-                    {{"letra": "A", "texto": "opción a", "es_correcta": false}},
-                    {{"letra": "B", "texto": "opción b", "es_correcta": true}},
-                    {{"letra": "C", "texto": "opción c", "es_correcta": false}},
-                    {{"letra": "D", "texto": "opción d", "es_correcta": false}}
-                ],
-                "desempeno_codigo": "01",
-                "nivel": "LITERAL|INFERENCIAL|CRITICO"
-            }}
-        ],
-        "tabla_respuestas": [
-            {{
-                "pregunta": 1,
-                "desempeno": "(01) Descripción o texto del desempeño...",
-                "nivel": "LITERAL|INFERENCIAL|CRITICO",
-                "respuesta_correcta": "A|B|C|D"
-            }}
-        ]
-    }}
-}}
-"""
+    async def generar_desde_preparacion(
+        self,
+        preparacion: dict,
+        modelo: str = "gemini",
+        cache: str = "prefer"
+    ) -> dict:
+        """
+        Genera el examen a partir de una preparación (ver preparar_examen_lectura).
+        No usa la base de datos.
+        """
+        ai_service = self.get_ai_service(modelo)
         
         try:
-            response_text = await ai_service.generate_content(prompt)
-            response_text = ai_service.clean_json_response(response_text)
-            
-            try:
-                data = json.loads(response_text)
-            except json.JSONDecodeError as je:
-                print(f"FAILED LECTOSISTEM (DESEMPEÑOS) JSON: {response_text}")
-                raise ValueError(f"Error al parsear respuesta JSON de la IA: {je}")
-            
-            return {
-                "grado": grado.nombre,
-                "desempenos_usados": desempenos_texto,
-                "saludo": data.get("saludo", ""),
-                "examen": data.get("examen", {}),
-                "total_preguntas": len(data.get("examen", {}).get("preguntas", []))
-            }
-            
+            if preparacion.get("modo") == "paralelo":
+                async for evento, datos in self._generar_secciones(ai_service, preparacion, cache):
+                    if evento == "completado":
+                        resultado = datos
+            else:
+                response_text = await ai_service.generate(preparacion["prompt"], cache=cache)
+                resultado = self._construir_resultado(ai_service, preparacion, response_text)
+            return await self._finalizar_examen(ai_service, preparacion, resultado, cache)
         except json.JSONDecodeError as e:
             raise ValueError(f"Error al parsear respuesta de {modelo}: {e}")
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             raise ValueError(f"Error al generar preguntas: {e}")
 
+    async def generar_stream_desde_preparacion(
+        self,
+        preparacion: dict,
+        modelo: str = "gemini",
+        cache: str = "prefer"
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Variante en streaming de generar_desde_preparacion.
+        Produce (evento, datos) a medida que el modelo completa cada sección
+        y, al final, ('completado', resultado).
+        """
+        ai_service = self.get_ai_service(modelo)
+        parser = IncrementalJSONParser(STREAM_PATHS)
+        
+        try:
+            if preparacion.get("modo") == "paralelo":
+                async for evento, datos in self._generar_secciones(ai_service, preparacion, cache):
+                    if evento == "completado":
+                        yield evento, await self._finalizar_examen(ai_service, preparacion, datos, cache)
+                    else:
+                        yield evento, datos
+                return
+            async for chunk in ai_service.generate_stream(preparacion["prompt"], cache=cache):
+                for path, value in parser.feed(chunk):
+                    yield ("pregunta" if isinstance(path[-1], int) else path[-1]), value
+            resultado = self._construir_resultado(ai_service, preparacion, parser.text)
+            yield "completado", await self._finalizar_examen(ai_service, preparacion, resultado, cache)
+        except ProviderOverloadedError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Error al generar preguntas: {e}")
+    
+    async def generar_preguntas_por_desempenos(
+        self,
+        db: AsyncSession,
+        grado_id: int,
+        desempeno_ids: list[int],
+        cantidad: int = 3,
+        texto_base: Optional[str] = None,
+        modelo: str = "gemini",
+        nivel_dificultad: str = "intermedio",
+        tipo_textual: Optional[str] = None,
+        formato_textual: Optional[str] = None,
+        cantidad_literal: Optional[int] = None,
+        cantidad_inferencial: Optional[int] = None,
+        cantidad_critico: Optional[int] = None,
+        cache: str = "prefer",
+        modo_generacion: str = "completo"
+    ) -> dict:
+        """
+        Genera un examen completo basado en desempeños específicos seleccionados.
+
+        Args:
+            cache: 'bypass', 'prefer' u 'only' (ver AIService.generate)
+            modo_generacion: 'completo' o 'paralelo' (ver preparar_examen_lectura)
+        """
+        self.get_ai_service(modelo)
+        
+        preparacion = await self.preparar_examen_lectura(
+            db,
+            grado_id=grado_id,
+            desempeno_ids=desempeno_ids,
+            cantidad=cantidad,
+            texto_base=texto_base,
+            nivel_dificultad=nivel_dificultad,
+            tipo_textual=tipo_textual,
+            formato_textual=formato_textual,
+            cantidad_literal=cantidad_literal,
+            cantidad_inferencial=cantidad_inferencial,
+            cantidad_critico=cantidad_critico,
+            modelo=modelo,
+            modo_generacion=modo_generacion
+        )
+        
+        # Liberar la conexión al pool antes de la llamada (lenta) al modelo
+        await db.commit()
+        
+        return await self.generar_desde_preparacion(preparacion, modelo=modelo, cache=cache)
 
 # Singleton instance
 lectosistem_service = LectoSistemService()
@@ -2,68 +2,108 @@
 Servicio para gestionar evaluaciones de Matemática (MatSistem).
 Genera situaciones problemáticas y preguntas siguiendo el modelo MINEDU.
 """
-from typing import Optional, List
+from typing import Any, AsyncIterator, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 import json
 
-from app.models.db_models import (
-    Grado,
-    CompetenciaMatematica,
-    CapacidadMatematica,
-    DesempenoMatematica,
-    EstandarMatematica
-)
 from app.core.config import get_settings
+from app.models.examen_ia import RespuestaExamenMatematica, RespuestaReparacionMatematica
 from app.services.ai_factory import ai_factory
+from app.services.ai_rate_limiter import ProviderOverloadedError
+from app.services.curriculum_service import curriculum_service
+from app.services.answer_key import derivar_tabla
+from app.services.exam_repair import Solicitud, exam_repair
+from app.services.json_stream import IncrementalJSONParser
+from app.services.prompt_budget import construir_con_presupuesto
+from app.services.prompt_templates import FragmentoPrompt, PromptRenderizado, prompt_templates
+from app.services.structured_output import structured_output
 
 settings = get_settings()
 
+# Secciones del JSON que se envían al cliente en cuanto se completan (streaming)
+STREAM_PATHS = [
+    ("saludo",),
+    ("examen", "titulo"),
+    ("examen", "instrucciones"),
+    ("examen", "situacion_problematica"),
+    ("examen", "preguntas", "*"),
+]
 
-class MatSistemService:
-    """Servicio para generar evaluaciones de matemática."""
-    
-    def __init__(self):
-        pass
-    
-    def _build_prompt_matematica(
-        self,
-        grado_nombre: str,
-        competencia_nombre: str,
-        capacidades_desempenos: dict,
-        cantidad: int,
-        situacion_base: Optional[str] = None,
-        nivel_dificultad: str = "intermedio"
-    ) -> str:
-        """
-        Construye el prompt para generar un examen de matemática
-        siguiendo el formato oficial del MINEDU (MateJony).
-        
-        Args:
-            nivel_dificultad: 'basico', 'intermedio', o 'avanzado'
-        """
-        
-        # Formatear desempeños por capacidad
-        desempenos_formateados = ""
-        for orden, data in capacidades_desempenos.items():
-            desempenos_formateados += f"\n**Capacidad {orden}: {data['nombre']}**\n"
-            for des in data['desempenos']:
-                desempenos_formateados += f"  - {des['codigo']}: {des['descripcion']}\n"
-        
-        situacion_texto = ""
-        if situacion_base:
-            situacion_texto = f"""
+# ──────────────────────────────────────────────
+# Plantilla de prompt (se valida una vez al importar el módulo)
+# ──────────────────────────────────────────────
+
+PREFIJO_MATEMATICA = """Eres **"MateJony"**, especialista pedagógico en Matemática del MINEDU (Perú). Tu enfoque es la Resolución de Problemas y el Pensamiento Crítico.
+Diseña una **Situación Significativa de Aprendizaje** para los estudiantes del grado indicado en los parámetros curriculares.
+
+**CONTEXTO:** Regional Peruano (mercados locales, ferias, turismo, geografía, biodiversidad del Perú).
+
+**REQUERIMIENTOS DEL ENTREGABLE:**
+Genera un examen completo en formato JSON con la siguiente estructura.
+1. La **Situación Problemática** debe ser un texto narrativo breve (y datos numéricos/gráficos si aplica) que plantee un reto. NO puede ser solo una operación matemática suelta.
+2. Genera la **cantidad de preguntas** de opción múltiple indicada en los parámetros curriculares.
+3. Cada pregunta debe estar vinculada a uno de los desempeños listados.
+
+**FORMATO JSON OBLIGATORIO:**
+Responde ÚNICAMENTE con un JSON válido que siga esta estructura EXACTA, sin comentarios ni texto adicional:
+
+{
+    "saludo": "¡Hola! Soy MateJony. He preparado este desafío matemático contextualizado para tus estudiantes...",
+    "examen": {
+        "titulo": "Título motivador (ej: 'Nuestra Feria Gastronómica', 'Calculando distancias en los Andes')",
+        "grado": "Nombre del grado indicado",
+        "competencia": "Nombre de la competencia indicada",
+        "instrucciones": "Lee atentamente la situación y resuelve los problemas planteados.",
+        "situacion_problematica": "Texto completo de la situación significativa...",
+        "preguntas": [
+            {
+                "numero": 1,
+                "enunciado": "¿Enunciado del problema matemático?",
+                "opciones": [
+                    {"letra": "A", "texto": "Respuesta 1", "es_correcta": false},
+                    {"letra": "B", "texto": "Respuesta 2 (Correcta)", "es_correcta": true},
+                    {"letra": "C", "texto": "Respuesta 3", "es_correcta": false},
+                    {"letra": "D", "texto": "Respuesta 4", "es_correcta": false}
+                ],
+                "capacidad": "Nombre de la capacidad asociada",
+                "desempeno_codigo": "Código del desempeño evaluado",
+                "criterio_evaluacion": "Criterio específico: [Habilidad] + [Contenido] + [Condición]",
+                "justificacion": "Explicación paso a paso de la resolución"
+            }
+        ]
+    }
+}
+
+"""
+
+CUERPO_MATEMATICA = """**PARÁMETROS CURRICULARES:**
+- **Competencia:** $competencia_nombre
+- **Grado:** $grado_nombre
+- **Nivel de Dificultad:** $nivel_dificultad
+- **Cantidad de preguntas:** $cantidad
+
+**INSUMO BASE:**
+$situacion_texto
+
+**DESEMPEÑOS A EVALUAR (Tus preguntas deben alinearse a estos):**
+$desempenos_formateados
+
+$instruccion_dificultad
+"""
+
+SITUACION_BASE = FragmentoPrompt("situacion_base", '''
 **SITUACIÓN PROBLEMÁTICA PROPORCIONADA:**
-\"\"\"
-{situacion_base}
-\"\"\"
-Usa esta situación como base para el problema.
 """
-        
-        # Instrucciones según nivel de dificultad para matemática
-        dificultad_instrucciones = {
-            "basico": """
+$situacion_base
+"""
+Usa esta situación como base para el problema.
+''', ["situacion_base"])
+
+SITUACION_NUEVA = "CREA UNA SITUACIÓN ORIGINAL basada en un contexto real y motivador para la edad del estudiante."
+
+# Instrucciones según nivel de dificultad para matemática
+DIFICULTAD_INSTRUCCIONES = {
+    "basico": """
 **NIVEL DE DIFICULTAD: BÁSICO (Simple y sencillo)**
 - Crear una situación problemática SENCILLA y fácil de comprender
 - Usar NÚMEROS PEQUEÑOS y operaciones directas
@@ -73,7 +113,7 @@ Usa esta situación como base para el problema.
 - Usar contextos cotidianos y familiares para el estudiante
 - Los datos deben estar explícitos y fáciles de identificar
 - Priorizar ejercicios de aplicación directa de conceptos""",
-            "intermedio": """
+    "intermedio": """
 **NIVEL DE DIFICULTAD: INTERMEDIO (Demanda cognitiva media)**
 - La situación problemática debe tener complejidad moderada
 - Pueden requerirse 2-3 pasos para resolver los problemas
@@ -82,7 +122,7 @@ Usa esta situación como base para el problema.
 - Combinar diferentes operaciones o conceptos relacionados
 - Requerir que el estudiante organice información antes de resolver
 - Equilibrar problemas de diferentes niveles de complejidad""",
-            "avanzado": """
+    "avanzado": """
 **NIVEL DE DIFICULTAD: AVANZADO (Alta demanda cognitiva)**
 - La situación problemática debe ser COMPLEJA y desafiante
 - Los problemas pueden requerir MÚLTIPLES PASOS (3 o más)
@@ -93,179 +133,379 @@ Usa esta situación como base para el problema.
 - Pueden requerirse conceptos combinados de diferentes capacidades
 - Incluir problemas que admitan diferentes estrategias de solución
 - Requerir que el estudiante justifique o argumente su respuesta"""
-        }
-        
-        instruccion_dificultad = dificultad_instrucciones.get(
-            nivel_dificultad.lower(), 
-            dificultad_instrucciones["intermedio"]
-        )
-        
-        prompt = f"""Eres **"MateJony"**, especialista pedagógico en Matemática del MINEDU (Perú). Tu enfoque es la Resolución de Problemas y el Pensamiento Crítico.
-Diseña una **Situación Significativa de Aprendizaje** para estudiantes de **{grado_nombre}**.
+}
 
-**PARÁMETROS CURRICULARES:**
-- **Competencia:** {competencia_nombre}
-- **Grado:** {grado_nombre}
-- **Nivel de Dificultad:** {nivel_dificultad.upper()}
-- **Contexto:** Regional Peruano (mercados locales, ferias, turismo, geografía, biodiversidad del Perú).
+# Reparación: regenera solo las preguntas inválidas o faltantes de un examen ya generado
+PREFIJO_REPARACION = """Eres **"MateJony"**, especialista pedagógico en Matemática del MINEDU (Perú). Tu enfoque es la Resolución de Problemas y el Pensamiento Crítico.
 
-**INSUMO BASE:**
-{situacion_texto if situacion_base else "CREA UNA SITUACIÓN ORIGINAL basada en un contexto real y motivador para la edad del estudiante."}
+Un examen ya elaborado tiene preguntas con errores o le faltan preguntas. Genera SOLO las preguntas solicitadas, sobre la misma situación problemática.
 
-**DESEMPEÑOS A EVALUAR (Tus preguntas deben alinearse a estos):**
-{desempenos_formateados}
+**REGLAS:**
+- Cada pregunta tiene exactamente 4 alternativas con las letras A, B, C y D.
+- Exactamente UNA alternativa tiene "es_correcta": true y su valor debe ser el resultado correcto del problema.
+- Respeta el número, la capacidad y el desempeño indicados para cada pregunta.
+- No repitas las preguntas que ya tiene el examen.
 
-{instruccion_dificultad}
+Responde ÚNICAMENTE con un JSON válido que siga esta estructura EXACTA, sin comentarios ni texto adicional:
 
-**REQUERIMIENTOS DEL ENTREGABLE:**
-Genera un examen completo en formato JSON con la siguiente estructura.
-1. La **Situación Problemática** debe ser un texto narrativo breve (y datos numéricos/gráficos si aplica) que plantee un reto. NO puede ser solo una operación matemática suelta.
-2. Genera **{cantidad} preguntas** de opción múltiple.
-3. Cada pregunta debe estar vinculada a uno de los desempeños listados.
+{
+    "preguntas": [
+        {
+            "numero": 1,
+            "enunciado": "¿Enunciado del problema matemático?",
+            "opciones": [
+                {"letra": "A", "texto": "Respuesta 1", "es_correcta": false},
+                {"letra": "B", "texto": "Respuesta 2 (Correcta)", "es_correcta": true},
+                {"letra": "C", "texto": "Respuesta 3", "es_correcta": false},
+                {"letra": "D", "texto": "Respuesta 4", "es_correcta": false}
+            ],
+            "capacidad": "Nombre de la capacidad asociada",
+            "desempeno_codigo": "Código del desempeño evaluado",
+            "criterio_evaluacion": "Criterio específico: [Habilidad] + [Contenido] + [Condición]",
+            "justificacion": "Explicación paso a paso de la resolución"
+        }
+    ]
+}
 
-**FORMATO JSON OBLIGATORIO:**
-Responde ÚNICAMENTE con un JSON válido que siga esta estructura EXACTA, sin comentarios ni texto adicional:
+"""
 
-{{
-    "saludo": "¡Hola! Soy MateJony. He preparado este desafío matemático contextualizado para tus estudiantes...",
-    "examen": {{
-        "titulo": "Título motivador (ej: 'Nuestra Feria Gastronómica', 'Calculando distancias en los Andes')",
-        "grado": "{grado_nombre}",
-        "competencia": "{competencia_nombre}",
-        "instrucciones": "Lee atentamente la situación y resuelve los problemas planteados.",
-        "situacion_problematica": "Texto completo de la situación significativa...",
-        "preguntas": [
-            {{
-                "numero": 1,
-                "enunciado": "¿Enunciado del problema matemático?",
-                "opciones": [
-                    {{"letra": "A", "texto": "Respuesta 1", "es_correcta": false}},
-                    {{"letra": "B", "texto": "Respuesta 2 (Correcta)", "es_correcta": true}},
-                    {{"letra": "C", "texto": "Respuesta 3", "es_correcta": false}},
-                    {{"letra": "D", "texto": "Respuesta 4", "es_correcta": false}}
-                ],
-                "capacidad": "Nombre de la capacidad asociada",
-                "desempeno_codigo": "Código del desempeño evaluado",
-                "criterio_evaluacion": "Criterio específico: [Habilidad] + [Contenido] + [Condición]"
-            }}
-        ],
-        "tabla_respuestas": [
-            {{
-                "pregunta": 1,
-                "capacidad": "Capacidad",
-                "desempeno": "Desempeño resumido",
-                "respuesta_correcta": "B",
-                "justificacion": "Explicación paso a paso de la resolución"
-            }}
-        ]
-    }}
-}}
+CUERPO_REPARACION = '''**PARÁMETROS CURRICULARES:**
+- **Competencia:** $competencia_nombre
+- **Grado:** $grado_nombre
+
+**DESEMPEÑOS DEL EXAMEN:**
+$desempenos_texto
+
+**SITUACIÓN PROBLEMÁTICA:**
+"""
+$situacion_problematica
 """
-        return prompt
 
-    async def generar_examen_matematica(
+**PREGUNTAS QUE YA TIENE EL EXAMEN (no las repitas):**
+$preguntas_existentes
+
+**GENERA EXACTAMENTE $cantidad PREGUNTAS:**
+$solicitudes
+'''
+
+PLANTILLA_MATEMATICA = prompt_templates.registrar(
+    "matematica", PREFIJO_MATEMATICA, CUERPO_MATEMATICA,
+    ["competencia_nombre", "grado_nombre", "nivel_dificultad", "cantidad",
+     "situacion_texto", "desempenos_formateados", "instruccion_dificultad"],
+    esquema=RespuestaExamenMatematica
+)
+PLANTILLA_REPARACION = prompt_templates.registrar(
+    "matematica_reparacion", PREFIJO_REPARACION, CUERPO_REPARACION,
+    ["competencia_nombre", "grado_nombre", "desempenos_texto", "situacion_problematica",
+     "preguntas_existentes", "cantidad", "solicitudes"],
+    esquema=RespuestaReparacionMatematica
+)
+
+
+class MatSistemService:
+    """Servicio para generar evaluaciones de matemática."""
+    
+    def __init__(self):
+        pass
+    
+    def _build_prompt_matematica(
         self,
-        db: AsyncSession,
-        grado_id: int,
-        competencia_id: int,
-        desempeno_ids: List[int],
-        cantidad: int = 3,
+        grado_nombre: str,
+        competencia_nombre: str,
+        capacidades_desempenos: dict,
+        cantidad: int,
         situacion_base: Optional[str] = None,
-        modelo: str = "gemini",
         nivel_dificultad: str = "intermedio"
-    ) -> dict:
+    ) -> PromptRenderizado:
         """
-        Genera un examen de matemática basado en desempeños específicos.
+        Construye el prompt para generar un examen de matemática
+        siguiendo el formato oficial del MINEDU (MateJony).
         
         Args:
-            nivel_dificultad: 'basico' (simple), 'intermedio' (demanda media), 'avanzado' (alta demanda cognitiva)
+            nivel_dificultad: 'basico', 'intermedio', o 'avanzado'
         """
+        
+        # Formatear desempeños por capacidad
+        lineas = []
+        for orden, data in capacidades_desempenos.items():
+            lineas.append(f"\n**Capacidad {orden}: {data['nombre']}**\n")
+            lineas.extend(f"  - {des['codigo']}: {des['descripcion']}\n" for des in data['desempenos'])
+        
+        instruccion_dificultad = DIFICULTAD_INSTRUCCIONES.get(
+            nivel_dificultad.lower(), 
+            DIFICULTAD_INSTRUCCIONES["intermedio"]
+        )
+        
+        return PLANTILLA_MATEMATICA.renderizar(
+            competencia_nombre=competencia_nombre,
+            grado_nombre=grado_nombre,
+            nivel_dificultad=nivel_dificultad.upper(),
+            cantidad=cantidad,
+            situacion_texto=SITUACION_BASE.renderizar(situacion_base=situacion_base) if situacion_base else SITUACION_NUEVA,
+            desempenos_formateados="".join(lineas),
+            instruccion_dificultad=instruccion_dificultad
+        )
+
+    def get_ai_service(self, modelo: str):
+        """Obtiene el servicio de IA y verifica que esté configurado."""
         ai_service = ai_factory.get_service(modelo)
         
         if not ai_service.is_configured():
             raise ValueError(f"Configuración de API para {modelo} incompleta")
         
+        return ai_service
+
+    async def preparar_examen_matematica(
+        self,
+        db: AsyncSession,
+        grado_id: int,
+        competencia_id: int,
+        desempeno_ids: List[int],
+        cantidad: int = 3,
+        situacion_base: Optional[str] = None,
+        nivel_dificultad: str = "intermedio",
+        modelo: str = "gemini"
+    ) -> dict:
+        """
+        Obtiene los datos curriculares (instantánea en memoria) y construye el prompt.
+        No llama al modelo de IA, de modo que la sesión puede cerrarse antes.
+        La situación base se recorta si excede el presupuesto de tokens del modelo.
+        
+        Returns:
+            dict con 'grado', 'competencia', 'desempenos_usados', 'desempenos'
+            (código -> descripción), 'capacidades' (código -> capacidad), 'cantidad',
+            'prompt' y 'tokens'
+        """
         if not desempeno_ids:
             raise ValueError("Debe seleccionar al menos un desempeño")
         
-        # Obtener grado
-        result_grado = await db.execute(select(Grado).where(Grado.id == grado_id))
-        grado = result_grado.scalars().first()
+        # Datos curriculares desde la instantánea en memoria (sin consultas a la BD)
+        curriculo = await curriculum_service.obtener(db)
+
+        grado = curriculo.get_grado(grado_id)
         if not grado:
             raise ValueError(f"Grado con id {grado_id} no encontrado")
         
-        # Obtener competencia
-        result_comp = await db.execute(select(CompetenciaMatematica).where(CompetenciaMatematica.id == competencia_id))
-        competencia = result_comp.scalars().first()
+        competencia = curriculo.get_competencia(competencia_id)
         if not competencia:
             raise ValueError(f"Competencia con id {competencia_id} no encontrada")
         
-        # Obtener desempeños seleccionados con sus capacidades
-        result_desempenos = await db.execute(
-            select(DesempenoMatematica)
-            .where(DesempenoMatematica.id.in_(desempeno_ids))
-            .options(selectinload(DesempenoMatematica.capacidad))
-        )
-        desempenos = result_desempenos.scalars().all()
-        
+        # Desempeños seleccionados (incluyen su capacidad)
+        desempenos = curriculo.get_desempenos_mat_por_ids(desempeno_ids)
         if not desempenos:
             raise ValueError("No se encontraron los desempeños seleccionados")
         
         # Organizar desempeños por capacidad
         capacidades_desempenos = {}
         for d in desempenos:
-            cap = d.capacidad
-            if cap.orden not in capacidades_desempenos:
-                capacidades_desempenos[cap.orden] = {
-                    'nombre': cap.nombre,
+            if d['capacidad_orden'] not in capacidades_desempenos:
+                capacidades_desempenos[d['capacidad_orden']] = {
+                    'nombre': d['capacidad_nombre'],
                     'desempenos': []
                 }
-            capacidades_desempenos[cap.orden]['desempenos'].append({
-                'codigo': d.codigo,
-                'descripcion': d.descripcion
+            capacidades_desempenos[d['capacidad_orden']]['desempenos'].append({
+                'codigo': d['codigo'],
+                'descripcion': d['descripcion']
             })
         
         # Construir prompt
-        prompt = self._build_prompt_matematica(
-            grado_nombre=grado.nombre,
-            competencia_nombre=competencia.nombre,
-            capacidades_desempenos=capacidades_desempenos,
-            cantidad=cantidad,
-            situacion_base=situacion_base,
-            nivel_dificultad=nivel_dificultad
+        prompt, tokens = construir_con_presupuesto(
+            lambda texto: self._build_prompt_matematica(
+                grado_nombre=grado["nombre"],
+                competencia_nombre=competencia["nombre"],
+                capacidades_desempenos=capacidades_desempenos,
+                cantidad=cantidad,
+                situacion_base=texto,
+                nivel_dificultad=nivel_dificultad
+            ),
+            situacion_base,
+            modelo
         )
         
+        # Construir texto de desempeños usados
+        desempenos_texto = "\n".join([
+            f"{d['codigo']}. {d['descripcion']} (Cap: {d['capacidad_nombre']})"
+            for d in desempenos
+        ])
+        
+        return {
+            "grado": grado["nombre"],
+            "competencia": competencia["nombre"],
+            "desempenos_usados": desempenos_texto,
+            "desempenos": {d["codigo"]: d["descripcion"] for d in desempenos},
+            "capacidades": {d["codigo"]: d["capacidad_nombre"] for d in desempenos},
+            "cantidad": cantidad,
+            "prompt": prompt.texto,
+            "tokens": tokens
+        }
+
+    def _construir_resultado(self, ai_service, preparacion: dict, response_text: str) -> dict:
+        """Valida la respuesta del modelo contra el esquema y arma el resultado del examen."""
         try:
-            response_text = await ai_service.generate_content(prompt)
-            response_text = ai_service.clean_json_response(response_text)
-            
-            try:
-                data = json.loads(response_text)
-            except json.JSONDecodeError as je:
-                print(f"FAILED MATSISTEM JSON: {response_text}")
-                raise ValueError(f"Error al parsear respuesta JSON de matemática: {je}")
-            
-            # Construir texto de desempeños usados
-            # d.capacidad ya está cargado gracias a selectinload
-            desempenos_texto = "\n".join([
-                f"{d.codigo}. {d.descripcion} (Cap: {d.capacidad.nombre})"
-                for d in desempenos
-            ])
-            
+            data = structured_output.parsear(
+                response_text, RespuestaExamenMatematica, ai_service.clean_json_response
+            )
+        except ValueError as ve:
+            raise ValueError(f"Error al parsear respuesta JSON de matemática: {ve}")
+        
+        return {
+            "grado": preparacion["grado"],
+            "competencia": preparacion["competencia"],
+            "desempenos_usados": preparacion["desempenos_usados"],
+            "saludo": data["saludo"],
+            "examen": data["examen"],
+            "total_preguntas": len(data["examen"]["preguntas"]),
+            "tokens": preparacion.get("tokens")
+        }
+
+    def _build_prompt_reparacion(
+        self,
+        preparacion: dict,
+        examen: dict,
+        solicitudes: list[Solicitud]
+    ) -> PromptRenderizado:
+        """Construye el prompt breve que regenera solo las preguntas solicitadas."""
+        pendientes = {s.numero for s in solicitudes}
+        existentes = "\n".join(
+            f"{p['numero']}. {p.get('enunciado', '')}"
+            for p in examen["preguntas"] if p["numero"] not in pendientes
+        )
+        lineas = []
+        for solicitud in solicitudes:
+            original = solicitud.original
+            if original is None:
+                lineas.append(f"- Pregunta {solicitud.numero}: pregunta nueva, con cualquiera de los desempeños.")
+            else:
+                lineas.append(
+                    f"- Pregunta {solicitud.numero} (capacidad {original.get('capacidad') or 'la más adecuada'}, "
+                    f"desempeño {original.get('desempeno_codigo') or 'el más adecuado'}): reemplaza a "
+                    f"\"{original.get('enunciado', '')}\", que {solicitud.motivo}."
+                )
+        return PLANTILLA_REPARACION.renderizar(
+            competencia_nombre=preparacion["competencia"],
+            grado_nombre=preparacion["grado"],
+            desempenos_texto=preparacion["desempenos_usados"],
+            situacion_problematica=examen.get("situacion_problematica", ""),
+            preguntas_existentes=existentes or "(ninguna)",
+            cantidad=len(solicitudes),
+            solicitudes="\n".join(lineas)
+        )
+
+    async def _finalizar_examen(self, ai_service, preparacion: dict, resultado: dict, cache: str) -> dict:
+        """
+        Repara las preguntas inválidas (ver exam_repair) y deriva la tabla de
+        respuestas en el servidor (ver answer_key).
+        """
+        examen = resultado["examen"]
+        desempenos = preparacion.get("desempenos", {})
+        capacidades = preparacion.get("capacidades", {})
+
+        if exam_repair.enabled:
+            resultado["validacion"] = await exam_repair.reparar(
+                ai_service,
+                examen,
+                preparacion.get("cantidad") or len(examen["preguntas"]),
+                construir=lambda examen, solicitudes: self._build_prompt_reparacion(preparacion, examen, solicitudes),
+                esquema=RespuestaReparacionMatematica,
+                cache=cache
+            )
+
+        def fila_tabla(pregunta: dict) -> dict:
+            codigo = pregunta.get("desempeno_codigo", "")
             return {
-                "grado": grado.nombre,
-                "competencia": competencia.nombre,
-                "desempenos_usados": desempenos_texto,
-                "saludo": data.get("saludo", ""),
-                "examen": data.get("examen", {}),
-                "total_preguntas": len(data.get("examen", {}).get("preguntas", []))
+                "capacidad": capacidades.get(codigo) or pregunta.get("capacidad", ""),
+                "desempeno": desempenos.get(codigo, codigo),
             }
-            
+
+        derivar_tabla(examen, fila_tabla)
+        resultado["total_preguntas"] = len(examen["preguntas"])
+        return resultado
+
+    async def generar_desde_preparacion(
+        self,
+        preparacion: dict,
+        modelo: str = "gemini",
+        cache: str = "prefer"
+    ) -> dict:
+        """
+        Genera el examen a partir de una preparación (ver preparar_examen_matematica).
+        No usa la base de datos.
+        """
+        ai_service = self.get_ai_service(modelo)
+        
+        try:
+            response_text = await ai_service.generate(preparacion["prompt"], cache=cache)
+            resultado = self._construir_resultado(ai_service, preparacion, response_text)
+            return await self._finalizar_examen(ai_service, preparacion, resultado, cache)
         except json.JSONDecodeError as e:
             raise ValueError(f"Error al parsear respuesta de {modelo}: {e}")
+        except ProviderOverloadedError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Error al generar examen de matemática: {e}")
+
+    async def generar_stream_desde_preparacion(
+        self,
+        preparacion: dict,
+        modelo: str = "gemini",
+        cache: str = "prefer"
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Variante en streaming de generar_desde_preparacion.
+        Produce (evento, datos) a medida que el modelo completa cada sección
+        y, al final, ('completado', resultado).
+        """
+        ai_service = self.get_ai_service(modelo)
+        parser = IncrementalJSONParser(STREAM_PATHS)
+        
+        try:
+            async for chunk in ai_service.generate_stream(preparacion["prompt"], cache=cache):
+                for path, value in parser.feed(chunk):
+                    yield ("pregunta" if isinstance(path[-1], int) else path[-1]), value
+            resultado = self._construir_resultado(ai_service, preparacion, parser.text)
+            yield "completado", await self._finalizar_examen(ai_service, preparacion, resultado, cache)
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             raise ValueError(f"Error al generar examen de matemática: {e}")
 
+    async def generar_examen_matematica(
+        self,
+        db: AsyncSession,
+        grado_id: int,
+        competencia_id: int,
+        desempeno_ids: List[int],
+        cantidad: int = 3,
+        situacion_base: Optional[str] = None,
+        modelo: str = "gemini",
+        nivel_dificultad: str = "intermedio",
+        cache: str = "prefer"
+    ) -> dict:
+        """
+        Genera un examen de matemática basado en desempeños específicos.
+        
+        Args:
+            nivel_dificultad: 'basico' (simple), 'intermedio' (demanda media), 'avanzado' (alta demanda cognitiva)
+            cache: 'bypass', 'prefer' u 'only' (ver AIService.generate)
+        """
+        self.get_ai_service(modelo)
+        
+        preparacion = await self.preparar_examen_matematica(
+            db,
+            grado_id=grado_id,
+            competencia_id=competencia_id,
+            desempeno_ids=desempeno_ids,
+            cantidad=cantidad,
+            situacion_base=situacion_base,
+            nivel_dificultad=nivel_dificultad,
+            modelo=modelo
+        )
+        
+        # Liberar la conexión al pool antes de la llamada (lenta) al modelo
+        await db.commit()
+        
+        return await self.generar_desde_preparacion(preparacion, modelo=modelo, cache=cache)
+
 
 # Singleton instance
 matsistem_service = MatSistemService()
@@ -0,0 +1,105 @@
+"""
+Pool de procesos para trabajo CPU intensivo (escaneo y extracción de texto
+de documentos), para no bloquear el event loop del worker.
+
+Cada tarea tiene un tiempo máximo. Un proceso que excede ese tiempo no se
+puede interrumpir desde fuera, así que el pool se recicla: se terminan sus
+procesos y se crea uno nuevo. Las tareas que estaban en curso en el pool
+reciclado se reintentan una vez en el nuevo.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class TiempoAgotadoError(Exception):
+    """La tarea excedió el tiempo máximo en el pool de procesos."""
+
+
+class ProcessPoolService:
+    """Ejecuta funciones síncronas en un pool de procesos acotado."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._tareas = 0
+        self._tiempos_agotados = 0
+        self._reciclajes = 0
+
+    def _obtener_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: el proceso padre tiene hilos (clientes HTTP, asyncio) y fork no es seguro
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _reciclar(self, executor: ProcessPoolExecutor) -> None:
+        """Termina los procesos del pool y hace que la próxima tarea cree uno nuevo."""
+        if self._executor is executor:
+            self._executor = None
+            self._reciclajes += 1
+        procesos = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for proceso in procesos:
+            if proceso.is_alive():
+                proceso.terminate()
+
+    async def ejecutar(self, funcion: Callable[..., Any], *args: Any, timeout: float) -> Any:
+        """
+        Ejecuta funcion(*args) en el pool. La función y sus argumentos deben
+        poder serializarse (función de nivel de módulo, datos simples).
+
+        Raises:
+            TiempoAgotadoError: si la tarea excede timeout segundos.
+        """
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_workers)
+
+        async with self._semaforo:
+            self._tareas += 1
+            loop = asyncio.get_running_loop()
+            for intento in range(2):
+                executor = self._obtener_executor()
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(executor, funcion, *args), timeout
+                    )
+                except asyncio.TimeoutError:
+                    self._tiempos_agotados += 1
+                    logger.warning("Tarea %s excedió %ss; se recicla el pool", funcion.__name__, timeout)
+                    self._reciclar(executor)
+                    raise TiempoAgotadoError(f"La tarea excedió el tiempo máximo de {timeout:g} s")
+                except BrokenProcessPool:
+                    self._reciclar(executor)
+                    if intento:
+                        raise
+
+    def cerrar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "procesos": self.max_workers,
+            "activo": self._executor is not None,
+            "tareas": self._tareas,
+            "tiempos_agotados": self._tiempos_agotados,
+            "reciclajes": self._reciclajes,
+        }
+
+
+# Singleton instance
+process_pool = ProcessPoolService(settings.file_pool_workers)
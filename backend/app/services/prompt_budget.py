@@ -0,0 +1,193 @@
+"""
+Conteo de tokens por proveedor y presupuesto de tamaño de los prompts.
+
+El texto base que sube el docente (texto_base, situacion_base) se inserta
+tal cual en el prompt; un libro entero produce prompts lentos, caros y que
+pueden superar el límite del modelo. Aquí se mide cada parte del prompt y,
+si el texto base no cabe en el presupuesto, se recorta en límites de
+párrafo u oración (nunca a mitad de palabra).
+
+Conteo por proveedor:
+    - chatgpt: exacto con tiktoken si está instalado (dependencia opcional)
+    - gemini:  estimación por caracteres (el conteo exacto requiere una
+               llamada a la API, más lenta que el propio recorte)
+    - auto:    el mayor de ambos, para que el prompt quepa en cualquiera
+"""
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Callable, NamedTuple, Optional
+
+from app.core.config import get_settings
+from app.services.prompt_templates import PromptRenderizado
+
+try:
+    import tiktoken
+except ImportError:  # Sin tiktoken se usa la estimación por caracteres
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Caracteres por token medidos en textos escolares en español
+CARACTERES_POR_TOKEN = {
+    "gemini": 4.0,
+    "chatgpt": 3.6,
+}
+CODIFICACION_CHATGPT = "o200k_base"  # gpt-4o / gpt-4o-mini
+
+MARCA_RECORTE = "\n[… texto recortado por extensión …]"
+
+# Cota de caracteres por token de cualquier tokenizador: basta examinar ese prefijo
+MAX_CARACTERES_POR_TOKEN = 10
+
+# Presupuesto mínimo del texto base aunque el resto del prompt sea largo
+MIN_TOKENS_TEXTO_BASE = 200
+
+PATRON_PARRAFOS = re.compile(r"\n\s*\n")
+PATRON_ORACIONES = re.compile(r"(?<=[.!?…:;])\s+")
+
+
+class TextoAjustado(NamedTuple):
+    """Resultado de ajustar un texto a un máximo de tokens."""
+    texto: str
+    tokens_originales: int
+    tokens: int
+    recortado: bool
+
+
+@lru_cache()
+def _codificador_chatgpt():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(CODIFICACION_CHATGPT)
+    except Exception as e:  # p. ej. sin red para descargar el vocabulario
+        logger.warning("tiktoken no disponible, se estiman los tokens: %s", e)
+        return None
+
+
+def conteo_exacto(proveedor: str) -> bool:
+    """Indica si contar_tokens es exacto (y no una estimación) para el proveedor."""
+    return proveedor == "chatgpt" and _codificador_chatgpt() is not None
+
+
+def contar_tokens(texto: str, proveedor: str) -> int:
+    """Cantidad de tokens de texto según el tokenizador del proveedor."""
+    if not texto:
+        return 0
+    if proveedor not in CARACTERES_POR_TOKEN:
+        return max(contar_tokens(texto, nombre) for nombre in CARACTERES_POR_TOKEN)
+    if proveedor == "chatgpt":
+        codificador = _codificador_chatgpt()
+        if codificador is not None:
+            return len(codificador.encode(texto, disallowed_special=()))
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN[proveedor])
+
+
+def _fragmentos(texto: str) -> list[tuple[str, str]]:
+    """
+    Divide el texto en (separador, fragmento): párrafos y, dentro de cada
+    párrafo, oraciones. El separador es el que precede al fragmento.
+    """
+    fragmentos = []
+    for parrafo in PATRON_PARRAFOS.split(texto.strip()):
+        for posicion, oracion in enumerate(PATRON_ORACIONES.split(parrafo.strip())):
+            if oracion:
+                separador = "" if not fragmentos else ("\n\n" if posicion == 0 else " ")
+                fragmentos.append((separador, oracion))
+    return fragmentos
+
+
+def ajustar_texto(texto: str, max_tokens: int, proveedor: str) -> TextoAjustado:
+    """
+    Recorta el texto para que no supere max_tokens, conservando el inicio y
+    cortando en el último párrafo u oración completa que cabe. Si ni la
+    primera oración cabe, se corta por palabras.
+    """
+    originales = contar_tokens(texto, proveedor)
+    if originales <= max_tokens:
+        return TextoAjustado(texto, originales, originales, False)
+
+    disponibles = max_tokens - contar_tokens(MARCA_RECORTE, proveedor)
+    partes: list[str] = []
+    usados = 0
+    prefijo = texto[:max(0, disponibles) * MAX_CARACTERES_POR_TOKEN]
+    for separador, fragmento in _fragmentos(prefijo):
+        costo = contar_tokens(separador + fragmento, proveedor)
+        if usados + costo > disponibles:
+            if not partes:
+                # Ni una oración completa cabe: cortar por palabras
+                palabras = []
+                for palabra in fragmento.split():
+                    costo_palabra = contar_tokens(" " + palabra, proveedor)
+                    if usados + costo_palabra > disponibles:
+                        break
+                    palabras.append(palabra)
+                    usados += costo_palabra
+                partes.append(" ".join(palabras))
+            break
+        partes.append(separador + fragmento)
+        usados += costo
+
+    recortado = "".join(partes).rstrip() + MARCA_RECORTE
+    return TextoAjustado(recortado, originales, contar_tokens(recortado, proveedor), True)
+
+
+def construir_con_presupuesto(
+    construir: Callable[[Optional[str]], PromptRenderizado],
+    texto_base: Optional[str],
+    proveedor: str
+) -> tuple[PromptRenderizado, dict]:
+    """
+    Construye el prompt con construir(texto_base) y, si excede el presupuesto,
+    recorta el texto base y lo vuelve a construir.
+
+    El presupuesto del texto base es el menor entre PROMPT_TEXTO_BASE_MAX_TOKENS
+    y lo que queda de PROMPT_MAX_TOKENS tras las instrucciones del prompt.
+
+    Returns:
+        Tuple con (prompt, reporte de tokens por sección)
+    """
+    prompt = construir(texto_base)
+    tokens_prompt = contar_tokens(prompt.texto, proveedor)
+    reporte = {
+        "proveedor": proveedor,
+        "exacto": conteo_exacto(proveedor),
+        "prompt": tokens_prompt,
+        "prefijo_estatico": contar_tokens(prompt.prefijo, proveedor),
+        "instrucciones": tokens_prompt,
+        "texto_base": 0,
+        "texto_base_original": 0,
+        "texto_base_recortado": False,
+        "presupuesto_texto_base": None,
+    }
+    if not texto_base:
+        return prompt, reporte
+
+    tokens_texto = contar_tokens(texto_base, proveedor)
+    instrucciones = max(0, tokens_prompt - tokens_texto)
+    presupuesto = max(
+        MIN_TOKENS_TEXTO_BASE,
+        min(settings.prompt_texto_base_max_tokens, settings.prompt_max_tokens - instrucciones)
+    )
+    ajustado = ajustar_texto(texto_base, presupuesto, proveedor)
+    if ajustado.recortado:
+        prompt = construir(ajustado.texto)
+        tokens_prompt = contar_tokens(prompt.texto, proveedor)
+        logger.info(
+            "Texto base recortado de %s a %s tokens (%s)",
+            ajustado.tokens_originales, ajustado.tokens, proveedor
+        )
+
+    reporte.update({
+        "prompt": tokens_prompt,
+        "instrucciones": instrucciones,
+        "texto_base": ajustado.tokens,
+        "texto_base_original": ajustado.tokens_originales,
+        "texto_base_recortado": ajustado.recortado,
+        "presupuesto_texto_base": presupuesto,
+    })
+    return prompt, reporte
@@ -0,0 +1,175 @@
+"""
+Registro de plantillas de prompt.
+
+Cada plantilla tiene dos partes:
+    - prefijo: texto estático (rol, reglas, formato JSON de salida). Es idéntico
+      en todas las llamadas, así los proveedores con caché de prefijo (Gemini
+      cached content, OpenAI prompt caching) lo reutilizan entre solicitudes.
+    - cuerpo: texto con las secciones variables en sintaxis de string.Template
+      ($grado_nombre, ...). Los fragmentos opcionales del cuerpo (texto base,
+      distribución de preguntas...) son FragmentoPrompt con la misma sintaxis.
+
+Las plantillas se validan al registrarlas (al importar los servicios, durante
+el arranque): el prefijo no puede tener variables y el cuerpo debe usar
+exactamente las variables declaradas. Al registrarla, el cuerpo se divide una
+vez en tramos literales y variables; renderizar solo intercala los valores
+(sin regex ni análisis del texto en cada llamada).
+
+Opcionalmente, la plantilla declara el modelo Pydantic de la respuesta
+(esquema); los proveedores lo envían como salida estructurada.
+"""
+import hashlib
+import logging
+from string import Template
+from typing import Iterable, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class PromptRenderizado(NamedTuple):
+    """Prompt listo para enviar: prefijo estático + parte variable."""
+    prefijo: str
+    variable: str
+
+    @property
+    def texto(self) -> str:
+        return self.prefijo + self.variable
+
+
+class FragmentoPrompt:
+    """Texto con variables $nombre, validado y compilado una sola vez."""
+
+    def __init__(self, nombre: str, cuerpo: str, variables: Iterable[str]):
+        self.nombre = nombre
+        self.cuerpo = cuerpo
+        self.variables = frozenset(variables)
+        self._validar()
+        self._tramos, self._cola = self._compilar(cuerpo)
+
+    def _validar(self) -> None:
+        plantilla = Template(self.cuerpo)
+        if not plantilla.is_valid():
+            raise ValueError(f"La plantilla '{self.nombre}' tiene marcadores '$' inválidos")
+        usadas = set(plantilla.get_identifiers())
+        if usadas != self.variables:
+            faltan = sorted(self.variables - usadas)
+            sobran = sorted(usadas - self.variables)
+            raise ValueError(
+                f"La plantilla '{self.nombre}' no coincide con sus variables "
+                f"(no usadas: {faltan}, no declaradas: {sobran})"
+            )
+
+    @staticmethod
+    def _compilar(cuerpo: str) -> tuple[tuple[tuple[str, str], ...], str]:
+        """Divide el cuerpo en (literal, variable) y el literal final; $$ queda como $."""
+        tramos = []
+        literal = []
+        ultimo = 0
+        for marca in Template.pattern.finditer(cuerpo):
+            literal.append(cuerpo[ultimo:marca.start()])
+            ultimo = marca.end()
+            nombre = marca.group("named") or marca.group("braced")
+            if nombre is None:  # $$
+                literal.append("$")
+                continue
+            tramos.append(("".join(literal), nombre))
+            literal = []
+        literal.append(cuerpo[ultimo:])
+        return tuple(tramos), "".join(literal)
+
+    def renderizar(self, **valores: object) -> str:
+        """Sustituye las variables; falla si falta o sobra alguna."""
+        if valores.keys() != self.variables:
+            recibidas = set(valores)
+            raise ValueError(
+                f"Variables incorrectas para la plantilla '{self.nombre}': "
+                f"faltan {sorted(self.variables - recibidas)}, sobran {sorted(recibidas - self.variables)}"
+            )
+        partes = []
+        for literal, nombre in self._tramos:
+            partes.append(literal)
+            partes.append(str(valores[nombre]))
+        partes.append(self._cola)
+        return "".join(partes)
+
+
+class PlantillaPrompt:
+    """Plantilla validada con prefijo estático y cuerpo variable."""
+
+    def __init__(
+        self,
+        nombre: str,
+        prefijo: str,
+        cuerpo: str,
+        variables: Iterable[str],
+        esquema: Optional[type[BaseModel]] = None
+    ):
+        if Template(prefijo).get_identifiers():
+            raise ValueError(f"El prefijo de la plantilla '{nombre}' no puede tener variables")
+        self.nombre = nombre
+        self.prefijo = prefijo
+        self.cuerpo = FragmentoPrompt(nombre, cuerpo, variables)
+        self.esquema = esquema
+        self.version = hashlib.sha256((prefijo + cuerpo).encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def variables(self) -> frozenset[str]:
+        return self.cuerpo.variables
+
+    def renderizar(self, **valores: object) -> PromptRenderizado:
+        return PromptRenderizado(self.prefijo, self.cuerpo.renderizar(**valores))
+
+
+class PromptTemplateRegistry:
+    """Registro de plantillas por nombre."""
+
+    def __init__(self):
+        self._plantillas: dict[str, PlantillaPrompt] = {}
+
+    def registrar(
+        self,
+        nombre: str,
+        prefijo: str,
+        cuerpo: str,
+        variables: Iterable[str],
+        esquema: Optional[type[BaseModel]] = None
+    ) -> PlantillaPrompt:
+        if nombre in self._plantillas:
+            raise ValueError(f"Plantilla de prompt duplicada: '{nombre}'")
+        plantilla = PlantillaPrompt(nombre, prefijo, cuerpo, variables, esquema)
+        self._plantillas[nombre] = plantilla
+        logger.debug("Plantilla de prompt '%s' registrada (versión %s)", nombre, plantilla.version)
+        return plantilla
+
+    def obtener(self, nombre: str) -> PlantillaPrompt:
+        try:
+            return self._plantillas[nombre]
+        except KeyError:
+            raise ValueError(f"Plantilla de prompt no registrada: '{nombre}'")
+
+    def buscar_por_prefijo(self, prompt: str) -> Optional[PlantillaPrompt]:
+        """Plantilla cuyo prefijo estático encabeza el prompt (el más largo; None si no hay)."""
+        encontrada = None
+        for plantilla in self._plantillas.values():
+            if prompt.startswith(plantilla.prefijo) and (
+                encontrada is None or len(plantilla.prefijo) > len(encontrada.prefijo)
+            ):
+                encontrada = plantilla
+        return encontrada
+
+    def stats(self) -> dict:
+        return {
+            nombre: {
+                "version": plantilla.version,
+                "prefijo_caracteres": len(plantilla.prefijo),
+                "variables": sorted(plantilla.variables),
+                "esquema": plantilla.esquema.__name__ if plantilla.esquema else None,
+            }
+            for nombre, plantilla in self._plantillas.items()
+        }
+
+
+# Singleton instance
+prompt_templates = PromptTemplateRegistry()
@@ -0,0 +1,562 @@
+"""
+Banco de preguntas: búsqueda y reutilización de preguntas ya generadas.
+
+Cada examen guardado se desnormaliza en banco_preguntas (una fila por
+pregunta, con su desempeño, nivel o capacidad, grado y dificultad), de modo
+que el docente puede buscar preguntas existentes y armar con ellas un
+examen nuevo sin llamar al modelo.
+
+    - Búsqueda por texto: en PostgreSQL, full-text en español
+      (to_tsvector/plainto_tsquery, índice GIN de la migración 6); en otros
+      motores, ILIKE por cada término.
+    - Búsqueda semántica: embedding disperso calculado localmente en CPU
+      (hashing trick sobre raíces de palabras y bigramas, sin dependencias
+      nuevas ni llamadas a un proveedor) y un índice invertido en memoria.
+      Encuentra preguntas parecidas aunque no compartan las palabras exactas
+      ("fracciones equivalentes" / "fracción equivalente").
+    - El índice en memoria se completa de forma incremental con las filas
+      nuevas, a lo sumo cada QUESTION_BANK_CHECK_SECONDS, así que también ve
+      las preguntas guardadas por otros workers.
+
+Las preguntas de exámenes anteriores a este cambio se incorporan con
+scripts/backfill_banco_preguntas.py.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import re
+import time
+import unicodedata
+import zlib
+from array import array
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.db_models import ExamenLectura, ExamenMatematica, PreguntaBanco
+from app.services.answer_key import derivar_tabla, letra_correcta
+from app.services.curriculum_service import curriculum_service
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+AREAS_BANCO = ("lectosistem", "matsistem")
+MODOS_BUSQUEDA = ("texto", "semantico")
+
+# Dimensión del espacio de hashing (colisiones despreciables para este vocabulario)
+DIMENSION_EMBEDDING = 2 ** 18
+LONGITUD_RAIZ = 6
+PESO_BIGRAMA = 0.5
+
+# Las filas se insertan en transacciones concurrentes y pueden confirmarse fuera
+# de orden de id: la sincronización revisa también este margen por debajo del
+# mayor id ya indexado.
+MARGEN_SINCRONIZACION = 500
+
+INSTRUCCIONES_LECTURA = "Lee atentamente el texto y responde cada pregunta marcando la alternativa correcta."
+INSTRUCCIONES_MATEMATICA = "Lee la situación y resuelve cada pregunta marcando la alternativa correcta."
+
+STOPWORDS = frozenset("""
+    a al algo ante antes aqui asi aun bajo bien cada como con contra cual cuales cuando de del desde
+    donde dos el ella ellas ellos en entre era es esa ese eso esta estan este esto fue ha hay la las le
+    les lo los mas me mi muy ni no nos o otra otro para pero por que se segun ser si sin sobre son su
+    sus tambien te tiene todo tu un una uno unos y ya cuantos cuanto
+""".split())
+
+
+# =============================================================================
+# EMBEDDING LOCAL
+# =============================================================================
+
+def _normalizar(texto: str) -> str:
+    """Minúsculas y sin tildes."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def _terminos(texto: str) -> list[str]:
+    """Palabras significativas del texto (sin stopwords ni palabras de menos de 3 letras)."""
+    return [
+        palabra for palabra in re.findall(r"\w+", _normalizar(texto))
+        if len(palabra) >= 3 and palabra not in STOPWORDS and not palabra.isdigit()
+    ]
+
+
+def _raiz(palabra: str) -> str:
+    """Raíz aproximada: sin plural y truncada (agrupa "fracción", "fracciones", "fraccionario")."""
+    if palabra.endswith("es") and len(palabra) > 4:
+        palabra = palabra[:-2]
+    elif palabra.endswith("s") and len(palabra) > 3:
+        palabra = palabra[:-1]
+    return palabra[:LONGITUD_RAIZ]
+
+
+def _indice(caracteristica: str) -> int:
+    return zlib.crc32(caracteristica.encode()) % DIMENSION_EMBEDDING
+
+
+def embedding(texto: str) -> list[list]:
+    """
+    Embedding disperso y normalizado (L2) del texto, como [[índice, peso], ...].
+
+    Las características son las raíces de las palabras (sin plural y
+    truncadas, suficiente para agrupar flexiones en español) y los bigramas
+    de raíces, con peso tf sublineal.
+    """
+    raices = [_raiz(palabra) for palabra in _terminos(texto)]
+    conteos: dict[int, float] = {}
+    for raiz in raices:
+        indice = _indice("p:" + raiz)
+        conteos[indice] = conteos.get(indice, 0.0) + 1.0
+    for anterior, siguiente in zip(raices, raices[1:]):
+        indice = _indice(f"b:{anterior}_{siguiente}")
+        conteos[indice] = conteos.get(indice, 0.0) + PESO_BIGRAMA
+
+    pesos = {indice: 1.0 + math.log(conteo) if conteo >= 1 else conteo for indice, conteo in conteos.items()}
+    norma = math.sqrt(sum(peso * peso for peso in pesos.values()))
+    if not norma:
+        return []
+    return [[indice, round(peso / norma, 4)] for indice, peso in sorted(pesos.items())]
+
+
+def texto_busqueda(pregunta: dict) -> str:
+    """Enunciado más el texto de las alternativas."""
+    partes = [pregunta.get("enunciado") or ""]
+    partes.extend(str(opcion.get("texto") or "") for opcion in pregunta.get("opciones") or [] if isinstance(opcion, dict))
+    return "\n".join(parte for parte in partes if parte)
+
+
+# =============================================================================
+# SERVICIO
+# =============================================================================
+
+class QuestionBankService:
+    """Ingesta, búsqueda y armado de exámenes desde el banco de preguntas."""
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._lock = asyncio.Lock()
+        # Índice invertido: característica -> (ids, pesos)
+        self._postings: dict[int, tuple[array, array]] = {}
+        # id -> (area, grado_id, desempeno_id, nivel, nivel_dificultad) para filtrar
+        self._meta: dict[int, tuple] = {}
+        self._max_id = 0
+        self._ultima_sincronizacion = 0.0
+        self._ingresadas = 0
+        self._busquedas = {modo: 0 for modo in MODOS_BUSQUEDA}
+
+    # ──────────────────────────────────────────────
+    # Ingesta
+    # ──────────────────────────────────────────────
+
+    async def agregar_examenes(self, db: AsyncSession, area: str, examenes: list) -> int:
+        """
+        Agrega al banco las preguntas de exámenes guardados (ExamenLectura o
+        ExamenMatematica con id ya asignado). Omite las que ya estén en el banco,
+        incluidas las de exámenes armados desde el banco (traen "banco_id").
+        No confirma la transacción: se guarda junto con los exámenes.
+
+        Returns:
+            Cantidad de preguntas agregadas
+        """
+        if area not in AREAS_BANCO:
+            raise ValueError(f"Área no soportada: {area}")
+        examenes = [examen for examen in examenes if examen.id is not None and isinstance(examen.preguntas, list)]
+        if not examenes:
+            return 0
+
+        result = await db.execute(
+            select(PreguntaBanco.examen_id, PreguntaBanco.numero).where(
+                PreguntaBanco.area == area,
+                PreguntaBanco.examen_id.in_([examen.id for examen in examenes])
+            )
+        )
+        existentes = set(result.all())
+        curriculo = await curriculum_service.obtener(db)
+
+        filas = []
+        for examen in examenes:
+            justificaciones = {
+                fila.get("pregunta"): fila.get("justificacion") or ""
+                for fila in examen.tabla_respuestas or [] if isinstance(fila, dict)
+            }
+            for posicion, pregunta in enumerate(examen.preguntas, start=1):
+                if not isinstance(pregunta, dict) or not pregunta.get("enunciado"):
+                    continue
+                if pregunta.get("banco_id"):
+                    # Ya está en el banco: el examen se armó con preguntas reutilizadas
+                    continue
+                numero = pregunta.get("numero") if isinstance(pregunta.get("numero"), int) else posicion
+                if (examen.id, numero) in existentes:
+                    continue
+                existentes.add((examen.id, numero))
+
+                codigo = str(pregunta.get("desempeno_codigo") or "").strip() or None
+                texto = texto_busqueda(pregunta)
+                filas.append(PreguntaBanco(
+                    area=area,
+                    examen_id=examen.id,
+                    numero=numero,
+                    docente_id=examen.docente_id,
+                    grado_id=examen.grado_id,
+                    competencia_id=getattr(examen, "competencia_id", None),
+                    desempeno_id=self._resolver_desempeno(curriculo, area, examen, codigo, pregunta),
+                    desempeno_codigo=codigo,
+                    nivel=(str(pregunta.get("nivel") or "").strip().upper() or None) if area == "lectosistem" else None,
+                    capacidad=(pregunta.get("capacidad") or None) if area == "matsistem" else None,
+                    nivel_dificultad=examen.nivel_dificultad,
+                    enunciado=pregunta["enunciado"],
+                    opciones=pregunta.get("opciones") or [],
+                    respuesta_correcta=letra_correcta(pregunta),
+                    justificacion=pregunta.get("justificacion") or justificaciones.get(numero) or None,
+                    texto_busqueda=texto,
+                    embedding=embedding(texto),
+                ))
+
+        if filas:
+            db.add_all(filas)
+            await db.flush()
+            self._ingresadas += len(filas)
+        return len(filas)
+
+    async def registrar(self, db: AsyncSession, area: str, examenes: list) -> None:
+        """
+        Agrega al banco las preguntas de exámenes recién guardados, dentro de un
+        savepoint: si falla, el examen se guarda igual (el backfill lo recupera).
+        """
+        try:
+            async with db.begin_nested():
+                await self.agregar_examenes(db, area, examenes)
+        except Exception as e:
+            logger.warning("No se pudieron agregar preguntas al banco (%s): %s", area, e)
+
+    @staticmethod
+    def _resolver_desempeno(curriculo, area: str, examen, codigo: Optional[str], pregunta: dict) -> Optional[int]:
+        """Id del desempeño a partir del código que trae la pregunta (los códigos se repiten entre grados)."""
+        if not codigo or not examen.grado_id:
+            return None
+        if area == "lectosistem":
+            for desempeno in curriculo.desempenos_por_grado.get(examen.grado_id, []):
+                if desempeno["codigo"] == codigo:
+                    return desempeno["id"]
+            return None
+
+        candidatos = [
+            d for d in curriculo.get_desempenos_mat(examen.grado_id, examen.competencia_id)
+            if d["codigo"] == codigo
+        ]
+        if len(candidatos) > 1 and pregunta.get("capacidad"):
+            capacidad = _normalizar(pregunta["capacidad"])
+            candidatos = [d for d in candidatos if _normalizar(d["capacidad_nombre"]) == capacidad] or candidatos
+        return candidatos[0]["id"] if candidatos else None
+
+    async def eliminar_examen(self, db: AsyncSession, area: str, examen_id: int) -> None:
+        """Quita del banco las preguntas de un examen eliminado (sin su lectura o situación no se pueden reutilizar)."""
+        result = await db.execute(
+            select(PreguntaBanco.id).where(PreguntaBanco.area == area, PreguntaBanco.examen_id == examen_id)
+        )
+        for pregunta_id in result.scalars().all():
+            self._meta.pop(pregunta_id, None)
+        await db.execute(
+            delete(PreguntaBanco).where(PreguntaBanco.area == area, PreguntaBanco.examen_id == examen_id)
+        )
+
+    # ──────────────────────────────────────────────
+    # Búsqueda
+    # ──────────────────────────────────────────────
+
+    async def buscar(
+        self,
+        db: AsyncSession,
+        q: Optional[str] = None,
+        modo: str = "texto",
+        area: Optional[str] = None,
+        grado_id: Optional[int] = None,
+        desempeno_id: Optional[int] = None,
+        nivel: Optional[str] = None,
+        nivel_dificultad: Optional[str] = None,
+        limite: int = 20
+    ) -> list[dict]:
+        """
+        Busca preguntas en el banco.
+
+        Args:
+            modo: "texto" (full-text) o "semantico" (similitud de embeddings)
+
+        Returns:
+            Preguntas ordenadas por relevancia (las más recientes primero si no hay consulta)
+        """
+        if modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda no soportado: {modo}")
+        if area is not None and area not in AREAS_BANCO:
+            raise ValueError(f"Área no soportada: {area}")
+        nivel = nivel.upper() if nivel else None
+        self._busquedas[modo] += 1
+
+        filtros = dict(area=area, grado_id=grado_id, desempeno_id=desempeno_id, nivel=nivel, nivel_dificultad=nivel_dificultad)
+        if modo == "semantico" and q and q.strip():
+            filas = await self._buscar_semantico(db, q, filtros, limite)
+        else:
+            filas = await self._buscar_texto(db, q, filtros, limite)
+        return [self._a_dict(fila, puntaje) for fila, puntaje in filas]
+
+    @staticmethod
+    def _condiciones(filtros: dict) -> list:
+        return [
+            getattr(PreguntaBanco, campo) == valor
+            for campo, valor in filtros.items() if valor is not None
+        ]
+
+    async def _buscar_texto(self, db: AsyncSession, q: Optional[str], filtros: dict, limite: int) -> list[tuple]:
+        query = select(PreguntaBanco).where(*self._condiciones(filtros))
+        q = (q or "").strip()
+        if not q:
+            result = await db.execute(query.order_by(PreguntaBanco.id.desc()).limit(limite))
+            return [(fila, None) for fila in result.scalars().all()]
+
+        if db.get_bind().dialect.name == "postgresql":
+            documento = func.to_tsvector("spanish", PreguntaBanco.texto_busqueda)
+            consulta = func.plainto_tsquery("spanish", q)
+            rango = func.ts_rank(documento, consulta)
+            result = await db.execute(
+                select(PreguntaBanco, rango)
+                .where(*self._condiciones(filtros), documento.op("@@")(consulta))
+                .order_by(rango.desc(), PreguntaBanco.id.desc())
+                .limit(limite)
+            )
+            return [(fila, round(float(puntaje), 4)) for fila, puntaje in result.all()]
+
+        terminos = [t for t in re.findall(r"\w+", q) if len(t) >= 3] or [q]
+        for termino in terminos:
+            query = query.where(PreguntaBanco.texto_busqueda.ilike(f"%{termino}%"))
+        result = await db.execute(query.order_by(PreguntaBanco.id.desc()).limit(limite))
+        return [(fila, None) for fila in result.scalars().all()]
+
+    async def _buscar_semantico(self, db: AsyncSession, q: str, filtros: dict, limite: int) -> list[tuple]:
+        await self._sincronizar(db)
+
+        puntajes: dict[int, float] = {}
+        for indice, peso in embedding(q):
+            posting = self._postings.get(indice)
+            if posting is None:
+                continue
+            for pregunta_id, peso_pregunta in zip(*posting):
+                puntajes[pregunta_id] = puntajes.get(pregunta_id, 0.0) + peso * peso_pregunta
+
+        valores = (filtros["area"], filtros["grado_id"], filtros["desempeno_id"], filtros["nivel"], filtros["nivel_dificultad"])
+        candidatos = (
+            (puntaje, pregunta_id) for pregunta_id, puntaje in puntajes.items()
+            if (meta := self._meta.get(pregunta_id)) is not None
+            and all(valor is None or valor == dato for valor, dato in zip(valores, meta))
+        )
+        # Margen por filas eliminadas en otros workers que el índice aún no sabe
+        mejores = heapq.nlargest(limite * 2, candidatos)
+        if not mejores:
+            return []
+
+        result = await db.execute(select(PreguntaBanco).where(PreguntaBanco.id.in_([i for _, i in mejores])))
+        por_id = {fila.id: fila for fila in result.scalars().all()}
+        return [
+            (por_id[pregunta_id], round(puntaje, 4))
+            for puntaje, pregunta_id in mejores if pregunta_id in por_id
+        ][:limite]
+
+    async def _sincronizar(self, db: AsyncSession) -> None:
+        """Incorpora al índice en memoria las filas nuevas del banco."""
+        if time.monotonic() - self._ultima_sincronizacion < self.check_seconds:
+            return
+        async with self._lock:
+            if time.monotonic() - self._ultima_sincronizacion < self.check_seconds:
+                return
+            result = await db.execute(
+                select(PreguntaBanco.id).where(PreguntaBanco.id > self._max_id - MARGEN_SINCRONIZACION)
+            )
+            nuevos = [pregunta_id for pregunta_id in result.scalars().all() if pregunta_id not in self._meta]
+            for inicio in range(0, len(nuevos), 1000):
+                result = await db.execute(
+                    select(
+                        PreguntaBanco.id, PreguntaBanco.embedding, PreguntaBanco.area, PreguntaBanco.grado_id,
+                        PreguntaBanco.desempeno_id, PreguntaBanco.nivel, PreguntaBanco.nivel_dificultad,
+                    ).where(PreguntaBanco.id.in_(nuevos[inicio:inicio + 1000]))
+                )
+                for fila in result.all():
+                    self._indexar(fila)
+            self._ultima_sincronizacion = time.monotonic()
+            if nuevos:
+                logger.info("Banco de preguntas: %d preguntas incorporadas al índice semántico", len(nuevos))
+
+    def _indexar(self, fila) -> None:
+        for indice, peso in fila.embedding or []:
+            posting = self._postings.get(indice)
+            if posting is None:
+                posting = self._postings[indice] = (array("l"), array("f"))
+            posting[0].append(fila.id)
+            posting[1].append(peso)
+        self._meta[fila.id] = (fila.area, fila.grado_id, fila.desempeno_id, fila.nivel, fila.nivel_dificultad)
+        self._max_id = max(self._max_id, fila.id)
+
+    @staticmethod
+    def _a_dict(fila: PreguntaBanco, puntaje: Optional[float] = None) -> dict:
+        return {
+            "id": fila.id,
+            "area": fila.area,
+            "examen_id": fila.examen_id,
+            "numero": fila.numero,
+            "grado_id": fila.grado_id,
+            "competencia_id": fila.competencia_id,
+            "desempeno_id": fila.desempeno_id,
+            "desempeno_codigo": fila.desempeno_codigo,
+            "nivel": fila.nivel,
+            "capacidad": fila.capacidad,
+            "nivel_dificultad": fila.nivel_dificultad,
+            "enunciado": fila.enunciado,
+            "opciones": fila.opciones,
+            "respuesta_correcta": fila.respuesta_correcta,
+            "justificacion": fila.justificacion,
+            "puntaje": puntaje,
+        }
+
+    # ──────────────────────────────────────────────
+    # Armado de exámenes
+    # ──────────────────────────────────────────────
+
+    async def armar_examen(
+        self,
+        db: AsyncSession,
+        area: str,
+        pregunta_ids: list[int],
+        titulo: Optional[str] = None
+    ) -> dict:
+        """
+        Arma un examen con preguntas del banco, en el orden indicado.
+
+        Incluye las lecturas (o situaciones) de los exámenes de origen y deriva
+        la tabla de respuestas. El resultado tiene la misma forma que el de
+        /generar, así que se guarda con los mismos endpoints.
+        """
+        if area not in AREAS_BANCO:
+            raise ValueError(f"Área no soportada: {area}")
+        pregunta_ids = list(dict.fromkeys(pregunta_ids))
+        if not pregunta_ids:
+            raise ValueError("Seleccione al menos una pregunta")
+
+        result = await db.execute(
+            select(PreguntaBanco).where(PreguntaBanco.id.in_(pregunta_ids), PreguntaBanco.area == area)
+        )
+        por_id = {fila.id: fila for fila in result.scalars().all()}
+        faltantes = [pregunta_id for pregunta_id in pregunta_ids if pregunta_id not in por_id]
+        if faltantes:
+            raise ValueError(f"Preguntas no encontradas en el banco de {area}: {faltantes}")
+        filas = [por_id[pregunta_id] for pregunta_id in pregunta_ids]
+
+        # Textos de origen, en el orden en que aparecen las preguntas
+        modelo = ExamenLectura if area == "lectosistem" else ExamenMatematica
+        columna_texto = modelo.lectura if area == "lectosistem" else modelo.situacion_problematica
+        origen_ids = list(dict.fromkeys(fila.examen_id for fila in filas))
+        result = await db.execute(
+            select(modelo.id, modelo.grado_nombre, columna_texto).where(modelo.id.in_(origen_ids))
+        )
+        origenes = {examen_id: (grado, texto) for examen_id, grado, texto in result.all()}
+        textos = [origenes[examen_id][1] for examen_id in origen_ids if origenes.get(examen_id, (None, None))[1]]
+        if len(textos) > 1:
+            etiqueta = "TEXTO" if area == "lectosistem" else "SITUACIÓN"
+            texto = "\n\n".join(f"{etiqueta} {n}\n{t}" for n, t in enumerate(textos, start=1))
+        else:
+            texto = textos[0] if textos else ""
+
+        curriculo = await curriculum_service.obtener(db)
+        desempenos_por_id = curriculo.desempenos_por_id if area == "lectosistem" else curriculo.desempenos_mat_por_id
+        desempenos = [desempenos_por_id[i] for i in dict.fromkeys(f.desempeno_id for f in filas) if i in desempenos_por_id]
+        grado = next((origenes[f.examen_id][0] for f in filas if origenes.get(f.examen_id, (None,))[0]), "")
+
+        preguntas = []
+        for numero, fila in enumerate(filas, start=1):
+            pregunta = {
+                "numero": numero,
+                "enunciado": fila.enunciado,
+                "opciones": [dict(opcion) for opcion in fila.opciones or []],
+                "desempeno_codigo": fila.desempeno_codigo or "",
+                "justificacion": fila.justificacion or "",
+                "banco_id": fila.id,
+            }
+            if area == "lectosistem":
+                pregunta["nivel"] = fila.nivel or ""
+            else:
+                pregunta["capacidad"] = fila.capacidad or ""
+            preguntas.append(pregunta)
+
+        descripcion_por_pregunta = {
+            fila.id: desempenos_por_id.get(fila.desempeno_id) for fila in filas
+        }
+
+        if area == "lectosistem":
+            examen = {
+                "titulo": titulo or "Evaluación de comprensión lectora",
+                "grado": grado,
+                "instrucciones": INSTRUCCIONES_LECTURA,
+                "lectura": texto,
+                "preguntas": preguntas,
+            }
+
+            def fila_tabla(pregunta: dict) -> dict:
+                desempeno = descripcion_por_pregunta.get(pregunta["banco_id"])
+                codigo = pregunta.get("desempeno_codigo", "")
+                return {
+                    "desempeno": f"({codigo}) {desempeno['descripcion']}" if desempeno else codigo,
+                    "nivel": pregunta.get("nivel", ""),
+                }
+
+            desempenos_usados = "\n".join(
+                f"{d['codigo']}. {d['descripcion']} ({d['capacidad_tipo'].upper() if d['capacidad_tipo'] else 'GENERAL'})"
+                for d in desempenos
+            )
+        else:
+            competencia = curriculo.get_competencia(filas[0].competencia_id) if filas[0].competencia_id else None
+            examen = {
+                "titulo": titulo or "Evaluación de matemática",
+                "grado": grado,
+                "competencia": competencia["nombre"] if competencia else "",
+                "instrucciones": INSTRUCCIONES_MATEMATICA,
+                "situacion_problematica": texto,
+                "preguntas": preguntas,
+            }
+
+            def fila_tabla(pregunta: dict) -> dict:
+                desempeno = descripcion_por_pregunta.get(pregunta["banco_id"])
+                return {
+                    "capacidad": desempeno["capacidad_nombre"] if desempeno else pregunta.get("capacidad", ""),
+                    "desempeno": desempeno["descripcion"] if desempeno else pregunta.get("desempeno_codigo", ""),
+                }
+
+            desempenos_usados = "\n".join(
+                f"{d['codigo']}. {d['descripcion']} (Cap: {d['capacidad_nombre']})" for d in desempenos
+            )
+
+        derivar_tabla(examen, fila_tabla)
+        resultado = {
+            "grado": grado,
+            "desempenos_usados": desempenos_usados,
+            "saludo": "",
+            "examen": examen,
+            "total_preguntas": len(preguntas),
+            "origen": "banco",
+        }
+        if area == "matsistem":
+            resultado["competencia"] = examen["competencia"]
+        return resultado
+
+    def stats(self) -> dict:
+        return {
+            "indexadas": len(self._meta),
+            "caracteristicas": len(self._postings),
+            "ingresadas": self._ingresadas,
+            "busquedas": dict(self._busquedas),
+        }
+
+
+# Singleton instance
+question_bank = QuestionBankService(check_seconds=settings.question_bank_check_seconds)
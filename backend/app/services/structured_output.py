@@ -0,0 +1,119 @@
+"""
+Salida estructurada de los proveedores de IA y parseo validado de respuestas.
+
+El esquema JSON de cada plantilla de prompt se genera a partir de su modelo
+Pydantic (app/models/examen_ia.py) y se adapta a lo que acepta cada proveedor:
+    - gemini:  response_schema (subconjunto de OpenAPI: sin $ref, sin
+               additionalProperties, sin valores por defecto)
+    - chatgpt: response_format json_schema en modo strict (todas las
+               propiedades requeridas y additionalProperties: false)
+
+Con el esquema, el proveedor devuelve JSON válido y el parseo es una sola
+llamada a model_validate_json. Si falla (respuestas antiguas en caché,
+bloques ```json, comas finales...) se recurre a clean_json_response.
+"""
+import copy
+import json
+import logging
+from functools import lru_cache
+from typing import Callable
+
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Claves del esquema JSON que acepta response_schema de Gemini
+CLAVES_GEMINI = {"type", "format", "description", "nullable", "enum", "items", "properties", "required"}
+
+
+def _resolver_referencias(esquema: dict, definiciones: dict) -> dict:
+    """Copia del esquema con los $ref reemplazados por su definición."""
+    if "$ref" in esquema:
+        return _resolver_referencias(definiciones[esquema["$ref"].split("/")[-1]], definiciones)
+    resultado = {}
+    for clave, valor in esquema.items():
+        if clave == "properties":
+            valor = {nombre: _resolver_referencias(v, definiciones) for nombre, v in valor.items()}
+        elif clave == "items":
+            valor = _resolver_referencias(valor, definiciones)
+        resultado[clave] = valor
+    return resultado
+
+
+def _adaptar(esquema: dict, proveedor: str) -> dict:
+    """Ajusta un esquema sin $ref al formato del proveedor (recursivo)."""
+    if proveedor == "gemini":
+        resultado = {clave: valor for clave, valor in esquema.items() if clave in CLAVES_GEMINI}
+        if "enum" in resultado:
+            resultado["format"] = "enum"  # Gemini exige format=enum en cadenas enumeradas
+    else:
+        resultado = {clave: valor for clave, valor in esquema.items() if clave not in ("title", "default")}
+
+    if "properties" in esquema:
+        resultado["properties"] = {
+            nombre: _adaptar(valor, proveedor) for nombre, valor in esquema["properties"].items()
+        }
+        # Con salida estructurada el modelo siempre entrega todos los campos
+        resultado["required"] = list(esquema["properties"])
+        if proveedor == "chatgpt":
+            resultado["additionalProperties"] = False
+    if "items" in esquema:
+        resultado["items"] = _adaptar(esquema["items"], proveedor)
+    return resultado
+
+
+@lru_cache(maxsize=None)
+def _esquema(modelo: type[BaseModel], proveedor: str) -> dict:
+    completo = modelo.model_json_schema()
+    definiciones = completo.pop("$defs", {})
+    return _adaptar(_resolver_referencias(completo, definiciones), proveedor)
+
+
+class StructuredOutputService:
+    """Esquemas por proveedor y parseo validado con métricas."""
+
+    def __init__(self):
+        self.directas = 0
+        self.recuperadas = 0
+        self.fallidas = 0
+
+    def esquema(self, modelo: type[BaseModel], proveedor: str) -> dict:
+        """Esquema JSON del modelo para el proveedor (calculado una vez por modelo)."""
+        return copy.deepcopy(_esquema(modelo, proveedor))
+
+    def parsear(
+        self,
+        texto: str,
+        modelo: type[BaseModel],
+        limpiar: Callable[[str], str]
+    ) -> dict:
+        """
+        Valida la respuesta contra el modelo y la devuelve como dict.
+
+        Args:
+            limpiar: recuperación de JSON para respuestas no estructuradas
+                     (AIService.clean_json_response)
+        """
+        try:
+            datos = modelo.model_validate_json(texto)
+            self.directas += 1
+        except ValidationError:
+            try:
+                datos = modelo.model_validate(json.loads(limpiar(texto)))
+            except (json.JSONDecodeError, ValidationError, TypeError) as e:
+                self.fallidas += 1
+                logger.warning("Respuesta de la IA no válida para %s: %s | %.500s", modelo.__name__, e, texto)
+                raise ValueError(f"La respuesta no cumple el formato esperado: {e}")
+            self.recuperadas += 1
+        return datos.model_dump()
+
+    def stats(self) -> dict:
+        return {
+            "respuestas_directas": self.directas,
+            "respuestas_recuperadas": self.recuperadas,
+            "respuestas_invalidas": self.fallidas,
+        }
+
+
+# Singleton instance
+structured_output = StructuredOutputService()
@@ -0,0 +1,69 @@
+"""
+Incorpora al banco de preguntas (migración 6) las preguntas de los exámenes
+guardados antes de que existiera. Los exámenes ya ingresados se omiten, así
+que se puede ejecutar varias veces.
+
+Ejecutar desde el directorio backend (usa DATABASE_URL):
+    python -m scripts.backfill_banco_preguntas
+    python -m scripts.backfill_banco_preguntas --area lectosistem --lote 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.db_models import ExamenLectura, ExamenMatematica, PreguntaBanco
+from app.models.docente import Docente  # noqa: F401 (registra el modelo referenciado por los exámenes)
+from app.services.question_bank import AREAS_BANCO, question_bank
+
+MODELOS = {"lectosistem": ExamenLectura, "matsistem": ExamenMatematica}
+
+
+async def backfill_area(area: str, lote: int) -> tuple[int, int]:
+    """Recorre los exámenes del área por id, de a `lote`, en transacciones cortas."""
+    modelo = MODELOS[area]
+    ultimo_id = 0
+    examenes_total = preguntas_total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ingresados = select(PreguntaBanco.examen_id).where(PreguntaBanco.area == area)
+            result = await db.execute(
+                select(modelo)
+                .where(modelo.id > ultimo_id, modelo.id.not_in(ingresados))
+                .order_by(modelo.id)
+                .limit(lote)
+            )
+            examenes = result.scalars().all()
+            if not examenes:
+                break
+            ultimo_id = examenes[-1].id
+            preguntas_total += await question_bank.agregar_examenes(db, area, examenes)
+            await db.commit()
+            examenes_total += len(examenes)
+        print(f"  {area}: {examenes_total} exámenes, {preguntas_total} preguntas (hasta id {ultimo_id})")
+    return examenes_total, preguntas_total
+
+
+async def main(areas: list[str], lote: int) -> None:
+    print(f"Base de datos: {engine.url.render_as_string(hide_password=True)}")
+    inicio = time.perf_counter()
+    for area in areas:
+        examenes, preguntas = await backfill_area(area, lote)
+        print(f"{area}: {examenes} exámenes revisados, {preguntas} preguntas agregadas al banco")
+    print(f"Tiempo: {time.perf_counter() - inicio:.1f} s")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill del banco de preguntas")
+    parser.add_argument("--area", choices=AREAS_BANCO, help="Solo un área (por defecto, ambas)")
+    parser.add_argument("--lote", type=int, default=500, help="Exámenes por transacción")
+    args = parser.parse_args()
+    asyncio.run(main([args.area] if args.area else list(AREAS_BANCO), args.lote))
@@ -0,0 +1,125 @@
+"""
+Mide la latencia de lectura del currículo de matemática.
+
+Compara, para cada par grado × competencia:
+    - legado:     las cinco consultas que hacía get_curriculo_completo
+                  (grado, competencia, estándar, capacidades y desempeños
+                  con dos selectinload)
+    - carga:      la carga completa de la instantánea (tres consultas con JOIN)
+    - memoria:    la consulta a la instantánea ya cargada (sin BD)
+
+Ejecutar desde el directorio backend (usa DATABASE_URL):
+    python -m scripts.benchmark_curriculo
+    python -m scripts.benchmark_curriculo --repeticiones 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.db_models import (
+    Grado,
+    CompetenciaMatematica,
+    CapacidadMatematica,
+    EstandarMatematica,
+    DesempenoMatematica
+)
+from app.models.docente import Docente  # noqa: F401  (registra el mapper de las relaciones)
+from app.services.curriculum_service import curriculum_service
+
+
+async def curriculo_legado(db, grado_id: int, competencia_id: int) -> dict:
+    """Réplica de la implementación anterior de get_curriculo_completo."""
+    grado = (await db.execute(select(Grado).where(Grado.id == grado_id))).scalars().first()
+    competencia = (await db.execute(
+        select(CompetenciaMatematica).where(CompetenciaMatematica.id == competencia_id)
+    )).scalars().first()
+    estandar = (await db.execute(select(EstandarMatematica).where(
+        EstandarMatematica.grado_id == grado_id,
+        EstandarMatematica.competencia_id == competencia_id
+    ))).scalars().first()
+    capacidades = (await db.execute(
+        select(CapacidadMatematica)
+        .where(CapacidadMatematica.competencia_id == competencia_id)
+        .order_by(CapacidadMatematica.orden)
+    )).scalars().all()
+    desempenos = (await db.execute(
+        select(DesempenoMatematica)
+        .options(selectinload(DesempenoMatematica.capacidad).selectinload(CapacidadMatematica.competencia))
+        .where(DesempenoMatematica.grado_id == grado_id)
+        .join(CapacidadMatematica)
+        .where(CapacidadMatematica.competencia_id == competencia_id)
+        .order_by(DesempenoMatematica.codigo)
+    )).scalars().all()
+    return {
+        "grado": grado,
+        "competencia": competencia,
+        "estandar": estandar,
+        "capacidades": capacidades,
+        "desempenos": desempenos,
+    }
+
+
+def resumen(nombre: str, tiempos: list[float]) -> str:
+    ordenados = sorted(tiempos)
+    p95 = ordenados[min(len(ordenados) - 1, int(0.95 * len(ordenados)))]
+    return (
+        f"{nombre:<10} n={len(tiempos):<5} "
+        f"mediana={statistics.median(tiempos) * 1000:8.3f} ms  "
+        f"p95={p95 * 1000:8.3f} ms"
+    )
+
+
+async def medir(repeticiones: int) -> None:
+    async with AsyncSessionLocal() as db:
+        snapshot = await curriculum_service.cargar(db)
+        pares = [(g["id"], c["id"]) for g in snapshot.grados for c in snapshot.competencias]
+        if not pares:
+            print("No hay datos de currículo en la base de datos.")
+            return
+
+        legado, carga, memoria = [], [], []
+        for _ in range(repeticiones):
+            for grado_id, competencia_id in pares:
+                inicio = time.perf_counter()
+                await curriculo_legado(db, grado_id, competencia_id)
+                legado.append(time.perf_counter() - inicio)
+                db.expunge_all()
+
+            inicio = time.perf_counter()
+            await curriculum_service.cargar(db)
+            carga.append(time.perf_counter() - inicio)
+            db.expunge_all()
+
+            snapshot = await curriculum_service.obtener(db)
+            for grado_id, competencia_id in pares:
+                inicio = time.perf_counter()
+                snapshot.get_curriculo_matematica(grado_id, competencia_id)
+                memoria.append(time.perf_counter() - inicio)
+
+    print(f"Base de datos: {engine.url.render_as_string(hide_password=True)}")
+    print(f"Pares grado × competencia: {len(pares)}")
+    print(resumen("legado", legado))
+    print(resumen("carga", carga))
+    print(resumen("memoria", memoria))
+    print(
+        f"Currículo completo de {len(pares)} pares: "
+        f"legado ≈ {sum(legado) / repeticiones * 1000:.1f} ms vs "
+        f"una carga ≈ {statistics.median(carga) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de lectura del currículo")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(medir(args.repeticiones))
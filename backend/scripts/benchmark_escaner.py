@@ -0,0 +1,121 @@
+"""
+Micro-benchmark del escáner de amenazas de PDF (tiempo por MB).
+
+Compara sobre cada archivo del corpus:
+    - legado:   un re.search por patrón sobre todo el contenido (10 pasadas)
+    - pasada:   EscanerAmenazas.buscar, una alternancia en una sola pasada
+    - bloques:  EscanerAmenazas.buscar_en_flujo leyendo el archivo por bloques
+
+Ejecutar desde el directorio backend:
+    python -m scripts.benchmark_escaner --corpus /ruta/a/pdfs_docentes
+    python -m scripts.benchmark_escaner            # corpus sintético
+
+Sin --corpus se generan PDFs sintéticos con texto e imágenes; los tiempos
+por MB dependen del contenido, así que conviene medir con PDFs reales.
+"""
+
+import argparse
+import glob
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+
+from app.services.file_service import PDF_DANGEROUS_PATTERNS, PDF_SCANNER
+
+
+def escanear_legado(contenido: bytes):
+    for patron in PDF_DANGEROUS_PATTERNS:
+        if re.search(patron, contenido, re.IGNORECASE):
+            return patron
+    return None
+
+
+def generar_corpus(directorio: str, archivos: int) -> list[str]:
+    rutas = []
+    parrafo = "Lee el texto y responde las preguntas sobre la comprensión del mismo. " * 10
+    for numero in range(archivos):
+        doc = fitz.open()
+        for pagina_num in range(10 + numero * 10):
+            pagina = doc.new_page()
+            pagina.insert_textbox(fitz.Rect(40, 40, 560, 500), parrafo, fontsize=9)
+            if pagina_num % 3 == 0:
+                lado = 300
+                desfase = random.randint(0, 255)
+                muestras = bytes(
+                    (x * y // 7 + desfase + c * 40) % 256
+                    for y in range(lado) for x in range(lado) for c in range(3)
+                )
+                imagen = fitz.Pixmap(fitz.csRGB, lado, lado, muestras, 0)
+                pagina.insert_image(fitz.Rect(40, 520, 340, 800), pixmap=imagen)
+        ruta = os.path.join(directorio, f"sintetico_{numero + 1}.pdf")
+        doc.save(ruta, deflate=True)
+        doc.close()
+        rutas.append(ruta)
+    return rutas
+
+
+def cronometrar(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory() as temporal:
+        if args.corpus:
+            rutas = sorted(glob.glob(os.path.join(args.corpus, "**", "*.pdf"), recursive=True))
+        else:
+            rutas = generar_corpus(temporal, args.sinteticos)
+        if not rutas:
+            print("No se encontraron PDFs en el corpus.")
+            return
+
+        totales = {"legado": 0.0, "pasada": 0.0, "bloques": 0.0}
+        megas_total = 0.0
+        print(f"{'archivo':<32} {'MB':>6} {'legado':>11} {'pasada':>11} {'bloques':>11}  detectado")
+        for ruta in rutas:
+            with open(ruta, "rb") as f:
+                contenido = f.read()
+            megas = len(contenido) / (1024 * 1024)
+            megas_total += megas
+
+            def por_bloques():
+                with open(ruta, "rb") as f:
+                    return PDF_SCANNER.buscar_en_flujo(f)
+
+            tiempos = {
+                "legado": cronometrar(lambda: escanear_legado(contenido), args.repeticiones),
+                "pasada": cronometrar(lambda: PDF_SCANNER.buscar(contenido), args.repeticiones),
+                "bloques": cronometrar(por_bloques, args.repeticiones),
+            }
+            for clave, valor in tiempos.items():
+                totales[clave] += valor
+            por_mb = {k: v * 1000 / max(megas, 1e-9) for k, v in tiempos.items()}
+            print(
+                f"{os.path.basename(ruta)[:32]:<32} {megas:6.2f} "
+                f"{por_mb['legado']:8.2f} ms {por_mb['pasada']:8.2f} ms {por_mb['bloques']:8.2f} ms  "
+                f"{(PDF_SCANNER.buscar(contenido) or ('-',))[0]}"
+            )
+
+        print(f"\nTotal {len(rutas)} archivos, {megas_total:.1f} MB (ms por MB):")
+        for clave, valor in totales.items():
+            print(f"    {clave:<8} {valor * 1000 / megas_total:8.2f} ms/MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del escáner de amenazas")
+    parser.add_argument("--corpus", help="Directorio con PDFs reales (se busca recursivamente)")
+    parser.add_argument("--sinteticos", type=int, default=5, help="PDFs sintéticos si no hay corpus")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    main(parser.parse_args())
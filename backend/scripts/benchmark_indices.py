@@ -0,0 +1,207 @@
+"""
+Compara los planes de ejecución de las consultas frecuentes con y sin los
+índices de la migración 3 (indices_filtros_frecuentes).
+
+Todo ocurre dentro de una transacción que se revierte al final: los datos
+sintéticos (--examenes) y el borrado temporal de los índices no dejan rastro.
+
+    - PostgreSQL: EXPLAIN (ANALYZE, BUFFERS); se informa el tipo de scan por tabla
+    - SQLite:     EXPLAIN QUERY PLAN (SCAN = recorrido completo, SEARCH = índice)
+
+Ejecutar desde el directorio backend (usa DATABASE_URL):
+    python -m scripts.benchmark_indices
+    python -m scripts.benchmark_indices --examenes 50000 --docentes 500 --plan
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+
+from app.core.database import engine
+from app.core.migrations import INDICES_FILTROS
+from app.models.db_models import ExamenLectura, ExamenMatematica
+from app.models.docente import Docente
+
+CONSULTAS = [
+    (
+        "historial_lectura",
+        "SELECT id, docente_id, grado_id, fecha_creacion, titulo, grado_nombre, "
+        "nivel_dificultad, modelo_ia, total_preguntas FROM examenes_lectura "
+        "WHERE docente_id = :docente_id ORDER BY fecha_creacion DESC, id DESC LIMIT 51",
+    ),
+    (
+        "historial_matematica",
+        "SELECT id, docente_id, grado_id, competencia_id, fecha_creacion, titulo, grado_nombre, "
+        "nivel_dificultad, modelo_ia, total_preguntas FROM examenes_matematica "
+        "WHERE docente_id = :docente_id ORDER BY fecha_creacion DESC, id DESC LIMIT 51",
+    ),
+    (
+        "desempenos_lectura",
+        "SELECT d.id, d.codigo FROM desempenos d JOIN capacidades c ON c.id = d.capacidad_id "
+        "WHERE d.grado_id = :grado_id AND c.tipo = :tipo",
+    ),
+    (
+        "desempenos_matematica",
+        "SELECT id, codigo FROM desempenos_matematica "
+        "WHERE grado_id = :grado_id AND capacidad_id = :capacidad_mat_id",
+    ),
+    (
+        "estandar_matematica",
+        "SELECT id FROM estandares_matematica "
+        "WHERE grado_id = :grado_id AND competencia_id = :competencia_id",
+    ),
+]
+
+PATRON_SCAN_PG = re.compile(r"(Seq Scan|Index Only Scan|Index Scan|Bitmap Heap Scan) on (\w+)")
+
+
+def sembrar(conn, examenes: int, docentes: int) -> None:
+    """Inserta docentes y exámenes sintéticos (se revierten al final)."""
+    base = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM docentes")).scalar()
+    ids = list(range(base + 1, base + docentes + 1))
+    conn.execute(insert(Docente.__table__), [
+        {"id": i, "dni": f"B{i % 10_000_000:07d}", "password_hash": "-"} for i in ids
+    ])
+
+    ahora = datetime.now(timezone.utc)
+    lectura = "Texto de lectura sintético. " * 80
+    for modelo in (ExamenLectura, ExamenMatematica):
+        filas = []
+        for _ in range(examenes):
+            fila = {
+                "docente_id": random.choice(ids),
+                "fecha_creacion": ahora - timedelta(seconds=random.randint(0, 365 * 24 * 3600)),
+                "titulo": "Examen sintético",
+                "preguntas": [{"numero": n} for n in range(10)],
+                "total_preguntas": 10,
+            }
+            if modelo is ExamenLectura:
+                fila["lectura"] = lectura
+            else:
+                fila["situacion_problematica"] = lectura
+            filas.append(fila)
+        for inicio in range(0, len(filas), 5000):
+            conn.execute(insert(modelo.__table__), filas[inicio:inicio + 5000])
+
+
+def parametros(conn, docente_id: int | None) -> dict:
+    """Elige valores reales para los filtros de las consultas."""
+    def primero(sql: str, defecto):
+        valor = conn.execute(text(sql)).first()
+        return valor if valor is not None else defecto
+
+    if docente_id is None:
+        docente_id = primero(
+            "SELECT docente_id FROM examenes_lectura GROUP BY docente_id "
+            "ORDER BY COUNT(*) DESC LIMIT 1", (1,)
+        )[0]
+    grado_id, capacidad_mat_id = primero(
+        "SELECT grado_id, capacidad_id FROM desempenos_matematica LIMIT 1", (1, 1)
+    )
+    competencia_id = primero("SELECT competencia_id FROM estandares_matematica LIMIT 1", (1,))[0]
+    return {
+        "docente_id": docente_id,
+        "grado_id": grado_id,
+        "capacidad_mat_id": capacidad_mat_id,
+        "competencia_id": competencia_id,
+        "tipo": "inferencial",
+    }
+
+
+def explicar(conn, sql: str, params: dict) -> tuple[list[str], str]:
+    """Devuelve (líneas del plan, resumen de scans por tabla)."""
+    if conn.dialect.name == "postgresql":
+        lineas = [r[0] for r in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)]
+        scans = [f"{tipo} {tabla}" for tipo, tabla in PATRON_SCAN_PG.findall("\n".join(lineas))]
+    else:
+        lineas = [r[-1] for r in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+        scans = [linea for linea in lineas if linea.startswith(("SCAN", "SEARCH"))]
+    return lineas, "; ".join(scans)
+
+
+def cronometrar(conn, sql: str, params: dict, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conn.execute(text(sql), params).all()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def medir_escenario(conn, params: dict, repeticiones: int, mostrar_plan: bool) -> dict:
+    conn.execute(text("ANALYZE"))
+    resultados = {}
+    for nombre, sql in CONSULTAS:
+        lineas, scans = explicar(conn, sql, params)
+        resultados[nombre] = (scans, cronometrar(conn, sql, params, repeticiones))
+        if mostrar_plan:
+            print(f"\n--- {nombre} ---")
+            print("\n".join(lineas))
+    return resultados
+
+
+def medir(conn, args) -> None:
+    if args.examenes:
+        sembrar(conn, args.examenes, args.docentes)
+    params = parametros(conn, args.docente_id)
+
+    # Sin índices (se eliminan dentro de un savepoint y se restauran al revertirlo)
+    savepoint = conn.begin_nested()
+    for nombre, _, _ in INDICES_FILTROS:
+        conn.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
+    if args.plan:
+        print("\n===== SIN ÍNDICES =====")
+    sin_indices = medir_escenario(conn, params, args.repeticiones, args.plan)
+    savepoint.rollback()
+
+    # Con índices (se crean si la migración aún no se aplicó)
+    for nombre, tabla, columnas in INDICES_FILTROS:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"))
+    if args.plan:
+        print("\n===== CON ÍNDICES =====")
+    con_indices = medir_escenario(conn, params, args.repeticiones, args.plan)
+
+    conteo = {
+        t: conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar()
+        for t in ("examenes_lectura", "examenes_matematica", "desempenos", "desempenos_matematica")
+    }
+    print(f"\nBase de datos: {engine.url.render_as_string(hide_password=True)}")
+    print("Filas: " + ", ".join(f"{t}={n}" for t, n in conteo.items()))
+    print(f"Parámetros: {params}\n")
+    for nombre, _ in CONSULTAS:
+        plan_sin, ms_sin = sin_indices[nombre]
+        plan_con, ms_con = con_indices[nombre]
+        print(f"{nombre}")
+        print(f"    sin índices  {ms_sin:9.3f} ms   {plan_sin}")
+        print(f"    con índices  {ms_con:9.3f} ms   {plan_con}")
+
+
+async def main(args) -> None:
+    async with engine.connect() as conn:
+        transaccion = await conn.begin()
+        try:
+            await conn.run_sync(medir, args)
+        finally:
+            await transaccion.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de índices (EXPLAIN ANALYZE)")
+    parser.add_argument("--examenes", type=int, default=20000,
+                        help="Exámenes sintéticos por tabla (0 para usar solo los datos existentes)")
+    parser.add_argument("--docentes", type=int, default=200, help="Docentes sintéticos")
+    parser.add_argument("--docente-id", type=int, default=None, help="Docente a consultar")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--plan", action="store_true", help="Mostrar los planes completos")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Latencia de generación según el tamaño del prompt, con y sin presupuesto
+de tokens, para ambos proveedores.
+
+No llama a las APIs: generate_content de cada proveedor se reemplaza por un
+stub local cuya latencia crece con los tokens de entrada (prefill) y de
+salida, con parámetros ajustables por proveedor. La llamada pasa por el
+resto del camino real (AIService.generate, limitador de cuotas, conteo de
+tokens y recorte del texto base).
+
+Ejecutar desde el directorio backend:
+    python -m scripts.benchmark_prompt_tokens
+    python -m scripts.benchmark_prompt_tokens --palabras 500 4000 30000 --repeticiones 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chatgpt_service import chatgpt_service
+from app.services.gemini_service import gemini_service
+from app.services.lectosistem_service import lectosistem_service
+from app.services.prompt_budget import construir_con_presupuesto, contar_tokens
+
+SERVICIOS = {"gemini": gemini_service, "chatgpt": chatgpt_service}
+
+PARRAFO = (
+    "En la comunidad de Huaylas, los niños ayudaban a sus abuelos en la cosecha de papa. "
+    "Cada mañana subían a la chacra antes de que saliera el sol. "
+    "La abuela Rosa les contaba historias sobre el apu que cuidaba el valle. "
+    "Al mediodía compartían la merienda bajo un molle y hablaban de la escuela. "
+)
+DESEMPENOS = "\n".join(
+    f"0{n}. Obtiene información explícita y relevante del texto ({nivel})"
+    for n, nivel in enumerate(["LITERAL", "INFERENCIAL", "CRÍTICO"], start=1)
+)
+
+
+def texto_de(palabras: int) -> str:
+    parrafos = []
+    while sum(len(p.split()) for p in parrafos) < palabras:
+        parrafos.append(PARRAFO)
+    return "\n\n".join(parrafos)
+
+
+def construir(texto):
+    return lectosistem_service._build_prompt_desempenos(
+        grado_nombre="5to Primaria", desempenos_texto=DESEMPENOS, cantidad=5, texto_base=texto
+    )
+
+
+def instalar_stub(proveedor: str, args) -> None:
+    """Reemplaza la llamada a la API por una espera proporcional a los tokens."""
+    servicio = SERVICIOS[proveedor]
+    prefill = getattr(args, f"prefill_{proveedor}")
+
+    async def generate_content(prompt: str) -> str:
+        entrada = contar_tokens(prompt, proveedor)
+        await asyncio.sleep(args.latencia_base + entrada / prefill + args.tokens_salida / args.decodificacion)
+        return '{"saludo": "", "examen": {"preguntas": []}}'
+
+    servicio.generate_content = generate_content
+    servicio.is_configured = lambda: True
+
+
+async def medir(servicio, prompt: str, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await servicio.generate(prompt, cache="bypass")
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+async def main(args) -> None:
+    print(
+        f"Stub: base {args.latencia_base * 1000:.0f} ms, prefill gemini {args.prefill_gemini:.0f} tok/s, "
+        f"prefill chatgpt {args.prefill_chatgpt:.0f} tok/s, salida {args.tokens_salida} tokens "
+        f"a {args.decodificacion:.0f} tok/s\n"
+    )
+    for proveedor, servicio in SERVICIOS.items():
+        instalar_stub(proveedor, args)
+        print(f"== {proveedor} ==")
+        print(f"{'palabras':>9} {'tokens sin':>11} {'ms sin':>9} {'tokens con':>11} {'ms con':>9} {'recorte':>9}")
+        for palabras in args.palabras:
+            texto = texto_de(palabras)
+            sin_presupuesto = construir(texto).texto
+
+            inicio = time.perf_counter()
+            con_presupuesto, reporte = construir_con_presupuesto(construir, texto, proveedor)
+            costo_recorte = (time.perf_counter() - inicio) * 1000
+
+            ms_sin = await medir(servicio, sin_presupuesto, args.repeticiones)
+            ms_con = await medir(servicio, con_presupuesto.texto, args.repeticiones)
+            print(
+                f"{palabras:>9} {contar_tokens(sin_presupuesto, proveedor):>11} {ms_sin:>9.1f} "
+                f"{reporte['prompt']:>11} {ms_con + costo_recorte:>9.1f} {costo_recorte:>6.1f} ms"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia según tamaño del prompt (stub local)")
+    parser.add_argument("--palabras", type=int, nargs="+", default=[300, 2000, 8000, 30000, 100000],
+                        help="Tamaños del texto base en palabras")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--latencia-base", type=float, default=0.3, help="Segundos fijos por llamada")
+    parser.add_argument("--prefill-gemini", type=float, default=20000, help="Tokens de entrada por segundo")
+    parser.add_argument("--prefill-chatgpt", type=float, default=12000, help="Tokens de entrada por segundo")
+    parser.add_argument("--tokens-salida", type=int, default=200)
+    parser.add_argument("--decodificacion", type=float, default=200, help="Tokens de salida por segundo")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Mide la latencia del event loop mientras se procesan subidas concurrentes.
+
+Compara:
+    - en_loop: escaneo y extracción ejecutados en el event loop
+               (comportamiento anterior de extract_text_from_file)
+    - pool:    extract_text_from_file actual (pool de procesos)
+
+Mientras tanto, una corrutina "latido" duerme 5 ms en bucle y registra
+cuánto se retrasa cada despertar: ese retraso es lo que sufren todas las
+demás peticiones del worker.
+
+Ejecutar desde el directorio backend:
+    python -m scripts.benchmark_subida_archivos
+    python -m scripts.benchmark_subida_archivos --paginas 300 --archivos 5
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from fastapi import UploadFile
+
+from app.services import file_service
+from app.services.process_pool import process_pool
+
+INTERVALO_LATIDO = 0.005
+
+
+def generar_pdf(paginas: int) -> bytes:
+    doc = fitz.open()
+    parrafo = "La comprensión lectora se evalúa con textos de distintos tipos y formatos. " * 6
+    for numero in range(paginas):
+        pagina = doc.new_page()
+        pagina.insert_textbox(fitz.Rect(40, 40, 560, 800), f"Página {numero + 1}\n" + parrafo * 8, fontsize=9)
+    contenido = doc.tobytes()
+    doc.close()
+    return contenido
+
+
+async def latido(retrasos: list[float], fin: asyncio.Event) -> None:
+    while not fin.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(INTERVALO_LATIDO)
+        retrasos.append(time.perf_counter() - inicio - INTERVALO_LATIDO)
+
+
+async def en_loop(contenido: bytes, extension: str) -> None:
+    # Réplica del comportamiento anterior: todo síncrono dentro de la corrutina
+    await asyncio.sleep(0)
+    file_service.validate_magic_bytes(contenido, extension)
+    file_service.procesar_documento(contenido, extension)
+
+
+async def con_pool(contenido: bytes, extension: str) -> None:
+    archivo = UploadFile(file=io.BytesIO(contenido), filename=f"prueba.{extension}")
+    await file_service.extract_text_from_file(archivo)
+
+
+async def escenario(nombre: str, procesar, archivos: list[tuple[bytes, str]]) -> None:
+    retrasos: list[float] = []
+    fin = asyncio.Event()
+    monitor = asyncio.create_task(latido(retrasos, fin))
+    await asyncio.sleep(0.05)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(procesar(contenido, extension) for contenido, extension in archivos))
+    total = time.perf_counter() - inicio
+
+    fin.set()
+    await monitor
+    ordenados = sorted(retrasos)
+    p99 = ordenados[min(len(ordenados) - 1, int(0.99 * len(ordenados)))]
+    print(
+        f"{nombre:<8} total={total * 1000:8.1f} ms  latidos={len(retrasos):<5} "
+        f"retraso mediana={statistics.median(retrasos) * 1000:7.2f} ms  "
+        f"p99={p99 * 1000:8.2f} ms  máx={ordenados[-1] * 1000:8.2f} ms"
+    )
+
+
+async def main(args) -> None:
+    pdf = generar_pdf(args.paginas)
+    archivos = [(pdf, "pdf")] * args.archivos
+    print(
+        f"{args.archivos} PDF concurrentes de {len(pdf) / 1024:.0f} KB ({args.paginas} páginas), "
+        f"{process_pool.max_workers} procesos en el pool"
+    )
+
+    # Calentar el pool para no medir el arranque de los procesos
+    await asyncio.gather(*(con_pool(pdf, "pdf") for _ in range(process_pool.max_workers)))
+
+    await escenario("en_loop", en_loop, archivos)
+    await escenario("pool", con_pool, archivos)
+    process_pool.cerrar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del event loop con subidas concurrentes")
+    parser.add_argument("--paginas", type=int, default=150, help="Páginas del PDF sintético")
+    parser.add_argument("--archivos", type=int, default=4, help="Archivos procesados a la vez")
+    asyncio.run(main(parser.parse_args()))
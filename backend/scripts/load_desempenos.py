@@ -13,6 +13,8 @@ import pandas as pd
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.database import Base
+from app.models.docente import Docente  # noqa: F401 (registra la tabla referenciada por los exámenes)
+from app.services.curriculum_service import incrementar_version_curriculo
 from app.models.db_models import Grado, Capacidad, Desempeno
 
 # Motor síncrono para el script de carga
@@ -192,6 +194,8 @@ def load_desempenos():
                     )
                     db.add(desempeno)
         
+        # Los workers en ejecución recargan el currículo (misma transacción que los datos)
+        incrementar_version_curriculo(db)
         db.commit()
         
         # Estadísticas
@@ -23,6 +23,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.database import Base
+from app.models.docente import Docente  # noqa: F401 (registra la tabla referenciada por los exámenes)
+from app.services.curriculum_service import incrementar_version_curriculo
 from app.models.db_models import (
     Grado,
     CompetenciaMatematica,
@@ -427,6 +429,8 @@ def load_matematica_data():
                     )
                     db.add(desempeno)
         
+        # Los workers en ejecución recargan el currículo (misma transacción que los datos)
+        incrementar_version_curriculo(db)
         db.commit()
         
         # 5. Estadísticas finales
@@ -0,0 +1,36 @@
+"""
+Aplica las migraciones de esquema pendientes (las mismas que init_db al arrancar).
+
+Ejecutar desde el directorio backend (usa DATABASE_URL):
+    python -m scripts.migrar            # aplica las pendientes
+    python -m scripts.migrar --estado   # solo muestra el estado
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine
+from app.core.migrations import aplicar_migraciones, estado_migraciones
+
+
+async def main(solo_estado: bool) -> None:
+    print(f"Base de datos: {engine.url.render_as_string(hide_password=True)}")
+    async with engine.begin() as conn:
+        if not solo_estado:
+            nuevas = await conn.run_sync(aplicar_migraciones)
+            print(f"Migraciones aplicadas: {nuevas or 'ninguna'}")
+        for m in await conn.run_sync(estado_migraciones):
+            marca = "x" if m["aplicada"] else " "
+            print(f"  [{marca}] {m['version']:>3}  {m['nombre']}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones de esquema")
+    parser.add_argument("--estado", action="store_true", help="Mostrar el estado sin aplicar nada")
+    args = parser.parse_args()
+    asyncio.run(main(args.estado))
@@ -2,7 +2,7 @@
 """
 Script para migrar datos de SQLite (desempenos.db) a PostgreSQL.
 
-Primero crea todas las tablas en PostgreSQL (usando SQLAlchemy),
+Primero crea todas las tablas en PostgreSQL (aplicando las migraciones),
 luego migra los datos del SQLite existente con reconexión automática.
 
 Uso:
@@ -46,11 +46,11 @@ async def create_tables():
         ExamenLectura, ExamenMatematica
     )
     from app.models.docente import Docente
-    from app.core.database import Base
+    from app.core.migrations import aplicar_migraciones
 
     engine = create_async_engine(DATABASE_URL, echo=False)
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(aplicar_migraciones)
     await engine.dispose()
     print("  ✅ Tablas creadas correctamente.\n")
 
@@ -0,0 +1,154 @@
+"""
+Concurrencia adaptativa (AIMD) del limitador de proveedores de IA.
+
+Ejecutar desde el directorio backend:
+    python -m unittest tests.test_ai_rate_limiter
+"""
+import asyncio
+import unittest
+
+from app.services.ai_rate_limiter import ProviderLimiter, ProviderOverloadedError
+
+
+def _limitador() -> ProviderLimiter:
+    limiter = ProviderLimiter(
+        nombre="prueba",
+        rpm=1000,
+        tpm=1_000_000,
+        max_concurrencia=4,
+        max_reintentos=0,
+        backoff_segundos=0.0,
+        timeout_cola=5.0
+    )
+    limiter.limite = 2.0
+    return limiter
+
+
+class LiberacionNeutralTest(unittest.TestCase):
+
+    def test_llamada_cancelada_no_cambia_el_limite(self):
+        async def escenario():
+            limiter = _limitador()
+
+            async def lenta():
+                await asyncio.sleep(10)
+                return "{}"
+
+            tarea = asyncio.create_task(limiter.ejecutar(lenta, "prompt"))
+            await asyncio.sleep(0.01)
+            tarea.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+            return limiter
+
+        limiter = asyncio.run(escenario())
+        self.assertEqual(limiter.limite, 2.0)
+        self.assertEqual(limiter.completadas, 0)
+        self.assertEqual(limiter.en_curso, 0)
+
+    def test_error_ajeno_a_la_carga_no_cambia_el_limite(self):
+        async def escenario():
+            limiter = _limitador()
+
+            async def bloqueada():
+                raise ValueError("Respuesta bloqueada por filtros de seguridad")
+
+            with self.assertRaises(ValueError):
+                await limiter.ejecutar(bloqueada, "prompt")
+            return limiter
+
+        limiter = asyncio.run(escenario())
+        self.assertEqual(limiter.limite, 2.0)
+        self.assertEqual(limiter.completadas, 0)
+        self.assertEqual(limiter.en_curso, 0)
+
+    def test_streaming_cancelado_o_con_error_no_cambia_el_limite(self):
+        async def escenario():
+            limiter = _limitador()
+
+            async def stream_cancelado():
+                async with limiter.reservar("prompt"):
+                    await asyncio.sleep(10)
+
+            tarea = asyncio.create_task(stream_cancelado())
+            await asyncio.sleep(0.01)
+            tarea.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+
+            with self.assertRaises(ConnectionError):
+                async with limiter.reservar("prompt"):
+                    raise ConnectionError("conexión interrumpida")
+            return limiter
+
+        limiter = asyncio.run(escenario())
+        self.assertEqual(limiter.limite, 2.0)
+        self.assertEqual(limiter.completadas, 0)
+        self.assertEqual(limiter.en_curso, 0)
+
+    def test_exito_y_sobrecarga_siguen_ajustando(self):
+        async def escenario():
+            limiter = _limitador()
+
+            async def ok():
+                return "{}"
+
+            async def saturada():
+                raise ProviderOverloadedError("429")
+
+            await limiter.ejecutar(ok, "prompt")
+            subido = limiter.limite
+            with self.assertRaises(ProviderOverloadedError):
+                await limiter.ejecutar(saturada, "prompt")
+            return limiter, subido
+
+        limiter, subido = asyncio.run(escenario())
+        self.assertEqual(subido, 2.5)
+        self.assertEqual(limiter.limite, 1.25)
+        self.assertEqual(limiter.completadas, 1)
+        self.assertEqual(limiter.sobrecargas, 1)
+
+
+class LatenciaCanceladasTest(unittest.TestCase):
+
+    def test_primario_lento_cancelado_cuenta_en_el_percentil(self):
+        async def escenario():
+            limiter = _limitador()
+            limiter.latencias.extend([0.01] * 19)
+
+            async def lenta():
+                await asyncio.sleep(10)
+
+            tarea = asyncio.create_task(limiter.ejecutar(lenta, "prompt"))
+            await asyncio.sleep(0.2)
+            tarea.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+            return limiter
+
+        limiter = asyncio.run(escenario())
+        self.assertEqual(len(limiter.latencias), 20)
+        self.assertGreaterEqual(limiter.percentil(0.95), 0.2)
+        self.assertEqual(limiter.canceladas, 1)
+
+    def test_cancelada_antes_de_la_mediana_no_se_registra(self):
+        async def escenario():
+            limiter = _limitador()
+            limiter.latencias.extend([5.0] * 10)
+
+            async def lenta():
+                await asyncio.sleep(10)
+
+            tarea = asyncio.create_task(limiter.ejecutar(lenta, "prompt"))
+            await asyncio.sleep(0.01)
+            tarea.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarea
+            return limiter
+
+        limiter = asyncio.run(escenario())
+        self.assertEqual(list(limiter.latencias), [5.0] * 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
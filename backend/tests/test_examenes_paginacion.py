@@ -0,0 +1,89 @@
+"""
+Paginación por cursor del historial de exámenes (GET /api/examenes/lectura).
+
+Usa una base SQLite temporal. Ejecutar desde el directorio backend:
+    python -m unittest tests.test_examenes_paginacion
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api.dependencies import get_current_active_user  # noqa: E402
+from app.core.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.db_models import ExamenLectura  # noqa: E402
+from app.models.docente import Docente  # noqa: E402
+
+TOTAL_EXAMENES = 7
+
+
+async def _preparar() -> Docente:
+    """Crea un docente y TOTAL_EXAMENES exámenes en el mismo segundo (mismo fecha_creacion en SQLite)."""
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        docente = Docente(dni="00000001", nombres="Test", apellidos="Paginación", password_hash="x", is_active=True)
+        db.add(docente)
+        await db.flush()
+        db.add_all([
+            ExamenLectura(docente_id=docente.id, titulo=f"Examen {n}", preguntas=[], total_preguntas=0)
+            for n in range(TOTAL_EXAMENES)
+        ])
+        await db.commit()
+        await db.refresh(docente)
+        return docente
+
+
+class PaginacionExamenesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        docente = asyncio.run(_preparar())
+        app.dependency_overrides[get_current_active_user] = lambda: docente
+        cls.client = TestClient(app)
+
+    @classmethod
+    def tearDownClass(cls):
+        app.dependency_overrides.clear()
+        asyncio.run(engine.dispose())
+
+    def test_sin_limite_devuelve_todo(self):
+        response = self.client.get("/api/examenes/lectura")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), TOTAL_EXAMENES)
+        self.assertNotIn("x-next-cursor", response.headers)
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        ids = []
+        cursor = None
+        for _ in range(TOTAL_EXAMENES):  # cota: nunca debería hacer falta más
+            params = {"limite": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get("/api/examenes/lectura", params=params)
+            self.assertEqual(response.status_code, 200)
+            pagina = [examen["id"] for examen in response.json()]
+            self.assertLessEqual(len(pagina), 2)
+            ids.extend(pagina)
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        else:
+            self.fail("La paginación no terminó")
+
+        self.assertEqual(len(ids), TOTAL_EXAMENES)
+        self.assertEqual(len(set(ids)), TOTAL_EXAMENES)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_cursor_invalido(self):
+        response = self.client.get("/api/examenes/lectura", params={"cursor": "no-es-un-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Cola de trabajos de generación: reinicio, tope de intentos y acceso por docente.
+
+Usa una base SQLite temporal. Ejecutar desde el directorio backend:
+    python -m unittest tests.test_job_service
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api.dependencies import get_current_user_optional  # noqa: E402
+from app.core.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.db_models import TrabajoGeneracion  # noqa: E402
+from app.models.docente import Docente  # noqa: E402
+from app.services.job_service import JobService  # noqa: E402
+
+
+async def _crear_trabajo(**campos) -> str:
+    trabajo_id = str(uuid.uuid4())
+    async with AsyncSessionLocal() as db:
+        db.add(TrabajoGeneracion(
+            id=trabajo_id,
+            tipo="lectosistem",
+            parametros={"grado_id": 1},
+            **{"estado": "pendiente", "intentos": 0, **campos}
+        ))
+        await db.commit()
+    return trabajo_id
+
+
+async def _leer(trabajo_id: str) -> TrabajoGeneracion:
+    async with AsyncSessionLocal() as db:
+        return await db.get(TrabajoGeneracion, trabajo_id)
+
+
+class JobServiceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run(engine.dispose())
+
+    def test_stop_devuelve_los_trabajos_en_curso(self):
+        async def escenario():
+            servicio = JobService(max_workers=1, poll_seconds=3600, stale_seconds=900, max_intentos=3)
+            iniciado = asyncio.Event()
+
+            async def generar_lento(*args, **kwargs):
+                iniciado.set()
+                await asyncio.sleep(60)
+
+            with mock.patch.object(JobService, "preparar", mock.AsyncMock(return_value={})), \
+                    mock.patch("app.services.job_service.lectosistem_service.generar_desde_preparacion", generar_lento):
+                await servicio.start()
+                trabajo_id = await _crear_trabajo()
+                servicio._encolar(trabajo_id)
+                await asyncio.wait_for(iniciado.wait(), timeout=5)
+                self.assertEqual((await _leer(trabajo_id)).estado, "en_proceso")
+                await servicio.stop()
+            return await _leer(trabajo_id)
+
+        trabajo = asyncio.run(escenario())
+        self.assertEqual(trabajo.estado, "pendiente")
+        self.assertIsNone(trabajo.fecha_inicio)
+        self.assertEqual(trabajo.intentos, 0)
+
+    def test_trabajo_que_agota_sus_intentos_pasa_a_error(self):
+        async def escenario():
+            servicio = JobService(max_workers=1, poll_seconds=3600, stale_seconds=900, max_intentos=2)
+            servicio._queue = asyncio.Queue()
+            antiguo = datetime.now(timezone.utc) - timedelta(hours=1)
+            agotado = await _crear_trabajo(estado="en_proceso", intentos=2, fecha_inicio=antiguo)
+            reintentable = await _crear_trabajo(estado="en_proceso", intentos=1, fecha_inicio=antiguo)
+            await servicio._recuperar_pendientes()
+            return await _leer(agotado), await _leer(reintentable), servicio._encolados
+
+        agotado, reintentable, encolados = asyncio.run(escenario())
+        self.assertEqual(agotado.estado, "error")
+        self.assertIsNotNone(agotado.fecha_fin)
+        self.assertNotIn(agotado.id, encolados)
+        self.assertEqual(reintentable.estado, "pendiente")
+        self.assertIn(reintentable.id, encolados)
+
+    def test_solo_el_docente_que_lo_envio_puede_consultarlo(self):
+        dueno = Docente(id=101, dni="00000101", password_hash="x", is_active=True)
+        otro = Docente(id=102, dni="00000102", password_hash="x", is_active=True)
+        propio = asyncio.run(_crear_trabajo(docente_id=dueno.id, estado="completado"))
+        anonimo = asyncio.run(_crear_trabajo(estado="completado"))
+        client = TestClient(app)
+        try:
+            for usuario, esperado in ((dueno, 200), (otro, 404), (None, 404)):
+                app.dependency_overrides[get_current_user_optional] = lambda usuario=usuario: usuario
+                self.assertEqual(client.get(f"/api/jobs/{propio}").status_code, esperado)
+                self.assertEqual(client.get(f"/api/jobs/{propio}/esperar").status_code, esperado)
+            self.assertEqual(client.get(f"/api/jobs/{anonimo}").status_code, 200)
+        finally:
+            app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Modo de caché por defecto: 'prefer' salvo que el mismo docente repita la solicitud.
+
+Usa una base SQLite temporal. Ejecutar desde el directorio backend:
+    python -m unittest tests.test_solicitudes_docente
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+from sqlalchemy import update  # noqa: E402
+
+from app.core.database import AsyncSessionLocal, engine, init_db  # noqa: E402
+from app.models.db_models import SolicitudDocente  # noqa: E402
+from app.services.ai_cache import SolicitudesDocente  # noqa: E402
+
+
+def _parametros(**campos) -> dict:
+    return {"grado_id": 3, "desempeno_ids": [1, 2], "cantidad": 3, "cache": None, **campos}
+
+
+class SolicitudesDocenteTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        asyncio.run(init_db())
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run(engine.dispose())
+
+    def test_repetir_la_solicitud_genera_un_examen_nuevo(self):
+        async def escenario():
+            solicitudes = SolicitudesDocente(ttl_seconds=3600)
+            primera = await solicitudes.modo("lectosistem", _parametros(), 101)
+            repetida = await solicitudes.modo("lectosistem", _parametros(), 101)
+            otro_docente = await solicitudes.modo("lectosistem", _parametros(), 102)
+            otra_especificacion = await solicitudes.modo("lectosistem", _parametros(cantidad=5), 101)
+            return primera, repetida, otro_docente, otra_especificacion
+
+        self.assertEqual(asyncio.run(escenario()), ("prefer", "bypass", "prefer", "prefer"))
+
+    def test_sin_sesion_y_modo_explicito(self):
+        async def escenario():
+            solicitudes = SolicitudesDocente(ttl_seconds=3600)
+            anonimas = [await solicitudes.modo("matsistem", _parametros(), None) for _ in range(2)]
+            await solicitudes.modo("matsistem", _parametros(), 201)
+            explicita = await solicitudes.modo("matsistem", _parametros(cache="prefer"), 201)
+            return anonimas, explicita
+
+        anonimas, explicita = asyncio.run(escenario())
+        self.assertEqual(anonimas, ["prefer", "prefer"])
+        self.assertEqual(explicita, "prefer")
+
+    def test_fuera_del_ttl_vuelve_a_usar_la_cache(self):
+        async def escenario():
+            solicitudes = SolicitudesDocente(ttl_seconds=3600)
+            await solicitudes.modo("lectosistem", _parametros(), 301)
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(SolicitudDocente)
+                    .where(SolicitudDocente.docente_id == 301)
+                    .values(ultima_solicitud=datetime.now(timezone.utc) - timedelta(hours=2))
+                )
+                await db.commit()
+            return await solicitudes.modo("lectosistem", _parametros(), 301)
+
+        self.assertEqual(asyncio.run(escenario()), "prefer")
+
+
+if __name__ == "__main__":
+    unittest.main()